@@ -0,0 +1,191 @@
+"""Load test: gunicorn sync workers vs. uvicorn workers with the async views.
+
+Seeds a temporary SQLite database, then starts gunicorn once per server mode
+(``DJANGO_SERVER_MODE=wsgi`` and ``asgi``, through ``src/gunicorn.conf.py``)
+with the same number of workers, and drives it with concurrent clients over
+real sockets. ``--slow-ms`` makes every client pause after its request line,
+holding the connection open the way mobile clients do: a sync worker blocks
+on whichever connection it accepted until that request is complete, a
+uvicorn worker keeps serving the others. A mode whose worker class is not
+installed is skipped.
+
+Run from ``backend/``::
+
+  python benchmarks/async_load.py [--clients 64] [--seconds 10] [--slow-ms 50] [--workers 2]
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import pathlib
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = pathlib.Path(__file__).resolve().parents[1] / 'src'
+DATABASE = pathlib.Path(tempfile.mkdtemp()) / 'load.sqlite3'
+
+sys.path.insert(0, str(SRC))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_project.settings')
+os.environ['DATABASE_URL'] = f'sqlite:///{DATABASE}'
+os.environ['DJANGO_ALLOWED_HOSTS'] = '127.0.0.1'
+os.environ['DJANGO_DEBUG'] = 'False'
+os.environ['METRICS_ENABLED'] = 'False'
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+
+from blog.models import BlogCategory, BlogPost  # noqa: E402
+from blog.relations import rebuild_all_relations  # noqa: E402
+
+MODES = {'wsgi': 'gunicorn', 'asgi': 'uvicorn_worker'}
+
+
+def seed(count: int) -> str:
+  call_command('migrate', verbosity=0)
+  categories = [BlogCategory.objects.create(name=f'Category {index}') for index in range(8)]
+  body = '<p>Zero trust is a <strong>journey</strong>, not a product.</p>' * 40
+  for index in range(count):
+    post = BlogPost.objects.create(
+      title=f'Post number {index}',
+      excerpt='How we cut incident response time in half.',
+      body=body,
+      status=BlogPost.Status.PUBLISHED
+    )
+    post.categories.add(categories[index % len(categories)])
+  rebuild_all_relations()
+  return BlogPost.objects.values_list('slug', flat=True).first()
+
+
+async def exchange(port: int, request: bytes, slow: float) -> int:
+  reader, writer = await asyncio.open_connection('127.0.0.1', port)
+  try:
+    # The request line, a pause, then the headers and body.
+    request_line, _, rest = request.partition(b'\r\n')
+    writer.write(request_line + b'\r\n')
+    await writer.drain()
+    if slow:
+      # Jittered so clients fall out of step; in lockstep the kernel buffers
+      # every trickled request and even a blocking worker never waits.
+      await asyncio.sleep(random.uniform(0.5, 1.5) * slow)
+    writer.write(rest)
+    await writer.drain()
+    response = await reader.read()
+    return int(response.split(b' ', 2)[1])
+  finally:
+    writer.close()
+
+
+def build_requests(slug: str) -> list[bytes]:
+  head = 'Host: 127.0.0.1\r\nConnection: close\r\nAccept: application/json\r\n'
+  lead = json.dumps({'name': 'Load', 'email': 'load@example.com', 'plan': 'Growth', 'consent_privacy': True}).encode()
+  return [
+    f'GET /api/blog/posts/?page_size=12 HTTP/1.1\r\n{head}\r\n'.encode(),
+    f'GET /api/blog/posts/{slug}/ HTTP/1.1\r\n{head}\r\n'.encode(),
+    f'GET /api/blog/categories/ HTTP/1.1\r\n{head}\r\n'.encode(),
+    (
+      f'POST /api/leads/ HTTP/1.1\r\n{head}Content-Type: application/json\r\n'
+      f'Content-Length: {len(lead)}\r\n\r\n'
+    ).encode() + lead,
+  ]
+
+
+async def drive(port: int, requests: list[bytes], clients: int, seconds: float, slow: float) -> dict:
+  latencies, failures = [], 0
+  deadline = time.perf_counter() + seconds
+
+  async def client(offset: int):
+    nonlocal failures
+    index = offset
+    while time.perf_counter() < deadline:
+      started = time.perf_counter()
+      try:
+        status = await exchange(port, requests[index % len(requests)], slow)
+      except (OSError, IndexError, ValueError):
+        status = 0
+      if 200 <= status < 300:
+        latencies.append(time.perf_counter() - started)
+      else:
+        failures += 1
+      index += 1
+
+  started = time.perf_counter()
+  await asyncio.gather(*(client(offset) for offset in range(clients)))
+  elapsed = time.perf_counter() - started
+  quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+  return {
+    'rps': len(latencies) / elapsed,
+    'p50': quantiles[49] * 1000,
+    'p95': quantiles[94] * 1000,
+    'p99': quantiles[98] * 1000,
+    'failed': failures,
+  }
+
+
+async def wait_for_port(port: int, timeout: float = 20.0):
+  deadline = time.monotonic() + timeout
+  while time.monotonic() < deadline:
+    try:
+      _, writer = await asyncio.open_connection('127.0.0.1', port)
+    except OSError:
+      await asyncio.sleep(0.2)
+    else:
+      writer.close()
+      return
+  raise SystemExit(f'gunicorn did not listen on {port} within {timeout:.0f}s')
+
+
+def run_mode(mode: str, port: int, options, requests: list[bytes]) -> dict:
+  env = {
+    **os.environ,
+    'DJANGO_SERVER_MODE': mode,
+    'GUNICORN_BIND': f'127.0.0.1:{port}',
+    'GUNICORN_WORKERS': str(options.workers),
+  }
+  server = subprocess.Popen(
+    [sys.executable, '-m', 'gunicorn', '--log-level', 'warning'],
+    cwd=SRC,
+    env=env
+  )
+  try:
+    asyncio.run(wait_for_port(port))
+    asyncio.run(drive(port, requests, options.clients, 1.0, 0))  # warm caches and connections
+    return asyncio.run(drive(port, requests, options.clients, options.seconds, options.slow_ms / 1000))
+  finally:
+    server.terminate()
+    server.wait()
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--posts', type=int, default=200)
+  parser.add_argument('--clients', type=int, default=64)
+  parser.add_argument('--seconds', type=float, default=10.0)
+  parser.add_argument('--slow-ms', type=float, default=50.0)
+  parser.add_argument('--workers', type=int, default=2)
+  parser.add_argument('--port', type=int, default=8765)
+  options = parser.parse_args()
+
+  requests = build_requests(seed(options.posts))
+  print(f'{options.clients} clients, {options.workers} workers, {options.slow_ms:.0f} ms trickle per request')
+  print(f'{"mode":<8}{"rps":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"failed":>8}')
+  for offset, (mode, module) in enumerate(MODES.items()):
+    if importlib.util.find_spec(module) is None:
+      print(f'{mode:<8}skipped: {module} is not installed')
+      continue
+    result = run_mode(mode, options.port + offset, options, requests)
+    print(
+      f'{mode:<8}{result["rps"]:>10.0f}{result["p50"]:>10.1f}{result["p95"]:>10.1f}'
+      f'{result["p99"]:>10.1f}{result["failed"]:>8}'
+    )
+
+
+if __name__ == '__main__':
+  main()
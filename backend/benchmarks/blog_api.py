@@ -0,0 +1,92 @@
+"""Requests/sec for the blog posts API with and without the raw payload path.
+
+Seeds an in-memory SQLite database and drives the views through Django's test
+client, so the numbers cover the whole request minus the network. The response
+cache is bypassed (the content version and page counts stay cached) so every
+request is rendered.
+
+Run from ``backend/``::
+
+  python benchmarks/blog_api.py [--posts 200] [--seconds 3]
+"""
+import argparse
+import os
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / 'src'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_project.settings')
+os.environ['DATABASE_URL'] = 'sqlite://:memory:'
+os.environ['DJANGO_ALLOWED_HOSTS'] = 'testserver'
+os.environ['DJANGO_DEBUG'] = 'False'
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+
+from blog.cache import VersionedResponseCacheMixin  # noqa: E402
+from blog.models import BlogAuthor, BlogCategory, BlogPost  # noqa: E402
+from blog.relations import rebuild_all_relations  # noqa: E402
+
+
+def seed(count: int) -> str:
+  authors = [BlogAuthor.objects.create(full_name=f'Author {index}', bio='Writes about security.') for index in range(5)]
+  categories = [BlogCategory.objects.create(name=f'Category {index}') for index in range(8)]
+  body = '<p>Zero trust is a <strong>journey</strong>, not a product.</p>' * 40
+  for index in range(count):
+    post = BlogPost.objects.create(
+      title=f'Post number {index}',
+      excerpt='How we cut incident response time in half.',
+      body=body,
+      status=BlogPost.Status.PUBLISHED,
+      seo_keywords='security, cloud, zero trust',
+      author=authors[index % len(authors)]
+    )
+    post.categories.add(categories[index % len(categories)], categories[(index * 3) % len(categories)])
+  rebuild_all_relations()
+  return BlogPost.objects.values_list('slug', flat=True).first()
+
+
+def requests_per_second(client: Client, url: str, seconds: float) -> float:
+  done, deadline = 0, time.perf_counter() + seconds
+  started = time.perf_counter()
+  while time.perf_counter() < deadline:
+    response = client.get(url)
+    assert response.status_code == 200, response.status_code
+    done += 1
+  return done / (time.perf_counter() - started)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--posts', type=int, default=200)
+  parser.add_argument('--seconds', type=float, default=3.0)
+  options = parser.parse_args()
+
+  VersionedResponseCacheMixin._cached = lambda self, handler, request, *args, **kwargs: handler(request, *args, **kwargs)
+  call_command('migrate', verbosity=0)
+  slug = seed(options.posts)
+  client = Client()
+  urls = {
+    'list (page_size=24)': '/api/blog/posts/?page_size=24',
+    'list (keyset)': '/api/blog/posts/?cursor=&page_size=24',
+    'detail': f'/api/blog/posts/{slug}/',
+  }
+
+  print(f'{"endpoint":<22}{"serializers rps":>17}{"raw rps":>10}{"speedup":>10}')
+  for label, url in urls.items():
+    with override_settings(BLOG_RAW_PAYLOADS=False):
+      before = requests_per_second(client, url, options.seconds)
+      baseline = client.get(url).content
+    with override_settings(BLOG_RAW_PAYLOADS=True):
+      after = requests_per_second(client, url, options.seconds)
+      assert client.get(url).content == baseline, f'{label}: payloads differ'
+    print(f'{label:<22}{before:>17.0f}{after:>10.0f}{after / before:>9.1f}x')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,65 @@
+"""Microbenchmark: bleach vs. the streaming sanitizer on typical blog fields.
+
+Run from ``backend/``::
+
+  python benchmarks/sanitizers.py [--number 2000]
+"""
+import argparse
+import pathlib
+import sys
+import timeit
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / 'src'))
+
+from blog.sanitizers import (  # noqa: E402
+  ALLOWED_BODY_ATTRIBUTES,
+  ALLOWED_BODY_TAGS,
+  ALLOWED_PROTOCOLS,
+  BleachSanitizer,
+  StreamingSanitizer
+)
+
+PARAGRAPH = (
+  '<p>Zero trust is a <strong>journey</strong>, not a product. Start with an '
+  '<a href="https://example.com/inventory?scope=all&amp;page=2" target="_blank" rel="noopener">asset inventory</a>, '
+  'then enforce <em>least privilege</em> &mdash; <code>deny &gt; allow</code>.</p>\n'
+)
+BODY = (
+  '<h2>Overview</h2>\n' + PARAGRAPH * 20
+  + '<ul><li>Patch early</li><li>Log <strong>everything</strong></li></ul>\n'
+  + '<figure><img src="/media/blog/diagram.png" alt="Network diagram" loading="lazy">'
+  + '<figcaption>Segmented network</figcaption></figure>\n'
+  + '<pre>$ nmap -sV 10.0.0.0/24</pre>'
+)
+
+CASES = {
+  'plain: seo_title': (False, 'Hardening Kubernetes clusters: a practical checklist'),
+  'plain: excerpt': (False, 'How we cut incident response time in half - without buying another tool. ' * 3),
+  'plain: with markup': (False, 'Ship <b>fast</b> &amp; stay safe'),
+  'rich: body (~4 KB)': (True, BODY),
+  'rich: script injection': (True, BODY + '<script>alert(1)</script>'),
+}
+
+
+def build(rich: bool):
+  args = (ALLOWED_BODY_TAGS, ALLOWED_BODY_ATTRIBUTES, ALLOWED_PROTOCOLS) if rich else ([], {}, ALLOWED_PROTOCOLS)
+  return BleachSanitizer(*args), StreamingSanitizer(*args)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--number', type=int, default=2000)
+  options = parser.parse_args()
+
+  print(f'{"case":<26}{"bleach µs":>12}{"streaming µs":>15}{"speedup":>10}')
+  for label, (rich, value) in CASES.items():
+    reference, streaming = build(rich)
+    assert reference(value) == streaming(value), label
+    number = options.number if not rich else max(1, options.number // 10)
+    slow = min(timeit.repeat(lambda: reference(value), number=number, repeat=3)) / number * 1e6
+    fast = min(timeit.repeat(lambda: streaming(value), number=number, repeat=3)) / number * 1e6
+    print(f'{label:<26}{slow:>12.1f}{fast:>15.1f}{slow / fast:>9.1f}x')
+
+
+if __name__ == '__main__':
+  main()
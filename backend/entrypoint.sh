@@ -1,26 +1,18 @@
 #!/bin/sh
 set -e
 
-mkdir -p /app/db
+export STARTUP_STARTED="$(date +%s.%N)"
 
-python - <<'PY'
-import time
-from django.db import connections
-from django.db.utils import OperationalError
+mkdir -p /app/db
 
-retries = 10
-while retries > 0:
-    try:
-        connections['default'].ensure_connection()
-        break
-    except OperationalError:
-        retries -= 1
-        time.sleep(2)
-else:
-    raise SystemExit('Database not ready')
-PY
+# Request metrics from a previous run must not be merged into this one.
+if [ -n "$METRICS_DIR" ]; then
+  rm -rf "$METRICS_DIR"
+fi
 
-python manage.py migrate --noinput
-python manage.py collectstatic --noinput
+# Static files and the migration graph are built into the image; this waits for
+# the database, runs migrate only if something is unapplied and prints where
+# start-up time went.
+python -m backend_project.startup
 
 exec "$@"
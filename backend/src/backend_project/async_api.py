@@ -0,0 +1,77 @@
+"""Plumbing shared by the async API views (``*/async_views.py``).
+
+DRF's dispatch is synchronous, so async views build their responses
+themselves. These helpers keep the bytes, status codes and error bodies
+identical to what the DRF views produce, and hand every method the async
+view does not implement to the DRF view in a worker thread.
+"""
+from __future__ import annotations
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+
+def api_request(request) -> Request:
+  return Request(request, parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES])
+
+
+def negotiate(drf_request: Request, format_suffix: str | None = None) -> None:
+  """Pick the renderer the way ``APIView`` would.
+
+  The first renderer is set before negotiating so that a ``NotAcceptable``
+  error can itself be rendered, as DRF does.
+  """
+  renderers = [renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES]
+  drf_request.accepted_renderer, drf_request.accepted_media_type = renderers[0], renderers[0].media_type
+  negotiator = api_settings.DEFAULT_CONTENT_NEGOTIATION_CLASS()
+  drf_request.accepted_renderer, drf_request.accepted_media_type = negotiator.select_renderer(
+    drf_request, renderers, format_suffix
+  )
+
+
+def render(drf_request: Request, data, status: int = 200) -> HttpResponse:
+  renderer = drf_request.accepted_renderer
+  content_type = renderer.media_type if renderer.charset is None else f'{renderer.media_type}; charset={renderer.charset}'
+  body = renderer.render(data, drf_request.accepted_media_type, {'request': drf_request})
+  return HttpResponse(body, status=status, content_type=content_type)
+
+
+def exception_response(drf_request: Request, exc: Exception) -> HttpResponse:
+  """What ``rest_framework.views.exception_handler`` answers for ``exc``."""
+  if isinstance(exc, Http404):
+    exc = NotFound(*exc.args)
+  data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+  return render(drf_request, data, exc.status_code)
+
+
+def async_api_view(fallback, methods: tuple[str, ...] = ('GET', 'HEAD')):
+  """Serve ``methods`` with the decorated coroutine and any other method with ``fallback``.
+
+  The coroutine is called as ``view(request, drf_request, *args, **kwargs)``;
+  ``drf_request`` carries the negotiated renderer and parsed body. API
+  exceptions and ``Http404`` become the same JSON errors DRF returns.
+  """
+  allow = ', '.join([*methods, 'OPTIONS'])
+  fallback = sync_to_async(fallback)
+
+  def decorator(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+      if request.method not in methods:
+        return await fallback(request, *args, **kwargs)
+      drf_request = api_request(request)
+      try:
+        negotiate(drf_request, kwargs.get('format'))
+        response = await view(request, drf_request, *args, **kwargs)
+      except (APIException, Http404) as exc:
+        response = exception_response(drf_request, exc)
+      response.setdefault('Allow', allow)
+      return response
+    return csrf_exempt(wrapper)
+  return decorator
@@ -0,0 +1,27 @@
+"""URL configuration used when ``ASYNC_VIEWS`` is on.
+
+Identical to ``backend_project.urls`` except that the blog and contact APIs
+are served by their native async views.
+"""
+from django.conf import settings
+from django.conf.urls.static import static
+from django.contrib import admin
+from django.urls import include, path
+
+from .media import RESIZE_PREFIX, resize_view
+from .metrics import metrics_view
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('api/_metrics', metrics_view, name='metrics'),
+    path(
+        f"{settings.MEDIA_URL.lstrip('/')}{RESIZE_PREFIX}/<int:width>x<int:height>/<path:path>",
+        resize_view,
+        name='media-resize',
+    ),
+    path('api/', include('contact.async_urls', namespace='contact')),
+    path('api/blog/', include('blog.async_urls', namespace='blog')),
+]
+
+if settings.DEBUG:
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
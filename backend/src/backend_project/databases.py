@@ -0,0 +1,44 @@
+"""Database connection settings built from ``DATABASE_URL``-style URLs.
+
+Every connection is health-checked before a request reuses it
+(``CONN_HEALTH_CHECKS``), so a Postgres restart costs a reconnect instead of
+failing the first requests afterwards. PostgreSQL can use psycopg 3's
+connection pool (``OPTIONS['pool']``), sized per worker process so the whole
+server stays within the connections the database allows us. Without the pool,
+connections persist for ``conn_max_age`` seconds.
+
+Imported by ``settings.py``, so nothing here may touch Django settings.
+"""
+from __future__ import annotations
+
+import dj_database_url
+
+POSTGRES_ENGINE = 'django.db.backends.postgresql'
+
+
+def pool_options(min_size: int, max_size: int, timeout: float) -> dict:
+  max_size = max(1, max_size)
+  return {'min_size': max(0, min(min_size, max_size)), 'max_size': max_size, 'timeout': timeout}
+
+
+def per_worker_pool_size(server_connections: int, workers: int) -> int:
+  """Connections one worker may hold so ``workers`` of them fit in ``server_connections``."""
+  return max(1, server_connections // max(1, workers))
+
+
+def database_config(url: str, conn_max_age: int = 600, pool: dict | None = None) -> dict:
+  """A ``DATABASES`` entry for ``url``; ``pool`` (see ``pool_options``) only applies to PostgreSQL."""
+  config = dj_database_url.parse(url, conn_max_age=conn_max_age, conn_health_checks=True, ssl_require=False)
+  if pool and config['ENGINE'] == POSTGRES_ENGINE:
+    # Pooled connections go back to the pool after each request; Django refuses
+    # a pool combined with persistent connections.
+    config['CONN_MAX_AGE'] = 0
+    config.setdefault('OPTIONS', {})['pool'] = dict(pool)
+  return config
+
+
+def replica_config(url: str, conn_max_age: int = 600, pool: dict | None = None) -> dict:
+  config = database_config(url, conn_max_age, pool)
+  # Tests read the replica through the primary's test database.
+  config['TEST'] = {'MIRROR': 'default'}
+  return config
@@ -0,0 +1,220 @@
+"""Per-request SQL accounting, ``Server-Timing`` headers and query budgets.
+
+Views declare how many queries a request may run:
+
+* function views: ``@query_budget(2)``;
+* ``APIView`` subclasses: ``query_budget = 3``;
+* viewsets: ``query_budget = {'list': 4, 'retrieve': 5}``.
+
+``QueryBudgetMiddleware`` counts every statement executed while the request
+is handled (streamed bodies included) and, with ``QUERY_BUDGET_ENFORCE``,
+raises ``QueryBudgetExceeded`` when a view goes over its budget. The test
+runner below turns enforcement on for the whole suite.
+"""
+from __future__ import annotations
+
+import contextlib
+import logging
+import time
+import typing
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test.runner import DiscoverRunner
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+  pass
+
+
+@dataclass
+class QueryStats:
+  count: int = 0
+  duration: float = 0.0
+  statements: list[str] = field(default_factory=list)
+
+  def add(self, sql: str, duration: float) -> None:
+    self.duration += duration
+    self.count += 1
+    self.statements.append(sql)
+
+
+# Stats being filled in the current context. Async ORM calls run in a worker
+# thread but inherit the context, so they are charged to the right request.
+_active_stats: ContextVar[tuple[QueryStats, ...]] = ContextVar('instrumentation_active_stats', default=())
+
+
+def _dispatch(execute, sql, params, many, context):
+  active = _active_stats.get()
+  if not active:
+    return execute(sql, params, many, context)
+  started = time.perf_counter()
+  try:
+    return execute(sql, params, many, context)
+  finally:
+    duration = time.perf_counter() - started
+    for stats in active:
+      stats.add(sql, duration)
+
+
+def install_query_hook(connection, **kwargs) -> None:
+  if _dispatch not in connection.execute_wrappers:
+    # First in line: ``execute_wrapper()`` blocks pop the last wrapper on exit.
+    connection.execute_wrappers.insert(0, _dispatch)
+
+
+connection_created.connect(install_query_hook)
+
+
+def start_tracking(stats: QueryStats) -> None:
+  for connection in connections.all(initialized_only=True):
+    install_query_hook(connection)
+  _active_stats.set((*_active_stats.get(), stats))
+
+
+def stop_tracking(stats: QueryStats) -> None:
+  # Not ``ContextVar.reset``: a streamed body may finish in another context.
+  _active_stats.set(tuple(active for active in _active_stats.get() if active is not stats))
+
+
+@contextlib.contextmanager
+def track_queries(stats: QueryStats | None = None) -> typing.Iterator[QueryStats]:
+  """Count statements on every database while the block runs."""
+  stats = stats if stats is not None else QueryStats()
+  start_tracking(stats)
+  try:
+    yield stats
+  finally:
+    stop_tracking(stats)
+
+
+def query_budget(limit: int):
+  """Declare the maximum number of queries a function view may run."""
+  def decorator(view):
+    view.query_budget = limit
+    return view
+  return decorator
+
+
+def budget_for(view_func, method: str) -> int | None:
+  """Resolve the declared budget of a resolved URL callback for ``method``."""
+  budget = getattr(view_func, 'query_budget', None)
+  if budget is None:
+    budget = getattr(getattr(view_func, 'cls', None), 'query_budget', None)
+  if isinstance(budget, dict):
+    action = (getattr(view_func, 'actions', None) or {}).get(method.lower())
+    budget = budget.get(action)
+  return budget
+
+
+def missing_budgets(urlpatterns) -> list[str]:
+  """``name METHOD`` for every route in ``urlpatterns`` that does not declare a budget."""
+  missing = []
+  for pattern in urlpatterns:
+    callback = pattern.callback
+    if getattr(callback, 'actions', None):
+      methods = list(callback.actions)
+    elif hasattr(callback, 'cls'):
+      methods = [method for method in callback.cls.http_method_names if method != 'options' and hasattr(callback.cls, method)]
+    else:
+      methods = ['get']
+    missing.extend(f'{pattern.name} {method.upper()}' for method in methods if budget_for(callback, method) is None)
+  return missing
+
+
+def server_timing(stats: QueryStats, total: float) -> str:
+  return f'db;desc="{stats.count} queries";dur={stats.duration * 1000:.1f}, total;dur={total * 1000:.1f}'
+
+
+class QueryBudgetMiddleware:
+  sync_capable = True
+  async_capable = True
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+    if iscoroutinefunction(get_response):
+      markcoroutinefunction(self)
+
+  def __call__(self, request):
+    if iscoroutinefunction(self):
+      return self.__acall__(request)
+    started, stats = self.start(request)
+    try:
+      response = self.get_response(request)
+    except BaseException:
+      stop_tracking(stats)
+      raise
+    return self.finish(request, response, started)
+
+  async def __acall__(self, request):
+    started, stats = self.start(request)
+    try:
+      response = await self.get_response(request)
+    except BaseException:
+      stop_tracking(stats)
+      raise
+    return self.finish(request, response, started)
+
+  @staticmethod
+  def start(request) -> tuple[float, QueryStats]:
+    stats = request.query_stats = QueryStats()
+    start_tracking(stats)
+    return time.perf_counter(), stats
+
+  def finish(self, request, response, started: float):
+    stats = request.query_stats
+    match = getattr(request, 'resolver_match', None)
+    budget = budget_for(match.func, request.method) if match is not None else None
+    if response.streaming and getattr(response, 'file_to_stream', None) is None:
+      # Streamed bodies query while being consumed; settle the account at the end.
+      # File responses are left alone so the server can still hand them to sendfile.
+      if response.is_async:
+        response.streaming_content = self._afinish_streaming(response.streaming_content, request, budget)
+      else:
+        response.streaming_content = self._finish_streaming(response.streaming_content, request, budget)
+      return response
+
+    stop_tracking(stats)
+    if getattr(settings, 'QUERY_BUDGET_SERVER_TIMING', False):
+      response['Server-Timing'] = server_timing(stats, time.perf_counter() - started)
+    self.check_budget(request, budget)
+    return response
+
+  def _finish_streaming(self, content, request, budget):
+    try:
+      yield from content
+    finally:
+      stop_tracking(request.query_stats)
+    self.check_budget(request, budget)
+
+  async def _afinish_streaming(self, content, request, budget):
+    try:
+      async for chunk in content:
+        yield chunk
+    finally:
+      stop_tracking(request.query_stats)
+    self.check_budget(request, budget)
+
+  @staticmethod
+  def check_budget(request, budget: int | None) -> None:
+    stats = request.query_stats
+    if budget is None or stats.count <= budget:
+      return
+    message = f'{request.method} {request.path} ran {stats.count} queries (budget {budget}):\n' + '\n'.join(stats.statements)
+    if getattr(settings, 'QUERY_BUDGET_ENFORCE', False):
+      raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+
+class QueryBudgetTestRunner(DiscoverRunner):
+  """Run the suite with budgets enforced so an overrun fails the test that caused it."""
+
+  def setup_test_environment(self, **kwargs):
+    super().setup_test_environment(**kwargs)
+    settings.QUERY_BUDGET_ENFORCE = True
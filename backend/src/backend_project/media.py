@@ -0,0 +1,357 @@
+"""On-demand image resizing: ``/media/_r/<w>x<h>/<path>``.
+
+Serves ``<path>`` (a name in ``default_storage``, or ``_remote/<host>/<path>``
+for an https image on one of ``MEDIA_RESIZE_REMOTE_HOSTS``) resized with
+Pillow. Only the sizes listed in ``MEDIA_RESIZE_SIZES`` are served, so the
+cache cannot be filled with arbitrary variants. A 0 width or height follows
+the aspect ratio, both set crop to fill the box, and images are never
+upscaled. This covers images the hero variant pipeline (``blog.images``) does
+not: uploads from before it, and the ``hero_image_url``/``avatar_url`` values.
+Remote fetches only follow redirects to https URLs on an allowed host.
+
+Results are kept in an on-disk LRU cache under ``MEDIA_RESIZE_CACHE_ROOT``,
+bounded by total bytes (``MEDIA_RESIZE_CACHE_MAX_BYTES``) and indexed by a
+small SQLite table shared by all workers. The cache key includes the size and
+modification time of local sources, so a URL always means the same bytes and
+is served as immutable. Concurrent misses for one variant are coalesced: the
+threads of a process wait on a single render, and processes take a file lock
+before rendering and re-check the cache once they hold it.
+"""
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+import typing
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import Future
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
+from django.views.decorators.http import require_safe
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+from .instrumentation import query_budget
+
+RESIZE_PREFIX = '_r'
+REMOTE_PREFIX = '_remote/'
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Eviction trims the cache to this fraction of its budget so it does not run on every store.
+EVICTION_TARGET = 0.9
+# Accesses within this many seconds of the last recorded one are not written to the index.
+TOUCH_INTERVAL = 60.0
+REMOTE_TIMEOUT = 10.0
+MAX_SOURCE_BYTES = 25 * 1024 * 1024
+LOCK_STRIPES = 256
+COALESCE_TIMEOUT = 60.0
+DEFAULT_SIZES = ((1600, 0), (1200, 0), (800, 0), (400, 0), (96, 96))
+
+# Source format -> (output format, content type, save options).
+OUTPUTS = {
+  'JPEG': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+  'PNG': ('PNG', 'image/png', {'optimize': True}),
+  'WEBP': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+  'AVIF': ('AVIF', 'image/avif', {'quality': 60}),
+}
+FALLBACK_OUTPUT = OUTPUTS['PNG']
+ORIENTATION_TAG = 0x0112
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+  key TEXT PRIMARY KEY,
+  content_type TEXT NOT NULL,
+  size INTEGER NOT NULL,
+  accessed REAL NOT NULL
+)
+'''
+
+
+class Source(typing.NamedTuple):
+  # What the rendered bytes depend on, besides the requested size.
+  identity: str
+  read: typing.Callable[[], bytes]
+
+
+class CachedImage(typing.NamedTuple):
+  path: Path
+  content_type: str
+
+
+def allowed_sizes() -> frozenset[tuple[int, int]]:
+  return frozenset(tuple(size) for size in getattr(settings, 'MEDIA_RESIZE_SIZES', DEFAULT_SIZES))
+
+
+def remote_hosts() -> typing.Collection[str]:
+  return getattr(settings, 'MEDIA_RESIZE_REMOTE_HOSTS', ())
+
+
+def _local_source(name: str) -> Source:
+  try:
+    size = default_storage.size(name)
+    modified = default_storage.get_modified_time(name).timestamp()
+  except (OSError, SuspiciousFileOperation, NotImplementedError) as exc:
+    raise Http404('No such image.') from exc
+  if size > MAX_SOURCE_BYTES:
+    raise Http404('Image too large.')
+
+  def read() -> bytes:
+    with default_storage.open(name, 'rb') as source:
+      return source.read()
+
+  return Source(f'{name}:{size}:{modified}', read)
+
+
+class AllowedHostRedirectHandler(urllib.request.HTTPRedirectHandler):
+  """Follow a redirect only to https on one of ``MEDIA_RESIZE_REMOTE_HOSTS``, re-checked at every hop."""
+
+  def redirect_request(self, req, fp, code, msg, headers, newurl):
+    target = urllib.parse.urlsplit(newurl)
+    if target.scheme != 'https' or target.netloc not in remote_hosts():
+      raise urllib.error.HTTPError(newurl, code, f'Redirect to {newurl} is not allowed', headers, fp)
+    return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+def remote_opener() -> urllib.request.OpenerDirector:
+  return urllib.request.build_opener(AllowedHostRedirectHandler)
+
+
+def _remote_source(location: str) -> Source:
+  host = location.split('/', 1)[0]
+  if host not in remote_hosts():
+    raise Http404('Host not allowed.')
+  url = f'https://{location}'
+
+  def read() -> bytes:
+    request = urllib.request.Request(url, headers={'User-Agent': 'WebEssex image resizer'})
+    with remote_opener().open(request, timeout=REMOTE_TIMEOUT) as response:
+      content = response.read(MAX_SOURCE_BYTES + 1)
+    if len(content) > MAX_SOURCE_BYTES:
+      raise ValueError(f'{url} is larger than {MAX_SOURCE_BYTES} bytes')
+    return content
+
+  return Source(url, read)
+
+
+def resolve_source(path: str) -> Source:
+  if path.startswith(REMOTE_PREFIX):
+    return _remote_source(path[len(REMOTE_PREFIX):])
+  # The cache lives under MEDIA_ROOT; its files are not sources.
+  if Path(os.path.normpath(Path(settings.MEDIA_ROOT) / path)).is_relative_to(cache_directory()):
+    raise Http404('No such image.')
+  return _local_source(path)
+
+
+def render(content: bytes, width: int, height: int) -> tuple[bytes, str]:
+  """Resize ``content`` to ``width`` x ``height`` (0 = keep the aspect ratio); returns bytes and content type."""
+  with Image.open(io.BytesIO(content)) as original:
+    output_format, content_type, options = OUTPUTS.get(original.format, FALLBACK_OUTPUT)
+    if output_format == 'AVIF' and not features.check('avif'):
+      output_format, content_type, options = FALLBACK_OUTPUT
+    # Let the JPEG decoder downscale by a power of two while decoding (the box is
+    # in stored orientation, so swap it for images EXIF rotates by 90 degrees).
+    rotated = original.getexif().get(ORIENTATION_TAG) in (5, 6, 7, 8)
+    original.draft('RGB', (height or 1, width or 1) if rotated else (width or 1, height or 1))
+    image = ImageOps.exif_transpose(original)
+    image.load()
+
+  source_width, source_height = image.size
+  if width and height:
+    # A box bigger than the source shrinks to the largest one of the same shape that fits.
+    scale = min(1.0, source_width / width, source_height / height)
+    box = (max(1, round(width * scale)), max(1, round(height * scale)))
+    image = ImageOps.fit(image, box, Image.Resampling.LANCZOS)
+  else:
+    scale = min(1.0, width / source_width if width else height / source_height)
+    if scale < 1.0:
+      size = (max(1, round(source_width * scale)), max(1, round(source_height * scale)))
+      image = image.resize(size, Image.Resampling.LANCZOS)
+
+  if output_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+    image = image.convert('RGB')
+  elif image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+    image = image.convert('RGBA')
+  buffer = io.BytesIO()
+  image.save(buffer, format=output_format, **options)
+  return buffer.getvalue(), content_type
+
+
+class ResizeCache:
+  """Rendered images on disk, evicted least recently used first once over ``max_bytes``."""
+
+  def __init__(self, root, max_bytes: int):
+    self.root = Path(root)
+    self.max_bytes = max_bytes
+    self._local = threading.local()
+
+  def _connection(self) -> sqlite3.Connection:
+    connection = getattr(self._local, 'connection', None)
+    if connection is None:
+      self.root.mkdir(parents=True, exist_ok=True)
+      connection = sqlite3.connect(self.root / 'index.sqlite3', timeout=30, isolation_level=None)
+      connection.execute('PRAGMA journal_mode=WAL')
+      # Losing the tail of the index in a power cut only forgets a few cached files.
+      connection.execute('PRAGMA synchronous=NORMAL')
+      connection.execute(SCHEMA)
+      self._local.connection = connection
+    return connection
+
+  def path(self, key: str) -> Path:
+    return self.root / key[:2] / key
+
+  def get(self, key: str) -> CachedImage | None:
+    connection = self._connection()
+    row = connection.execute('SELECT content_type, accessed FROM entries WHERE key = ?', (key,)).fetchone()
+    if row is None:
+      return None
+    path = self.path(key)
+    if not path.exists():
+      connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+      return None
+    now = time.time()
+    if now - row[1] > TOUCH_INTERVAL:
+      connection.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+    return CachedImage(path, row[0])
+
+  def put(self, key: str, content: bytes, content_type: str) -> CachedImage:
+    path = self.path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f'{key}.{os.getpid()}.{threading.get_ident()}.part')
+    partial.write_bytes(content)
+    os.replace(partial, path)
+    self._connection().execute(
+      'INSERT OR REPLACE INTO entries (key, content_type, size, accessed) VALUES (?, ?, ?, ?)',
+      (key, content_type, len(content), time.time())
+    )
+    self.evict()
+    return CachedImage(path, content_type)
+
+  def total_bytes(self) -> int:
+    return self._connection().execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+  def evict(self) -> int:
+    """Remove least recently used entries until the cache fits; returns how many were removed."""
+    connection = self._connection()
+    if self.total_bytes() <= self.max_bytes:
+      return 0
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+      excess = self.total_bytes() - int(self.max_bytes * EVICTION_TARGET)
+      victims = []
+      for key, size in connection.execute('SELECT key, size FROM entries ORDER BY accessed, key'):
+        if excess <= 0:
+          break
+        victims.append(key)
+        excess -= size
+      connection.executemany('DELETE FROM entries WHERE key = ?', [(key,) for key in victims])
+    except BaseException:
+      connection.execute('ROLLBACK')
+      raise
+    connection.execute('COMMIT')
+    for key in victims:
+      # A response already streaming the file keeps its open handle.
+      self.path(key).unlink(missing_ok=True)
+    return len(victims)
+
+  @contextlib.contextmanager
+  def lock(self, key: str):
+    """Serialize renders of ``key`` across processes (striped, so lock files never pile up)."""
+    directory = self.root / 'locks'
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / f'{int(key[:4], 16) % LOCK_STRIPES:03d}', 'a') as handle:
+      fcntl.flock(handle, fcntl.LOCK_EX)
+      try:
+        yield
+      finally:
+        fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+_cache: ResizeCache | None = None
+_inflight: dict[str, Future] = {}
+_lock = threading.Lock()
+
+
+def cache_directory() -> Path:
+  return Path(getattr(settings, 'MEDIA_RESIZE_CACHE_ROOT', Path(settings.MEDIA_ROOT) / '_resized'))
+
+
+def get_cache() -> ResizeCache:
+  global _cache
+  root = cache_directory()
+  max_bytes = getattr(settings, 'MEDIA_RESIZE_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+  if _cache is None or _cache.root != root or _cache.max_bytes != max_bytes:
+    _cache = ResizeCache(root, max_bytes)
+  return _cache
+
+
+def _reset_after_fork() -> None:
+  global _cache, _inflight, _lock
+  _cache = None
+  _inflight = {}
+  _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _render_once(cache: ResizeCache, key: str, source: Source, width: int, height: int) -> CachedImage:
+  with cache.lock(key):
+    # Another process may have rendered it while we waited for the lock.
+    cached = cache.get(key)
+    if cached is None:
+      content, content_type = render(source.read(), width, height)
+      cached = cache.put(key, content, content_type)
+  return cached
+
+
+def resized_image(path: str, width: int, height: int) -> CachedImage:
+  """The cached rendering of ``path`` at ``width`` x ``height``, rendering it if needed."""
+  source = resolve_source(path)
+  key = hashlib.sha256(f'{source.identity}|{width}x{height}'.encode()).hexdigest()
+  cache = get_cache()
+  cached = cache.get(key)
+  if cached is not None:
+    return cached
+
+  with _lock:
+    future = _inflight.get(key)
+    leader = future is None
+    if leader:
+      future = _inflight[key] = Future()
+  if not leader:
+    return future.result(timeout=COALESCE_TIMEOUT)
+
+  try:
+    cached = _render_once(cache, key, source, width, height)
+  except BaseException as exc:
+    future.set_exception(exc)
+    raise
+  else:
+    future.set_result(cached)
+    return cached
+  finally:
+    with _lock:
+      _inflight.pop(key, None)
+
+
+@require_safe
+@query_budget(0)
+def resize_view(request, width: int, height: int, path: str):
+  if not (width or height) or (width, height) not in allowed_sizes():
+    raise Http404('Unsupported size.')
+  try:
+    cached = resized_image(path, width, height)
+  except (OSError, ValueError, UnidentifiedImageError, Image.DecompressionBombError) as exc:
+    raise Http404('Not a resizable image.') from exc
+  response = FileResponse(cached.path.open('rb'), content_type=cached.content_type)
+  response['Cache-Control'] = CACHE_CONTROL
+  return response
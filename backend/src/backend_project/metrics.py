@@ -0,0 +1,351 @@
+"""Per-route request metrics in the Prometheus text format.
+
+``MetricsMiddleware`` records the latency, SQL query count and time,
+serialization time and response size of every request, keyed by
+``(route, method, status)``. Each thread only ever writes to its own shard,
+so the request path takes no lock; shards are summed when scraped.
+
+With ``METRICS_DIR`` set, every process dumps its totals to its own file in
+that directory every ``METRICS_FLUSH_INTERVAL`` seconds (and right before it
+answers a scrape), and ``/api/_metrics`` sums all files. Whichever gunicorn
+worker serves the scrape therefore reports the whole server. Files of
+workers that have exited are kept so counters never go backwards; clear the
+directory when the server starts (``entrypoint.sh`` does).
+"""
+from __future__ import annotations
+
+import contextlib
+import hmac
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+
+from .instrumentation import query_budget
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+# Layout of a series: scalar totals, then per-bucket (not cumulative) counts
+# with a trailing +Inf slot for each histogram.
+COUNT, LATENCY_SUM, DB_QUERIES, DB_SECONDS, SERIALIZER_SECONDS, SIZE_SUM = range(6)
+LATENCY_OFFSET = 6
+SIZE_OFFSET = LATENCY_OFFSET + len(LATENCY_BUCKETS) + 1
+SERIES_WIDTH = SIZE_OFFSET + len(SIZE_BUCKETS) + 1
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+UNMATCHED_ROUTE = 'unmatched'
+
+
+class RequestSample:
+  __slots__ = ('serializer_seconds', 'serializing')
+
+  def __init__(self):
+    self.serializer_seconds = 0.0
+    self.serializing = False
+
+
+_current_sample: ContextVar[RequestSample | None] = ContextVar('metrics_request_sample', default=None)
+
+
+def timed_serialization(func, *args, **kwargs):
+  """Call ``func`` and charge its duration to the current request's serializer time.
+
+  Nested calls are only counted once, by the outermost one.
+  """
+  sample = _current_sample.get()
+  if sample is None or sample.serializing:
+    return func(*args, **kwargs)
+  sample.serializing = True
+  started = time.perf_counter()
+  try:
+    return func(*args, **kwargs)
+  finally:
+    sample.serializer_seconds += time.perf_counter() - started
+    sample.serializing = False
+
+
+@contextlib.contextmanager
+def serializer_timer():
+  """Block form of ``timed_serialization`` for hand-written payload code."""
+  sample = _current_sample.get()
+  if sample is None or sample.serializing:
+    yield
+    return
+  sample.serializing = True
+  started = time.perf_counter()
+  try:
+    yield
+  finally:
+    sample.serializer_seconds += time.perf_counter() - started
+    sample.serializing = False
+
+
+class TimedSerializerMixin:
+  """Count a serializer's input validation and output representation as serializer time."""
+
+  def run_validation(self, *args, **kwargs):
+    return timed_serialization(super().run_validation, *args, **kwargs)
+
+  def to_representation(self, instance):
+    return timed_serialization(super().to_representation, instance)
+
+
+def _merge(totals: dict, key: tuple, series) -> None:
+  current = totals.get(key)
+  if current is None:
+    totals[key] = list(series)
+  else:
+    for index, value in enumerate(series):
+      current[index] += value
+
+
+class MetricsRecorder:
+  def __init__(self, directory: str | None = None, flush_interval: float = 5.0):
+    self.directory = Path(directory) if directory else None
+    self.flush_interval = flush_interval
+    self.reset()
+
+  def reset(self) -> None:
+    """Start from empty shards under a new file name (also run in forked children)."""
+    self._local = threading.local()
+    self._shards: list[dict] = []
+    self._name = f'{os.getpid()}-{uuid.uuid4().hex[:8]}.json'
+    self._next_flush = time.monotonic() + self.flush_interval
+
+  def _shard(self) -> dict:
+    shard = getattr(self._local, 'series', None)
+    if shard is None:
+      shard = self._local.series = {}
+      self._shards.append(shard)
+    return shard
+
+  def record(self, route: str, method: str, status: int, seconds: float, queries: int, db_seconds: float,
+             serializer_seconds: float, size: int) -> None:
+    shard = self._shard()
+    key = (route, method, str(status))
+    series = shard.get(key)
+    if series is None:
+      series = shard[key] = [0] * SERIES_WIDTH
+    series[COUNT] += 1
+    series[LATENCY_SUM] += seconds
+    series[DB_QUERIES] += queries
+    series[DB_SECONDS] += db_seconds
+    series[SERIALIZER_SECONDS] += serializer_seconds
+    series[SIZE_SUM] += size
+    series[LATENCY_OFFSET + bisect_left(LATENCY_BUCKETS, seconds)] += 1
+    series[SIZE_OFFSET + bisect_left(SIZE_BUCKETS, size)] += 1
+    if self.directory is not None and time.monotonic() >= self._next_flush:
+      self.flush()
+
+  def snapshot(self) -> dict[tuple, list]:
+    """This process's totals. Shards are copied, never locked; a concurrent write may land in the next scrape."""
+    totals: dict[tuple, list] = {}
+    for shard in list(self._shards):
+      for key, series in list(shard.items()):
+        _merge(totals, key, series)
+    return totals
+
+  def flush(self) -> None:
+    self._next_flush = time.monotonic() + self.flush_interval
+    self.directory.mkdir(parents=True, exist_ok=True)
+    path = self.directory / self._name
+    temporary = path.with_name(f'.{path.name}.{threading.get_ident()}.tmp')
+    temporary.write_text(json.dumps([[list(key), series] for key, series in self.snapshot().items()]))
+    os.replace(temporary, path)
+
+  def collect(self) -> dict[tuple, list]:
+    """Totals across every process sharing ``directory`` (or just this one)."""
+    if self.directory is None:
+      return self.snapshot()
+    self.flush()
+    totals: dict[tuple, list] = {}
+    for path in self.directory.glob('*.json'):
+      try:
+        rows = json.loads(path.read_text())
+      except (OSError, ValueError):
+        continue
+      for key, series in rows:
+        _merge(totals, tuple(key), series)
+    return totals
+
+
+_recorder: MetricsRecorder | None = None
+
+
+def get_recorder() -> MetricsRecorder:
+  global _recorder
+  if _recorder is None:
+    _recorder = MetricsRecorder(
+      getattr(settings, 'METRICS_DIR', None),
+      getattr(settings, 'METRICS_FLUSH_INTERVAL', 5.0)
+    )
+  return _recorder
+
+
+def _reset_after_fork() -> None:
+  # A worker forked from a preloaded master must not report the master's
+  # requests again under its own file.
+  if _recorder is not None:
+    _recorder.reset()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _escape(value: str) -> str:
+  return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _histogram(lines: list[str], name: str, help_text: str, totals: dict, offset: int, bounds: tuple, sum_index: int):
+  lines.append(f'# HELP {name} {help_text}')
+  lines.append(f'# TYPE {name} histogram')
+  for (route, method, status), series in sorted(totals.items()):
+    labels = f'route="{_escape(route)}",method="{_escape(method)}",status="{status}"'
+    cumulative = 0
+    for index, bound in enumerate((*bounds, '+Inf')):
+      cumulative += series[offset + index]
+      lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_sum{{{labels}}} {series[sum_index]}')
+    lines.append(f'{name}_count{{{labels}}} {series[COUNT]}')
+
+
+def _counter(lines: list[str], name: str, help_text: str, totals: dict, index: int):
+  lines.append(f'# HELP {name} {help_text}')
+  lines.append(f'# TYPE {name} counter')
+  for (route, method, status), series in sorted(totals.items()):
+    labels = f'route="{_escape(route)}",method="{_escape(method)}",status="{status}"'
+    lines.append(f'{name}{{{labels}}} {series[index]}')
+
+
+def render_prometheus(totals: dict[tuple, list]) -> str:
+  lines: list[str] = []
+  _histogram(lines, 'http_request_duration_seconds', 'Time to produce the full response.', totals,
+             LATENCY_OFFSET, LATENCY_BUCKETS, LATENCY_SUM)
+  _histogram(lines, 'http_response_size_bytes', 'Response body size.', totals, SIZE_OFFSET, SIZE_BUCKETS, SIZE_SUM)
+  _counter(lines, 'http_request_db_queries_total', 'SQL statements run by requests.', totals, DB_QUERIES)
+  _counter(lines, 'http_request_db_duration_seconds_total', 'Time spent in SQL statements.', totals, DB_SECONDS)
+  _counter(lines, 'http_request_serializer_duration_seconds_total', 'Time spent serializing and rendering payloads.',
+           totals, SERIALIZER_SECONDS)
+  return '\n'.join(lines) + '\n'
+
+
+def route_label(request) -> str:
+  match = getattr(request, 'resolver_match', None)
+  return match.view_name if match is not None else UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+  """Record per-route request metrics.
+
+  SQL counters are read from ``request.query_stats``, so this must come after
+  ``QueryBudgetMiddleware`` in ``MIDDLEWARE``.
+  """
+
+  sync_capable = True
+  async_capable = True
+
+  def __init__(self, get_response):
+    if not getattr(settings, 'METRICS_ENABLED', True):
+      raise MiddlewareNotUsed
+    self.get_response = get_response
+    if iscoroutinefunction(get_response):
+      markcoroutinefunction(self)
+
+  def __call__(self, request):
+    if iscoroutinefunction(self):
+      return self.__acall__(request)
+    started = time.perf_counter()
+    sample = RequestSample()
+    token = _current_sample.set(sample)
+    try:
+      response = self.get_response(request)
+    finally:
+      _current_sample.reset(token)
+    return self.finish(request, response, started, sample)
+
+  async def __acall__(self, request):
+    started = time.perf_counter()
+    sample = RequestSample()
+    token = _current_sample.set(sample)
+    try:
+      response = await self.get_response(request)
+    finally:
+      _current_sample.reset(token)
+    return self.finish(request, response, started, sample)
+
+  def finish(self, request, response, started: float, sample: RequestSample):
+    if response.streaming and getattr(response, 'file_to_stream', None) is None:
+      measure = self._ameasure_stream if response.is_async else self._measure_stream
+      response.streaming_content = measure(response.streaming_content, request, response, started, sample)
+    else:
+      size = int(response.get('Content-Length') or 0) if response.streaming else len(response.content)
+      self.record(request, response, started, sample, size)
+    return response
+
+  def process_template_response(self, request, response):
+    # DRF responses are rendered after the view returns; charge rendering as serializer time.
+    sample = _current_sample.get()
+    if sample is not None:
+      started = time.perf_counter()
+
+      def rendered(_):
+        sample.serializer_seconds += time.perf_counter() - started
+
+      response.add_post_render_callback(rendered)
+    return response
+
+  def _measure_stream(self, content, request, response, started, sample):
+    size = 0
+    try:
+      for chunk in content:
+        size += len(chunk)
+        yield chunk
+    finally:
+      self.record(request, response, started, sample, size)
+
+  async def _ameasure_stream(self, content, request, response, started, sample):
+    size = 0
+    try:
+      async for chunk in content:
+        size += len(chunk)
+        yield chunk
+    finally:
+      self.record(request, response, started, sample, size)
+
+  @staticmethod
+  def record(request, response, started: float, sample: RequestSample, size: int) -> None:
+    stats = getattr(request, 'query_stats', None)
+    get_recorder().record(
+      route_label(request),
+      request.method,
+      response.status_code,
+      time.perf_counter() - started,
+      stats.count if stats is not None else 0,
+      stats.duration if stats is not None else 0.0,
+      sample.serializer_seconds,
+      size
+    )
+
+
+def scrape_allowed(request) -> bool:
+  token = getattr(settings, 'METRICS_TOKEN', '')
+  if token:
+    return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+  return settings.DEBUG or request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ())
+
+
+@query_budget(0)
+def metrics_view(request):
+  if not getattr(settings, 'METRICS_ENABLED', True) or not scrape_allowed(request):
+    raise Http404
+  return HttpResponse(render_prometheus(get_recorder().collect()), content_type=CONTENT_TYPE)
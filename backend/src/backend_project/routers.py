@@ -0,0 +1,170 @@
+"""Read/write splitting across the primary and ``DATABASE_REPLICAS``.
+
+``DatabaseRoutingMiddleware`` picks one replica per safe request and
+``ReplicaRouter`` sends reads of the models in ``DATABASE_REPLICA_APPS``
+(the public blog content) to it. Everything else stays on ``default``: every
+write, reads of other apps, admin pages, reads inside a transaction on the
+primary, and code running outside a request (commands, signals, background
+threads).
+
+Replicas lag behind, so reads go back to the primary
+* for everyone, for ``DATABASE_REPLICA_LAG`` seconds after any write to a
+  routed app commits (noted in the default cache, which the workers must
+  share), so a freshly bumped blog cache version is never filled from stale
+  rows. Writes are noted from ``transaction.on_commit``, when replicas can
+  first receive them, so however long a transaction runs the window starts
+  at its commit, and a rolled back one notes nothing;
+* for one browser, for ``DATABASE_READ_YOUR_WRITES_SECONDS`` after it saved a
+  post in the admin (a signed cookie set by ``pin_to_primary``).
+"""
+from __future__ import annotations
+
+import contextlib
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.urls import NoReverseMatch, reverse
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+LAST_WRITE_KEY = 'db:last-replicated-write'
+PIN_COOKIE = 'db_primary_pin'
+# Writes are noted at most this often per process; the lag window is widened to match.
+NOTE_INTERVAL = 0.5
+
+_read_alias: ContextVar[str | None] = ContextVar('replica_read_alias', default=None)
+_last_noted = 0.0
+
+
+def replica_aliases() -> list[str]:
+  return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def replica_apps() -> tuple[str, ...]:
+  return tuple(getattr(settings, 'DATABASE_REPLICA_APPS', ('blog',)))
+
+
+def choose_replica() -> str | None:
+  replicas = replica_aliases()
+  return random.choice(replicas) if replicas else None
+
+
+@contextlib.contextmanager
+def routed_to(alias: str | None):
+  """Route reads of replicated apps in this block (and threads asgiref hands it to) to ``alias``; ``None`` is the primary."""
+  token = _read_alias.set(alias)
+  try:
+    yield
+  finally:
+    _read_alias.reset(token)
+
+
+def note_replicated_write() -> None:
+  global _last_noted
+  now = time.time()
+  if now - _last_noted >= NOTE_INTERVAL:
+    _last_noted = now
+    cache.set(LAST_WRITE_KEY, now, None)
+
+
+def recently_written() -> bool:
+  last_write = cache.get(LAST_WRITE_KEY)
+  lag = getattr(settings, 'DATABASE_REPLICA_LAG', 2.0) + NOTE_INTERVAL
+  return last_write is not None and time.time() - last_write < lag
+
+
+def pin_to_primary(request) -> None:
+  """Serve this browser's reads from the primary for ``DATABASE_READ_YOUR_WRITES_SECONDS``."""
+  request._pin_to_primary = True
+
+
+def _pin_seconds() -> int:
+  return getattr(settings, 'DATABASE_READ_YOUR_WRITES_SECONDS', 60)
+
+
+def _admin_prefix() -> str | None:
+  try:
+    return reverse('admin:index')
+  except NoReverseMatch:
+    return None
+
+
+def read_alias_for(request) -> str | None:
+  """The replica ``request`` may read from, or ``None`` for the primary."""
+  if request.method not in SAFE_METHODS or not replica_aliases():
+    return None
+  admin_prefix = _admin_prefix()
+  if admin_prefix and request.path.startswith(admin_prefix):
+    return None
+  if request.get_signed_cookie(PIN_COOKIE, default=None, max_age=_pin_seconds()) is not None:
+    return None
+  if recently_written():
+    return None
+  return choose_replica()
+
+
+class DatabaseRoutingMiddleware:
+  sync_capable = True
+  async_capable = True
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+    if iscoroutinefunction(get_response):
+      markcoroutinefunction(self)
+
+  def __call__(self, request):
+    if iscoroutinefunction(self):
+      return self.__acall__(request)
+    with routed_to(read_alias_for(request)):
+      response = self.get_response(request)
+    return self.finish(request, response)
+
+  async def __acall__(self, request):
+    with routed_to(read_alias_for(request)):
+      response = await self.get_response(request)
+    return self.finish(request, response)
+
+  def finish(self, request, response):
+    if getattr(request, '_pin_to_primary', False):
+      response.set_signed_cookie(
+        PIN_COOKIE,
+        '1',
+        max_age=_pin_seconds(),
+        secure=request.is_secure(),
+        httponly=True,
+        samesite='Lax'
+      )
+    return response
+
+
+class ReplicaRouter:
+  def db_for_read(self, model, **hints):
+    alias = _read_alias.get()
+    if alias is None or model._meta.app_label not in replica_apps():
+      return DEFAULT_DB_ALIAS
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+      # Whatever the transaction wrote is only visible on the primary.
+      return DEFAULT_DB_ALIAS
+    return alias
+
+  def db_for_write(self, model, **hints):
+    if replica_aliases() and model._meta.app_label in replica_apps():
+      # Outside a transaction this runs at once, just before the statement.
+      transaction.on_commit(note_replicated_write, using=DEFAULT_DB_ALIAS)
+    # Never the replica an instance happened to be read from.
+    return DEFAULT_DB_ALIAS
+
+  def allow_relation(self, obj1, obj2, **hints):
+    # Replicas hold the same rows as the primary.
+    databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+    if obj1._state.db in databases and obj2._state.db in databases:
+      return True
+    return None
+
+  def allow_migrate(self, db, app_label, model_name=None, **hints):
+    # Replicas get their schema from the primary.
+    return False if db in replica_aliases() else None
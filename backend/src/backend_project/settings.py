@@ -13,7 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 from pathlib import Path
 
-import dj_database_url
+from backend_project.databases import database_config, per_worker_pool_size, pool_options, replica_config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -48,8 +48,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend_project.instrumentation.QueryBudgetMiddleware',
+    'backend_project.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'backend_project.staticfiles.AsyncWhiteNoiseMiddleware',
+    'backend_project.routers.DatabaseRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,7 +62,13 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'backend_project.urls'
+# 'wsgi' (gunicorn sync workers) or 'asgi' (gunicorn + uvicorn workers); see gunicorn.conf.py.
+SERVER_MODE = os.getenv('DJANGO_SERVER_MODE', 'wsgi').lower()
+# Native async blog/contact views. They also work under WSGI, but only pay off
+# on an event loop, so they follow the server mode unless set explicitly.
+ASYNC_VIEWS = os.getenv('DJANGO_ASYNC_VIEWS', str(SERVER_MODE == 'asgi')).lower() == 'true'
+
+ROOT_URLCONF = 'backend_project.async_urls' if ASYNC_VIEWS else 'backend_project.urls'
 
 TEMPLATES = [
     {
@@ -77,6 +86,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend_project.wsgi.application'
+ASGI_APPLICATION = 'backend_project.asgi.application'
 
 
 # Database
@@ -86,12 +96,59 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than shared-cache memory, so threaded tests get SQLite's
+        # busy timeout instead of immediate 'table is locked' errors.
+        'TEST': {'NAME': BASE_DIR / 'test-db.sqlite3'},
     }
 }
 
+# Connections are health-checked before reuse (backend_project/databases.py). They
+# persist for DATABASE_CONN_MAX_AGE seconds, or with DATABASE_POOL=True (PostgreSQL,
+# psycopg 3) come from a pool in each worker. Its size defaults to an equal share
+# of DATABASE_MAX_CONNECTIONS per gunicorn worker, when that is set.
 DATABASE_URL = os.getenv('DATABASE_URL')
+DATABASE_CONN_MAX_AGE = int(os.getenv('DATABASE_CONN_MAX_AGE', '600'))
+DATABASE_POOL = None
+if os.getenv('DATABASE_POOL', 'False').lower() == 'true':
+    server_connections = os.getenv('DATABASE_MAX_CONNECTIONS')
+    workers = int(os.getenv('GUNICORN_WORKERS', str(min(2 * (os.cpu_count() or 1) + 1, 8))))
+    default_pool_size = per_worker_pool_size(int(server_connections), workers) if server_connections else 4
+    DATABASE_POOL = pool_options(
+        min_size=int(os.getenv('DATABASE_POOL_MIN_SIZE', '1')),
+        max_size=int(os.getenv('DATABASE_POOL_MAX_SIZE', str(default_pool_size))),
+        timeout=float(os.getenv('DATABASE_POOL_TIMEOUT', '10')),
+    )
 if DATABASE_URL:
-    DATABASES['default'] = dj_database_url.parse(DATABASE_URL, conn_max_age=600, ssl_require=False)
+    DATABASES['default'] = database_config(DATABASE_URL, DATABASE_CONN_MAX_AGE, DATABASE_POOL)
+
+# Read replicas (comma-separated URLs, aliases replica_1..N). Safe requests read
+# DATABASE_REPLICA_APPS from one of them; see backend_project/routers.py for when
+# reads fall back to the primary (DATABASE_REPLICA_LAG seconds after a write, and
+# DATABASE_READ_YOUR_WRITES_SECONDS for a browser after an admin save).
+DATABASE_REPLICAS = []
+for index, url in enumerate(filter(None, (url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(','))), 1):
+    DATABASES[f'replica_{index}'] = replica_config(url, DATABASE_CONN_MAX_AGE, DATABASE_POOL)
+    DATABASE_REPLICAS.append(f'replica_{index}')
+DATABASE_REPLICA_APPS = ['blog']
+DATABASE_REPLICA_LAG = float(os.getenv('DATABASE_REPLICA_LAG', '2'))
+DATABASE_READ_YOUR_WRITES_SECONDS = int(os.getenv('DATABASE_READ_YOUR_WRITES_SECONDS', '60'))
+DATABASE_ROUTERS = ['backend_project.routers.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', ''),
+    }
+}
+
+# Alias used for the versioned blog API response cache. Use a shared backend
+# (Redis, file) in production so all workers see the same content version.
+BLOG_CACHE_ALIAS = os.getenv('BLOG_CACHE_ALIAS', 'default')
+BLOG_CACHE_TIMEOUT = int(os.getenv('BLOG_CACHE_TIMEOUT', str(60 * 60 * 24)))
 
 
 # Password validation
@@ -133,6 +190,66 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Written at image build time next to the collected static files; entrypoint.sh
+# skips `migrate` when the database has applied everything listed in it
+# (backend_project/startup.py).
+STARTUP_MIGRATION_GRAPH = Path(os.getenv('STARTUP_MIGRATION_GRAPH', BASE_DIR / 'migration-graph.json'))
+
+# On-demand resizing at MEDIA_URL + '_r/<w>x<h>/<path>' (backend_project/media.py):
+# an LRU disk cache bounded by total bytes, the only sizes served ("WxH" pairs,
+# 0 keeps the aspect ratio), and the hosts whose https images (hero_image_url,
+# avatar_url) may be fetched and resized.
+MEDIA_RESIZE_CACHE_ROOT = Path(os.getenv('MEDIA_RESIZE_CACHE_ROOT', MEDIA_ROOT / '_resized'))
+MEDIA_RESIZE_CACHE_MAX_BYTES = int(os.getenv('MEDIA_RESIZE_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+MEDIA_RESIZE_SIZES = [
+    tuple(int(side) for side in size.strip().split('x'))
+    for size in os.getenv('MEDIA_RESIZE_SIZES', '1600x0,1200x0,800x0,400x0,96x96').split(',')
+    if size.strip()
+]
+MEDIA_RESIZE_REMOTE_HOSTS = [host.strip() for host in os.getenv('MEDIA_RESIZE_REMOTE_HOSTS', '').split(',') if host.strip()]
+
+# Public origin (e.g. https://api.example.com) baked into pre-rendered sitemaps.
+# Leave empty to render blog_sitemap on every request instead.
+BLOG_SITEMAP_ORIGIN = os.getenv('BLOG_SITEMAP_ORIGIN', '')
+BLOG_SITEMAP_ROOT = Path(os.getenv('BLOG_SITEMAP_ROOT', MEDIA_ROOT / 'sitemaps'))
+# A save rebuilds the artifacts in its own thread only when they are older than
+# this many seconds; later saves just mark them stale for the next request.
+BLOG_SITEMAP_REBUILD_INTERVAL = float(os.getenv('BLOG_SITEMAP_REBUILD_INTERVAL', '30'))
+
+# 'streaming' (single-pass, falls back to bleach for unusual markup) or 'bleach'.
+BLOG_SANITIZER_BACKEND = os.getenv('BLOG_SANITIZER_BACKEND', 'streaming')
+
+# Serve blog post list/detail bytes straight from stored cards (see blog/payloads.py).
+BLOG_RAW_PAYLOADS = os.getenv('BLOG_RAW_PAYLOADS', 'True') == 'True'
+
+# Responsive hero image variants (blog/images.py): widths in pixels, output
+# formats (avif, webp, jpeg) and the size of the process pool (0 resizes inline).
+BLOG_HERO_WIDTHS = [int(width) for width in os.getenv('BLOG_HERO_WIDTHS', '480,960,1440,1920').split(',') if width.strip()]
+BLOG_HERO_FORMATS = [name.strip() for name in os.getenv('BLOG_HERO_FORMATS', 'avif,webp,jpeg').split(',') if name.strip()]
+BLOG_IMAGE_WORKERS = int(os.getenv('BLOG_IMAGE_WORKERS', '2'))
+
+# Per-view SQL budgets (backend_project/instrumentation.py). Server-Timing headers
+# are meant for debug/staging; enforcement turns overruns into errors (tests).
+QUERY_BUDGET_SERVER_TIMING = os.getenv('QUERY_BUDGET_SERVER_TIMING', str(DEBUG)).lower() == 'true'
+QUERY_BUDGET_ENFORCE = os.getenv('QUERY_BUDGET_ENFORCE', 'False').lower() == 'true'
+TEST_RUNNER = 'backend_project.instrumentation.QueryBudgetTestRunner'
+
+# Request metrics served at /api/_metrics (backend_project/metrics.py). Scrapes need
+# the bearer token when one is set, otherwise they must come from METRICS_ALLOWED_IPS.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip.strip()]
+
+# Contact/lead/workshop ingestion (contact/spool.py): 'direct' inserts in the request;
+# 'spool' answers 202 with a receipt and a background thread writes batches.
+CONTACT_INGEST_MODE = os.getenv('CONTACT_INGEST_MODE', 'direct')
+CONTACT_SPOOL_PATH = Path(os.getenv('CONTACT_SPOOL_PATH', BASE_DIR / 'contact-spool.sqlite3'))
+CONTACT_SPOOL_BATCH_SIZE = int(os.getenv('CONTACT_SPOOL_BATCH_SIZE', '500'))
+CONTACT_SPOOL_FLUSH_INTERVAL = float(os.getenv('CONTACT_SPOOL_FLUSH_INTERVAL', '1'))
+CONTACT_SPOOL_WORKER = os.getenv('CONTACT_SPOOL_WORKER', 'True').lower() == 'true'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,163 @@
+"""Container start: wait for the database, migrate only when needed, report timings.
+
+Run by ``entrypoint.sh`` before it execs the server. Static files are collected
+when the image is built, and so is the migration graph: ``--write-graph``
+stores every migration the code defines (plus a fingerprint of them) in
+``STARTUP_MIGRATION_GRAPH``. At start the graph is compared with the
+``django_migrations`` table in one query, the same question
+``migrate --check`` answers, without loading the app registry or importing a
+single migration. ``migrate`` only runs when something is unapplied (or the
+graph file is missing).
+
+Run from ``src/``::
+
+  python -m backend_project.startup [--write-graph]
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import time
+import warnings
+from pathlib import Path
+
+STARTED_ENV = 'STARTUP_STARTED'
+DATABASE_RETRIES = 10
+RETRY_DELAY = 2
+# MigrationRecorder's table; its model cannot be used before the app registry is ready.
+MIGRATIONS_TABLE = 'django_migrations'
+
+
+class Timings:
+  def __init__(self):
+    self.phases: list[tuple[str, float, str]] = []
+
+  def record(self, name: str, started: float, note: str = '') -> None:
+    self.phases.append((name, time.perf_counter() - started, note))
+
+  def report(self, total: float) -> str:
+    lines = ['startup timing:']
+    for name, seconds, note in [*self.phases, ('total', total, '')]:
+      lines.append(f'  {name:<12}{seconds:>8.3f}s  {note}'.rstrip())
+    return '\n'.join(lines)
+
+
+def graph_fingerprint(migrations: list[tuple[str, str]]) -> str:
+  return hashlib.sha256(json.dumps(sorted(migrations)).encode()).hexdigest()
+
+
+def migration_graph() -> list[tuple[str, str]]:
+  """Every migration ``migrate`` would apply to an empty database; needs ``django.setup()``."""
+  from django.db.migrations.loader import MigrationLoader
+
+  loader = MigrationLoader(None, ignore_no_migrations=True)
+  return sorted(loader.graph.nodes)
+
+
+def write_graph(path: Path) -> str:
+  migrations = migration_graph()
+  fingerprint = graph_fingerprint(migrations)
+  path.write_text(json.dumps({'fingerprint': fingerprint, 'migrations': migrations}))
+  return fingerprint
+
+
+def read_graph(path: Path) -> dict | None:
+  try:
+    graph = json.loads(path.read_text())
+  except (OSError, ValueError):
+    return None
+  migrations = [tuple(migration) for migration in graph.get('migrations', ())]
+  if graph.get('fingerprint') != graph_fingerprint(migrations):
+    return None
+  return {'fingerprint': graph['fingerprint'], 'migrations': migrations}
+
+
+def wait_for_database(connection) -> int:
+  from django.db.utils import OperationalError
+
+  for attempt in range(1, DATABASE_RETRIES + 1):
+    try:
+      connection.ensure_connection()
+      return attempt
+    except OperationalError:
+      if attempt == DATABASE_RETRIES:
+        raise SystemExit('Database not ready')
+      time.sleep(RETRY_DELAY)
+
+
+def unapplied(connection, migrations: list[tuple[str, str]]) -> list[tuple[str, str]]:
+  """The migrations in ``migrations`` that ``connection`` has not recorded; works before ``django.setup()``."""
+  with warnings.catch_warnings():
+    # Querying before the app registry is loaded is the point here.
+    warnings.filterwarnings('ignore', 'Accessing the database during app initialization', RuntimeWarning)
+    with connection.cursor() as cursor:
+      if MIGRATIONS_TABLE not in connection.introspection.table_names(cursor):
+        return list(migrations)
+      cursor.execute(f'SELECT app, name FROM {connection.ops.quote_name(MIGRATIONS_TABLE)}')
+      applied = {tuple(row) for row in cursor.fetchall()}
+  return [migration for migration in migrations if migration not in applied]
+
+
+def migrate(connection, graph_path: Path, timings: Timings) -> None:
+  graph = read_graph(graph_path)
+  if graph is not None:
+    started = time.perf_counter()
+    pending = unapplied(connection, graph['migrations'])
+    note = f'graph {graph["fingerprint"][:12]}, {len(pending)} unapplied'
+    timings.record('check', started, note)
+    if not pending:
+      return
+
+  import django
+  from django.core.management import call_command
+
+  started = time.perf_counter()
+  django.setup()
+  timings.record('setup', started)
+  started = time.perf_counter()
+  call_command('migrate', interactive=False, verbosity=1)
+  timings.record('migrate', started, 'no migration graph' if graph is None else '')
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--write-graph', action='store_true', help='store the migration graph (at image build time)')
+  options = parser.parse_args(argv)
+
+  started = time.perf_counter()
+  # The entrypoint records when the container started, so interpreter start-up is counted too.
+  elapsed_before = max(0.0, time.time() - float(os.getenv(STARTED_ENV, time.time())))
+  os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_project.settings')
+  timings = Timings()
+
+  from django.conf import settings
+
+  graph_path = Path(settings.STARTUP_MIGRATION_GRAPH)
+  timings.record('settings', started)
+
+  if options.write_graph:
+    import django
+
+    django.setup()
+    print(f'Wrote migration graph {write_graph(graph_path)[:12]} to {graph_path}')
+    return
+
+  from django.db import DEFAULT_DB_ALIAS, connections
+
+  connection = connections[DEFAULT_DB_ALIAS]
+  phase = time.perf_counter()
+  attempts = wait_for_database(connection)
+  timings.record('database', phase, f'{attempts} attempt{"s" if attempts > 1 else ""}')
+
+  migrate(connection, graph_path, timings)
+  connection.close()
+
+  if elapsed_before:
+    timings.phases.insert(0, ('interpreter', elapsed_before, 'python start-up and imports'))
+  print(timings.report(elapsed_before + time.perf_counter() - started), flush=True)
+
+
+if __name__ == '__main__':
+  main()
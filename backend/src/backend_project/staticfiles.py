@@ -0,0 +1,33 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+  """``WhiteNoiseMiddleware`` that also runs natively in an async middleware chain.
+
+  The stock middleware is sync-only, which makes Django hop to a thread (and
+  back) around every request under ASGI. Lookups here are a dict access, and
+  opening the file is left to the response, which Django streams off the loop.
+  """
+
+  sync_capable = True
+  async_capable = True
+
+  def __init__(self, get_response=None, **kwargs):
+    super().__init__(get_response, **kwargs)
+    if iscoroutinefunction(self.get_response):
+      markcoroutinefunction(self)
+
+  def __call__(self, request):
+    if iscoroutinefunction(self):
+      return self.__acall__(request)
+    return super().__call__(request)
+
+  async def __acall__(self, request):
+    if self.autorefresh:
+      static_file = await sync_to_async(self.find_file)(request.path_info)
+    else:
+      static_file = self.files.get(request.path_info)
+    if static_file is not None:
+      return self.serve(static_file, request)
+    return await self.get_response(request)
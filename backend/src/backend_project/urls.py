@@ -19,8 +19,17 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from .media import RESIZE_PREFIX, resize_view
+from .metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/_metrics', metrics_view, name='metrics'),
+    path(
+        f"{settings.MEDIA_URL.lstrip('/')}{RESIZE_PREFIX}/<int:width>x<int:height>/<path:path>",
+        resize_view,
+        name='media-resize',
+    ),
     path('api/', include('contact.urls', namespace='contact')),
     path('api/blog/', include('blog.urls', namespace='blog')),
 ]
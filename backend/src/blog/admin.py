@@ -1,5 +1,7 @@
 from django.contrib import admin
 
+from backend_project.routers import pin_to_primary
+
 from .models import BlogAuthor, BlogCategory, BlogPost
 
 
@@ -39,3 +41,16 @@ class BlogPostAdmin(admin.ModelAdmin):
       'fields': ('created_at', 'updated_at')
     })
   )
+
+  def save_model(self, request, obj, form, change):
+    super().save_model(request, obj, form, change)
+    # Replicas may not have the change yet; let this editor see it straight away.
+    pin_to_primary(request)
+
+  def delete_model(self, request, obj):
+    super().delete_model(request, obj)
+    pin_to_primary(request)
+
+  def delete_queryset(self, request, queryset):
+    super().delete_queryset(request, queryset)
+    pin_to_primary(request)
@@ -0,0 +1,23 @@
+from django.urls import URLPattern
+
+from . import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+app_name = 'blog'
+
+# Same patterns and names as ``blog.urls`` (router routes and format suffixes
+# included) so ``reverse()`` and cache keys do not depend on the server mode.
+ASYNC_VIEWS = {
+  'api-root': async_views.api_root,
+  'blog-posts-list': async_views.post_list,
+  'blog-posts-detail': async_views.post_detail,
+  'blog-categories-list': async_views.category_list,
+  'blog-categories-detail': async_views.category_detail,
+  'blog-sitemap': async_views.blog_sitemap,
+  'blog-sitemap-page': async_views.blog_sitemap_page
+}
+
+urlpatterns = [
+  URLPattern(pattern.pattern, ASYNC_VIEWS[pattern.name], pattern.default_args, pattern.name)
+  for pattern in sync_urlpatterns
+]
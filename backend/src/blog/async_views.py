@@ -0,0 +1,236 @@
+"""Async counterparts of ``blog.views``, routed by ``blog.async_urls`` when ``ASYNC_VIEWS`` is on.
+
+Cache hits, page-number listings, post detail, categories and sitemaps run
+on the event loop with the async cache and ORM APIs, producing the same
+bytes, validators and cache entries as the DRF views. Requests these views
+do not reproduce (keyset cursors, search, ``BLOG_RAW_PAYLOADS`` off, other
+renderers, non-GET methods) go to the DRF viewset in a worker thread.
+"""
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.urls import reverse
+
+from backend_project.async_api import async_api_view, render
+from backend_project.instrumentation import query_budget
+
+from .cache import alookup_response, aresponse_cache_key, astore_response, cacheable
+from .conditional import abuild_validators, aconditional_on, revalidate
+from .models import BlogCategory, BlogPost
+from .pagination import BlogPostKeysetPagination, BlogPostPagination
+from .payloads import afetch_detail, raw_detail_response, raw_list_response, raw_renderer
+from .serializers import BlogCategorySerializer, BlogPostCardSerializer, BlogPostDetailSerializer
+from .sitemap_artifacts import INDEX_NAME, artifact_origin, page_name
+from .sitemaps import (
+  SITEMAP_CHUNK_SIZE,
+  UrlBuilder,
+  aiter_urlset,
+  iter_sitemap_index,
+  max_urls_per_sitemap,
+  page_count,
+  sitemap_queryset
+)
+from .urls import router
+from .views import (
+  BlogCategoryViewSet,
+  BlogPostViewSet,
+  _published_posts,
+  _serve_sitemap_artifact,
+  _sitemap_encoding,
+  _sitemap_response,
+  blog_sitemap as sync_blog_sitemap,
+  blog_sitemap_page as sync_blog_sitemap_page,
+  post_queryset,
+  post_validator_queryset
+)
+
+POSTS = 'blog-posts'
+CATEGORIES = 'blog-categories'
+VARIANT_QUERY_PARAMS = BlogPostViewSet.variant_query_params
+
+_post_list = BlogPostViewSet.as_view({'get': 'list'}, basename=POSTS, detail=False)
+_post_detail = BlogPostViewSet.as_view({'get': 'retrieve'}, basename=POSTS, detail=True)
+_category_list = BlogCategoryViewSet.as_view({'get': 'list'}, basename=CATEGORIES, detail=False)
+_category_detail = BlogCategoryViewSet.as_view({'get': 'retrieve'}, basename=CATEGORIES, detail=True)
+_api_root = router.get_api_root_view()
+
+
+def _handled_by_drf(request, drf_request) -> bool:
+  params = request.GET
+  return (
+    raw_renderer(drf_request) is None
+    or BlogPostKeysetPagination.cursor_query_param in params
+    or bool(params.get('search'))
+  )
+
+
+async def _cached_or_render(drf_request, parts: tuple[str, ...], validator_queryset, build, query_params=()):
+  """The cache/validator sequence of ``VersionedResponseCacheMixin`` + ``ConditionalGetMixin``."""
+  use_cache = cacheable(drf_request)
+  if use_cache:
+    key = await aresponse_cache_key(drf_request, *parts, query_params=query_params)
+    cached = await alookup_response(drf_request, key)
+    if cached is not None:
+      return cached
+
+  validators = await abuild_validators(validator_queryset, drf_request, *parts, query_params=query_params)
+  not_modified = revalidate(drf_request, validators)
+  if not_modified is not None:
+    return not_modified
+
+  response = await build()
+  if response.status_code == 200:
+    validators.apply(response)
+    if use_cache:
+      await astore_response(key, response)
+  return response
+
+
+@query_budget(BlogPostViewSet.query_budget['list'])
+@async_api_view(_post_list)
+async def post_list(request, drf_request, **kwargs):
+  if _handled_by_drf(request, drf_request):
+    return await sync_to_async(_post_list)(request, **kwargs)
+
+  queryset = post_queryset('list', request.GET.get('category'))
+
+  async def build():
+    pagination = BlogPostPagination()
+    posts = await pagination.apaginate_queryset(queryset, drf_request)
+    envelope = pagination.get_paginated_response([]).data
+    response = raw_list_response(posts, envelope, request, drf_request.accepted_renderer)
+    if response is None:
+      envelope['results'] = await sync_to_async(_card_data)(posts, drf_request)
+      response = render(drf_request, envelope)
+    return response
+
+  return await _cached_or_render(drf_request, (POSTS, 'list', ''), queryset, build, VARIANT_QUERY_PARAMS)
+
+
+def _card_data(posts, drf_request):
+  # Rows without a stored card are serialized with queries, off the event loop.
+  return BlogPostCardSerializer(posts, many=True, context={'request': drf_request}).data
+
+
+@query_budget(BlogPostViewSet.query_budget['retrieve'])
+@async_api_view(_post_detail)
+async def post_detail(request, drf_request, slug, **kwargs):
+  if _handled_by_drf(request, drf_request):
+    return await sync_to_async(_post_detail)(request, slug=slug, **kwargs)
+
+  queryset = post_queryset('retrieve', request.GET.get('category'))
+
+  async def build():
+    post, related = await afetch_detail(queryset, slug=slug)
+    if post is None:
+      raise Http404('No BlogPost matches the given query.')
+    response = raw_detail_response(post, related, request, drf_request.accepted_renderer)
+    if response is None:
+      response = render(drf_request, await sync_to_async(_detail_data)(queryset, slug, drf_request))
+    return response
+
+  return await _cached_or_render(
+    drf_request, (POSTS, 'retrieve', slug), post_validator_queryset(slug), build, VARIANT_QUERY_PARAMS
+  )
+
+
+def _detail_data(queryset, slug, drf_request):
+  return BlogPostDetailSerializer(queryset.get(slug=slug), context={'request': drf_request}).data
+
+
+@query_budget(BlogCategoryViewSet.query_budget['list'])
+@async_api_view(_category_list)
+async def category_list(request, drf_request, **kwargs):
+  queryset = BlogCategory.objects.all()
+
+  async def build():
+    return render(drf_request, [BlogCategorySerializer(category).data async for category in queryset])
+
+  return await _cached_or_render(drf_request, (CATEGORIES, 'list', ''), queryset, build)
+
+
+@query_budget(BlogCategoryViewSet.query_budget['retrieve'])
+@async_api_view(_category_detail)
+async def category_detail(request, drf_request, slug, **kwargs):
+  queryset = BlogCategory.objects.filter(slug=slug)
+
+  async def build():
+    category = await queryset.afirst()
+    if category is None:
+      raise Http404('No BlogCategory matches the given query.')
+    return render(drf_request, BlogCategorySerializer(category).data)
+
+  return await _cached_or_render(drf_request, (CATEGORIES, 'retrieve', slug), queryset, build)
+
+
+@query_budget(_api_root.cls.query_budget)
+@async_api_view(_api_root)
+async def api_root(request, drf_request, format=None):
+  return render(drf_request, {
+    prefix: request.build_absolute_uri(
+      reverse(f'blog:{basename}-list', kwargs={'format': format} if format else None)
+    )
+    for prefix, _, basename in router.registry
+  })
+
+
+async def _aiterate(chunks):
+  for chunk in chunks:
+    yield chunk
+
+
+async def _arows(queryset):
+  # QuerySet.aiterator() runs values_list() queries on the event loop (their
+  # iterable is not a lazy generator), so fetch each chunk in a thread instead.
+  rows = queryset.iterator(chunk_size=SITEMAP_CHUNK_SIZE)
+  fetch = sync_to_async(lambda: list(islice(rows, SITEMAP_CHUNK_SIZE)))
+  try:
+    while chunk := await fetch():
+      for row in chunk:
+        yield row
+  finally:
+    # Runs when the stream is abandoned too (client disconnect): closing the
+    # generator closes the server-side cursor it holds open.
+    await sync_to_async(rows.close)()
+
+
+@aconditional_on(_published_posts, variant=_sitemap_encoding)
+async def _stream_sitemap(request):
+  posts = BlogPost.objects.published()
+  build_url = UrlBuilder.for_request(request)
+  total = await posts.acount()
+  if total > max_urls_per_sitemap():
+    return _sitemap_response(request, _aiterate(iter_sitemap_index(page_count(total), build_url)))
+
+  rows = _arows(sitemap_queryset(posts))
+  return _sitemap_response(request, aiter_urlset(rows, build_url))
+
+
+@aconditional_on(_published_posts, variant=_sitemap_encoding)
+async def _stream_sitemap_page(request, page: int):
+  posts = BlogPost.objects.published()
+  if page < 1 or page > page_count(await posts.acount()):
+    raise Http404('Sitemap page out of range.')
+
+  per_page = max_urls_per_sitemap()
+  offset = (page - 1) * per_page
+  rows = _arows(sitemap_queryset(posts)[offset:offset + per_page])
+  return _sitemap_response(request, aiter_urlset(rows, UrlBuilder.for_request(request)))
+
+
+async def _serve_artifact(request, name: str):
+  # Artifacts may need a rebuild first, which is synchronous database work.
+  if not artifact_origin():
+    return None
+  return await sync_to_async(_serve_sitemap_artifact)(request, name)
+
+
+@query_budget(sync_blog_sitemap.query_budget)
+async def blog_sitemap(request):
+  return await _serve_artifact(request, INDEX_NAME) or await _stream_sitemap(request)
+
+
+@query_budget(sync_blog_sitemap_page.query_budget)
+async def blog_sitemap_page(request, page: int):
+  return await _serve_artifact(request, page_name(page)) or await _stream_sitemap_page(request, page=page)
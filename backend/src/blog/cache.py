@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.utils.http import parse_http_date_safe
+
+from .conditional import PAYLOAD_VERSION, not_modified_response, representation
+
+CONTENT_VERSION_KEY = 'blog:content-version'
+# Epoch seconds at which the next scheduled post goes live. Reaching it
+# invalidates everything just like a save would.
+NEXT_PUBLISH_KEY = 'blog:next-publish-at'
+# Bump the trailing number when the shape of ``cache_entry`` changes.
+RESPONSE_KEY_PREFIX = 'blog:response:2'
+# Replayed on cache hits, next to the body.
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Vary', 'Allow')
+NO_SCHEDULED_POSTS = 0
+
+
+def get_blog_cache():
+  return caches[getattr(settings, 'BLOG_CACHE_ALIAS', 'default')]
+
+
+def _response_timeout() -> int | None:
+  # Old versions are never read again; the timeout only bounds how long they linger.
+  return getattr(settings, 'BLOG_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def _next_publish_at() -> int:
+  from .models import BlogPost
+
+  upcoming = BlogPost.objects.next_publish_at()
+  return int(upcoming.timestamp()) if upcoming else NO_SCHEDULED_POSTS
+
+
+def _bump() -> int:
+  cache = get_blog_cache()
+  try:
+    version = cache.incr(CONTENT_VERSION_KEY)
+  except ValueError:
+    # Missing key (first run or evicted): start from a clock value so versions
+    # handed out before the eviction are never reused.
+    version = time.time_ns()
+    cache.set(CONTENT_VERSION_KEY, version, None)
+  cache.set(NEXT_PUBLISH_KEY, _next_publish_at(), None)
+  return version
+
+
+def bump_content_version() -> None:
+  """Invalidate every cached blog response.
+
+  Bumps immediately and, inside a transaction, once more after commit so a
+  response rendered from pre-commit data cannot outlive the write.
+  """
+  _bump()
+  if connection.in_atomic_block:
+    transaction.on_commit(_bump)
+
+
+def _current_version(values: dict) -> int | None:
+  """The cached content version, or ``None`` when it is missing or a scheduled post went live."""
+  version = values.get(CONTENT_VERSION_KEY)
+  next_publish_at = values.get(NEXT_PUBLISH_KEY, NO_SCHEDULED_POSTS)
+  if next_publish_at != NO_SCHEDULED_POSTS and time.time() >= next_publish_at:
+    return None
+  return version
+
+
+def get_content_version() -> int:
+  version = _current_version(get_blog_cache().get_many([CONTENT_VERSION_KEY, NEXT_PUBLISH_KEY]))
+  return _bump() if version is None else version
+
+
+async def aget_content_version() -> int:
+  version = _current_version(await get_blog_cache().aget_many([CONTENT_VERSION_KEY, NEXT_PUBLISH_KEY]))
+  return await sync_to_async(_bump)() if version is None else version
+
+
+def _response_cache_key(version: int, request, parts, query_params: tuple[str, ...]) -> str:
+  params = sorted(
+    (name, value)
+    for name in query_params
+    for value in request.GET.getlist(name)
+  )
+  raw = '|'.join([str(PAYLOAD_VERSION), request.scheme, request.get_host(), representation(request), *parts, urlencode(params)])
+  digest = hashlib.sha256(raw.encode('utf-8')).hexdigest()
+  return f'{RESPONSE_KEY_PREFIX}:{version}:{digest}'
+
+
+def response_cache_key(request, *parts: str, query_params: tuple[str, ...] = ()) -> str:
+  return _response_cache_key(get_content_version(), request, parts, query_params)
+
+
+async def aresponse_cache_key(request, *parts: str, query_params: tuple[str, ...] = ()) -> str:
+  return _response_cache_key(await aget_content_version(), request, parts, query_params)
+
+
+def cacheable(request) -> bool:
+  """Whether ``request``'s representation may be cached.
+
+  Media type parameters (``Accept: application/json; indent=4``) change the
+  body but are open-ended, so such responses are rendered every time instead
+  of letting each spelling take a cache entry.
+  """
+  media_type = getattr(request, 'accepted_media_type', None)
+  return media_type is None or ';' not in media_type
+
+
+def cache_entry(rendered) -> tuple:
+  return (rendered.content, tuple((name, rendered[name]) for name in CACHED_HEADERS if rendered.has_header(name)))
+
+
+def cached_response(request, cached: tuple) -> HttpResponse:
+  """Replay a ``cache_entry``, answering revalidations with a ``304``."""
+  content, headers = cached
+  headers = dict(headers)
+  last_modified = headers.get('Last-Modified')
+  not_modified = not_modified_response(request, headers.get('ETag'), last_modified and parse_http_date_safe(last_modified))
+  if not_modified is not None:
+    if 'Vary' in headers:
+      not_modified['Vary'] = headers['Vary']
+    return not_modified
+  response = HttpResponse(content)
+  for name, value in headers.items():
+    response[name] = value
+  response['X-Blog-Cache'] = 'hit'
+  return response
+
+
+def lookup_response(request, key: str) -> HttpResponse | None:
+  cached = get_blog_cache().get(key)
+  return None if cached is None else cached_response(request, cached)
+
+
+async def alookup_response(request, key: str) -> HttpResponse | None:
+  cached = await get_blog_cache().aget(key)
+  return None if cached is None else cached_response(request, cached)
+
+
+def store_response(key: str, response) -> None:
+  """Cache ``response`` (once rendered, for DRF responses) and mark it as a miss."""
+  def store(rendered):
+    get_blog_cache().set(key, cache_entry(rendered), _response_timeout())
+
+  if hasattr(response, 'add_post_render_callback'):
+    response.add_post_render_callback(store)
+  else:
+    store(response)
+  response['X-Blog-Cache'] = 'miss'
+
+
+async def astore_response(key: str, response) -> None:
+  await get_blog_cache().aset(key, cache_entry(response), _response_timeout())
+  response['X-Blog-Cache'] = 'miss'
+
+
+class VersionedResponseCacheMixin:
+  """Serve ``list``/``retrieve`` from the blog cache until content changes.
+
+  Entries are keyed on the global content version, the negotiated renderer,
+  the view, the lookup value and the query parameters named in
+  ``variant_query_params``; any other parameter is ignored so it cannot be
+  used to fill the cache. ``ETag``, ``Last-Modified``, ``Vary`` and ``Allow``
+  are stored with the body so a cached revalidation is answered without
+  touching the database.
+  """
+
+  variant_query_params: tuple[str, ...] = ()
+
+  def list(self, request, *args, **kwargs):
+    return self._cached(super().list, request, *args, **kwargs)
+
+  def retrieve(self, request, *args, **kwargs):
+    return self._cached(super().retrieve, request, *args, **kwargs)
+
+  def _cached(self, handler, request, *args, **kwargs):
+    if not cacheable(request):
+      return handler(request, *args, **kwargs)
+    lookup = str(kwargs.get(self.lookup_url_kwarg or self.lookup_field, ''))
+    key = response_cache_key(
+      request,
+      self.basename or type(self).__name__,
+      self.action,
+      lookup,
+      query_params=self.variant_query_params
+    )
+    cached = lookup_response(request, key)
+    if cached is not None:
+      return cached
+
+    response = handler(request, *args, **kwargs)
+    if response.status_code == 200:
+      store_response(key, response)
+    return response
@@ -0,0 +1,48 @@
+"""Precomputed list "cards": the stored ``BlogPostListSerializer`` output.
+
+The card is rendered without a request, so ``hero_image_url`` and the
+``hero_image_variants`` srcsets hold relative media URLs for uploaded images;
+``BlogPostCardSerializer`` makes them absolute when serving. Cards are
+refreshed by ``blog.signals`` whenever the post, its author or its
+categories change.
+"""
+from __future__ import annotations
+
+import typing
+
+from django.db import router
+from rest_framework.renderers import JSONRenderer
+
+REFRESH_BATCH_SIZE = 500
+
+
+def render_card(post) -> str:
+  from .serializers import BlogPostListSerializer
+
+  return JSONRenderer().render(BlogPostListSerializer(post).data).decode('utf-8')
+
+
+def refresh_cards(post_ids: typing.Iterable[int], using: str | None = None, batch_size: int = REFRESH_BATCH_SIZE) -> dict[int, str]:
+  """Re-render and store the cards of ``post_ids``; returns the new cards by post id."""
+  from .models import BlogPost
+
+  post_ids = sorted(set(post_ids))
+  using = using or router.db_for_write(BlogPost)
+  cards: dict[int, str] = {}
+  for start in range(0, len(post_ids), batch_size):
+    posts = list(
+      BlogPost.objects.using(using)
+      .filter(pk__in=post_ids[start:start + batch_size])
+      .select_related('author')
+      .prefetch_related('categories')
+    )
+    for post in posts:
+      post.card_json = cards[post.pk] = render_card(post)
+    BlogPost.objects.using(using).bulk_update(posts, ['card_json'])
+  return cards
+
+
+def rebuild_all_cards(batch_size: int = REFRESH_BATCH_SIZE) -> int:
+  from .models import BlogPost
+
+  return len(refresh_cards(BlogPost.objects.values_list('pk', flat=True), batch_size=batch_size))
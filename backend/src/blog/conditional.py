@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers, quote_etag
+from django.utils.http import http_date
+
+# Bump when the shape of a response changes without the data changing, so
+# clients holding an old ETag re-download the new payload.
+PAYLOAD_VERSION = 2
+
+
+@dataclass(frozen=True)
+class Validators:
+  etag: str
+  last_modified: int | None
+  negotiated: bool = False
+
+  def apply(self, response) -> None:
+    response['ETag'] = self.etag
+    if self.last_modified is not None:
+      response['Last-Modified'] = http_date(self.last_modified)
+    if self.negotiated:
+      # The ETag depends on the Accept header.
+      patch_vary_headers(response, ['Accept'])
+
+
+def representation(request) -> str:
+  """The renderer and media type (``indent=`` included) DRF negotiated for ``request``; ``''`` outside DRF."""
+  renderer = getattr(request, 'accepted_renderer', None)
+  if renderer is None:
+    return ''
+  return f'{renderer.format}:{request.accepted_media_type}'
+
+
+def _fingerprint_aggregates() -> dict:
+  return {'rows': Count('pk', distinct=True), 'last': Max('updated_at')}
+
+
+def build_validators(queryset, request, *parts: str, query_params: tuple[str, ...] = ()) -> Validators:
+  """Fingerprint ``queryset`` with one ``COUNT``/``MAX(updated_at)`` aggregate.
+
+  ``parts``, the allowlisted ``query_params`` and the negotiated renderer
+  identify the representation (view, lookup, page, host, ``indent=``) so
+  differently rendered bodies never share a strong ETag.
+  """
+  stats = queryset.order_by().aggregate(**_fingerprint_aggregates())
+  return _validators(stats, request, parts, query_params)
+
+
+async def abuild_validators(queryset, request, *parts: str, query_params: tuple[str, ...] = ()) -> Validators:
+  stats = await queryset.order_by().aaggregate(**_fingerprint_aggregates())
+  return _validators(stats, request, parts, query_params)
+
+
+def _validators(stats: dict, request, parts, query_params: tuple[str, ...]) -> Validators:
+  last_modified = int(stats['last'].timestamp()) if stats['last'] else None
+  params = sorted(
+    (name, value)
+    for name in query_params
+    for value in request.GET.getlist(name)
+  )
+  raw = '|'.join([
+    str(PAYLOAD_VERSION),
+    request.scheme,
+    request.get_host(),
+    representation(request),
+    *parts,
+    repr(params),
+    str(stats['rows']),
+    stats['last'].isoformat() if stats['last'] else ''
+  ])
+  etag = quote_etag(hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32])
+  return Validators(etag=etag, last_modified=last_modified, negotiated=bool(representation(request)))
+
+
+def not_modified_response(request, etag: str | None, last_modified: int | None):
+  """Return a ``304`` (or ``412``) for ``request`` or ``None`` when the full body is needed."""
+  probe = HttpResponse()
+  if etag:
+    probe['ETag'] = etag
+  if last_modified is not None:
+    probe['Last-Modified'] = http_date(last_modified)
+  response = get_conditional_response(request, etag=etag, last_modified=last_modified, response=probe)
+  return None if response is probe else response
+
+
+def revalidate(request, validators: Validators):
+  """The ``304``/``412`` carrying ``validators`` when ``request`` needs no body, else ``None``."""
+  not_modified = not_modified_response(request, validators.etag, validators.last_modified)
+  if not_modified is not None:
+    validators.apply(not_modified)
+  return not_modified
+
+
+class ConditionalGetMixin:
+  """Answer revalidation requests for ``list``/``retrieve`` before serializing.
+
+  Subclasses may override ``get_validator_queryset`` when a representation
+  depends on more rows than the ones the view returns.
+  """
+
+  variant_query_params: tuple[str, ...] = ()
+
+  def list(self, request, *args, **kwargs):
+    return self._conditional(super().list, request, *args, **kwargs)
+
+  def retrieve(self, request, *args, **kwargs):
+    return self._conditional(super().retrieve, request, *args, **kwargs)
+
+  def get_validator_queryset(self):
+    queryset = self.filter_queryset(self.get_queryset())
+    if self.action == 'retrieve':
+      lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+      queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+    return queryset
+
+  def get_validators(self, request) -> Validators:
+    lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+    return build_validators(
+      self.get_validator_queryset(),
+      request,
+      self.basename or type(self).__name__,
+      self.action,
+      str(self.kwargs.get(lookup_url_kwarg, '')),
+      query_params=self.variant_query_params
+    )
+
+  def _conditional(self, handler, request, *args, **kwargs):
+    validators = self.get_validators(request)
+    not_modified = revalidate(request, validators)
+    if not_modified is not None:
+      return not_modified
+
+    response = handler(request, *args, **kwargs)
+    if response.status_code == 200:
+      validators.apply(response)
+    return response
+
+
+def _view_parts(view, request, kwargs, variant) -> list[str]:
+  parts = [view.__name__, *map(str, kwargs.values())]
+  if variant is not None:
+    parts.append(variant(request))
+  return parts
+
+
+def conditional_on(get_queryset, variant=None):
+  """Function-view counterpart of ``ConditionalGetMixin``.
+
+  ``get_queryset(request, *args, **kwargs)`` returns the rows the response is
+  built from; ``variant(request)`` names representations that differ for the
+  same rows (e.g. content encoding) so each gets its own strong ETag.
+  """
+  def decorator(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+      parts = _view_parts(view, request, kwargs, variant)
+      validators = build_validators(get_queryset(request, *args, **kwargs), request, *parts)
+      not_modified = not_modified_response(request, validators.etag, validators.last_modified)
+      if not_modified is not None:
+        return not_modified
+      response = view(request, *args, **kwargs)
+      if response.status_code == 200:
+        validators.apply(response)
+      return response
+    return wrapper
+  return decorator
+
+
+def aconditional_on(get_queryset, variant=None):
+  """``conditional_on`` for async views."""
+  def decorator(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+      parts = _view_parts(view, request, kwargs, variant)
+      validators = await abuild_validators(get_queryset(request, *args, **kwargs), request, *parts)
+      not_modified = not_modified_response(request, validators.etag, validators.last_modified)
+      if not_modified is not None:
+        return not_modified
+      response = await view(request, *args, **kwargs)
+      if response.status_code == 200:
+        validators.apply(response)
+      return response
+    return wrapper
+  return decorator
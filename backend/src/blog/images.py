@@ -0,0 +1,245 @@
+"""Responsive derivatives of ``BlogPost.hero_image``.
+
+When a post gets a new hero upload, ``schedule_hero_variants`` (called on
+commit by ``blog.signals``) hands the original to a process pool that
+resizes it to each of ``BLOG_HERO_WIDTHS`` in each of ``BLOG_HERO_FORMATS``,
+so decoding and encoding never run on a request thread. The results are
+stored next to the original under content-hashed names, which makes them
+safe to cache forever, and recorded in ``BlogPost.hero_image_variants``;
+the serializers turn that into a ``srcset`` per MIME type.
+
+``render_variants`` only depends on Pillow: it runs in spawned processes
+that never set up Django, so this module imports the blog models lazily.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, router, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (480, 960, 1440, 1920)
+DEFAULT_FORMATS = ('avif', 'webp', 'jpeg')
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg'}
+SAVE_OPTIONS = {
+  'avif': {'quality': 60},
+  'webp': {'quality': 80, 'method': 4},
+  'jpeg': {'quality': 82, 'optimize': True, 'progressive': True}
+}
+VARIANTS_DIRECTORY = 'blog/heroes/variants'
+
+
+def hero_widths() -> tuple[int, ...]:
+  return tuple(sorted(getattr(settings, 'BLOG_HERO_WIDTHS', DEFAULT_WIDTHS)))
+
+
+def hero_formats() -> tuple[str, ...]:
+  # AVIF needs a Pillow built with libavif; skip it rather than fail every upload.
+  return tuple(
+    image_format for image_format in getattr(settings, 'BLOG_HERO_FORMATS', DEFAULT_FORMATS)
+    if image_format in MIME_TYPES and (image_format != 'avif' or features.check('avif'))
+  )
+
+
+def target_widths(source_width: int, widths: tuple[int, ...]) -> list[int]:
+  """Configured widths narrower than the original, or just the original width (never upscaled)."""
+  return [width for width in widths if width < source_width] or [source_width]
+
+
+def render_variants(source: bytes, widths: tuple[int, ...], formats: tuple[str, ...]) -> dict:
+  """Decode ``source`` once and encode every width/format pair; runs in the pool."""
+  with Image.open(io.BytesIO(source)) as original:
+    image = ImageOps.exif_transpose(original)
+    image.load()
+  width, height = image.size
+  has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+  image = image.convert('RGBA' if has_alpha else 'RGB')
+
+  variants = []
+  for target in target_widths(width, widths):
+    resized = image if target == width else image.resize((target, round(height * target / width)), Image.Resampling.LANCZOS)
+    for image_format in formats:
+      # JPEG has no alpha channel.
+      encoded = resized.convert('RGB') if image_format == 'jpeg' and has_alpha else resized
+      buffer = io.BytesIO()
+      encoded.save(buffer, format=image_format.upper(), **SAVE_OPTIONS[image_format])
+      variants.append({'format': image_format, 'width': resized.width, 'height': resized.height, 'content': buffer.getvalue()})
+  return {'width': width, 'height': height, 'variants': variants}
+
+
+def variant_name(variant: dict) -> str:
+  # Named by content alone: identical output is stored once and a URL never changes meaning.
+  digest = hashlib.sha256(variant['content']).hexdigest()[:20]
+  return f"{VARIANTS_DIRECTORY}/{digest}-{variant['width']}w.{EXTENSIONS[variant['format']]}"
+
+
+def store_variants(source_name: str, rendered: dict, storage) -> dict:
+  """Save rendered files (unchanged content keeps its name) and build the ``hero_image_variants`` value."""
+  sources: dict[str, list] = {}
+  for variant in rendered['variants']:
+    name = variant_name(variant)
+    if not storage.exists(name):
+      name = storage.save(name, ContentFile(variant['content']))
+    sources.setdefault(variant['format'], []).append({'name': name, 'width': variant['width'], 'height': variant['height']})
+  return {'source': source_name, 'width': rendered['width'], 'height': rendered['height'], 'formats': sources}
+
+
+def srcset_payload(variants: dict, source_name: str | None, build_url=None) -> dict | None:
+  """The serialized form: intrinsic size plus a ``srcset`` string per MIME type, best format first.
+
+  ``None`` until variants of the current ``source_name`` have been built.
+  """
+  if not variants or not source_name or variants.get('source') != source_name:
+    return None
+
+  def url(name: str) -> str:
+    relative = default_storage.url(name)
+    return build_url(relative) if build_url is not None else relative
+
+  return {
+    'width': variants['width'],
+    'height': variants['height'],
+    'srcset': {
+      MIME_TYPES[image_format]: ', '.join(f"{url(entry['name'])} {entry['width']}w" for entry in entries)
+      for image_format, entries in sorted(variants['formats'].items(), key=lambda item: list(MIME_TYPES).index(item[0]))
+    }
+  }
+
+
+def absolute_srcset(payload: dict | None, build_url) -> dict | None:
+  """Make the URLs of a stored ``srcset_payload`` absolute, as the serializers do per request."""
+  if not payload:
+    return payload
+  return {
+    **payload,
+    'srcset': {
+      mime_type: ', '.join(
+        f'{build_url(url)} {descriptor}'
+        for url, descriptor in (candidate.rsplit(' ', 1) for candidate in srcset.split(', '))
+      )
+      for mime_type, srcset in payload['srcset'].items()
+    }
+  }
+
+
+_executor: ProcessPoolExecutor | None = None
+_lock = threading.Lock()
+
+
+def get_executor() -> ProcessPoolExecutor | None:
+  """The shared pool, or ``None`` when ``BLOG_IMAGE_WORKERS`` is 0 (render inline)."""
+  global _executor
+  workers = getattr(settings, 'BLOG_IMAGE_WORKERS', 2)
+  if workers <= 0:
+    return None
+  with _lock:
+    if _executor is None:
+      # Spawned, not forked: the web worker holds threads and database connections.
+      _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+  return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor) -> None:
+  global _executor
+  with _lock:
+    if _executor is executor:
+      _executor = None
+  executor.shutdown(wait=False)
+
+
+def _reset_after_fork() -> None:
+  global _executor, _lock
+  _executor = None
+  _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def apply_variants(post_id: int, source_name: str, rendered: dict, using: str | None = None) -> bool:
+  """Store ``rendered`` and attach it to the post, unless its hero changed in the meantime."""
+  from .cache import bump_content_version
+  from .cards import refresh_cards
+  from .models import BlogPost
+
+  using = using or router.db_for_write(BlogPost)
+  variants = store_variants(source_name, rendered, default_storage)
+  with transaction.atomic(using=using):
+    updated = BlogPost.objects.using(using).filter(pk=post_id, hero_image=source_name).update(
+      hero_image_variants=variants,
+      updated_at=timezone.now()
+    )
+    if updated:
+      refresh_cards([post_id], using)
+      bump_content_version()
+  return bool(updated)
+
+
+def build_hero_variants(post_id: int, source_name: str, using: str | None = None) -> Future:
+  """Render the variants of ``source_name`` for ``post_id`` in the pool (inline without one).
+
+  The returned future resolves to whether the post was updated once the
+  variants are stored; failures are logged and set on it.
+  """
+  done = Future()
+
+  def finish(render) -> None:
+    try:
+      applied = apply_variants(post_id, source_name, render(), using)
+    except Exception as exc:
+      logger.exception('Could not build variants of %s', source_name)
+      done.set_exception(exc)
+    else:
+      done.set_result(applied)
+
+  try:
+    with default_storage.open(source_name, 'rb') as source:
+      args = (source.read(), hero_widths(), hero_formats())
+  except OSError as exc:
+    logger.exception('Could not read %s', source_name)
+    done.set_exception(exc)
+    return done
+
+  executor = get_executor()
+  if executor is None:
+    finish(lambda: render_variants(*args))
+    return done
+
+  def finished(future: Future) -> None:
+    # Runs on the pool's management thread, which keeps its own connection.
+    try:
+      if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+        # A worker died mid-render and took the pool with it; the next upload starts a fresh one.
+        _discard_executor(executor)
+      finish(future.result)
+    finally:
+      close_old_connections()
+
+  try:
+    executor.submit(render_variants, *args).add_done_callback(finished)
+  except BrokenProcessPool as exc:
+    # A worker died (out of memory on a huge upload, say); start a fresh pool next time.
+    _discard_executor(executor)
+    logger.exception('Could not build variants of %s', source_name)
+    done.set_exception(exc)
+  return done
+
+
+def schedule_hero_variants(post, using: str | None = None) -> None:
+  """Build variants for ``post.hero_image`` once the current transaction commits."""
+  post_id, source_name = post.pk, post.hero_image.name
+  transaction.on_commit(lambda: build_hero_variants(post_id, source_name, using), using=using)
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from blog.images import build_hero_variants
+from blog.models import BlogPost
+
+
+class Command(BaseCommand):
+  help = 'Build the responsive variants of blog hero images (missing ones only, unless --force).'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--force', action='store_true', help='Rebuild variants that already exist.')
+
+  def handle(self, *args, **options):
+    posts = BlogPost.objects.exclude(hero_image='').exclude(hero_image__isnull=True).order_by('pk')
+    pending = [
+      build_hero_variants(pk, name)
+      for pk, name, variants in posts.values_list('pk', 'hero_image', 'hero_image_variants').iterator()
+      if options['force'] or variants.get('source') != name
+    ]
+    built = sum(1 for future in pending if future.exception() is None and future.result())
+    self.stdout.write(self.style.SUCCESS(f'Built hero variants for {built} of {len(pending)} posts.'))
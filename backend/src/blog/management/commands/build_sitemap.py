@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.sitemap_artifacts import artifact_origin, artifact_root, build_sitemap_artifacts
+
+
+class Command(BaseCommand):
+  help = 'Pre-render the blog sitemap (plain and gzip) so blog_sitemap can serve it from disk.'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--origin', default='', help='Public origin for <loc> URLs. Defaults to BLOG_SITEMAP_ORIGIN.')
+
+  def handle(self, *args, **options):
+    origin = options['origin'] or artifact_origin()
+    if not origin:
+      raise CommandError('Set BLOG_SITEMAP_ORIGIN or pass --origin.')
+    manifest = build_sitemap_artifacts(origin)
+    self.stdout.write(self.style.SUCCESS(
+      f"Wrote {manifest['pages']} sitemap page(s) to {artifact_root()} for {manifest['origin']}."
+    ))
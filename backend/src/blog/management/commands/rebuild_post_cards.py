@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog.cards import REFRESH_BATCH_SIZE, rebuild_all_cards
+
+
+class Command(BaseCommand):
+  help = 'Re-render the stored list card of every blog post (run after changing BlogPostListSerializer).'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--batch-size', type=int, default=REFRESH_BATCH_SIZE)
+
+  def handle(self, *args, **options):
+    written = rebuild_all_cards(batch_size=options['batch_size'])
+    self.stdout.write(self.style.SUCCESS(f'Rendered {written} post cards.'))
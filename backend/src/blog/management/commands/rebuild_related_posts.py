@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog.relations import REFRESH_BATCH_SIZE, rebuild_all_relations
+
+
+class Command(BaseCommand):
+  help = 'Recompute the precomputed related-posts table for every published post.'
+
+  def add_arguments(self, parser):
+    parser.add_argument('--batch-size', type=int, default=REFRESH_BATCH_SIZE)
+
+  def handle(self, *args, **options):
+    written = rebuild_all_relations(batch_size=options['batch_size'])
+    self.stdout.write(self.style.SUCCESS(f'Wrote {written} related-post rows.'))
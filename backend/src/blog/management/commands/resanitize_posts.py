@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from blog.cache import bump_content_version
+from blog.cards import refresh_cards
+from blog.models import BlogPost
+
+RESANITIZE_BATCH_SIZE = 200
+
+
+class Command(BaseCommand):
+  help = (
+    'Re-run the rich-text sanitizer over stored blog posts. Fields whose stored digest still matches '
+    'are skipped unless --force is given (e.g. after the allowlist changes).'
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument('--force', action='store_true', help='Sanitize every field even if its digest matches.')
+    parser.add_argument('--batch-size', type=int, default=RESANITIZE_BATCH_SIZE)
+
+  def handle(self, *args, **options):
+    content = [*BlogPost.sanitization.fields, 'reading_time_minutes']
+    # ``updated_at`` feeds the API's conditional validators, so it moves with the content (not with digests alone).
+    fields = [*content, 'sanitized_digests', 'updated_at']
+    scanned = updated = 0
+    batch: list[BlogPost] = []
+    for post in BlogPost.objects.order_by('pk').only('pk', *fields).iterator(chunk_size=options['batch_size']):
+      scanned += 1
+      before = [getattr(post, name) for name in content]
+      # ``sanitize`` updates the digests in place; compare against a copy.
+      digests = dict(post.sanitized_digests)
+      post.sanitize(force=options['force'])
+      if [getattr(post, name) for name in content] != before:
+        post.updated_at = timezone.now()
+        batch.append(post)
+      elif post.sanitized_digests != digests:
+        batch.append(post)
+      if len(batch) >= options['batch_size']:
+        updated += self._flush(batch, fields)
+        batch = []
+    updated += self._flush(batch, fields)
+
+    if updated:
+      bump_content_version()
+    self.stdout.write(self.style.SUCCESS(f'Scanned {scanned} posts, rewrote {updated}.'))
+
+  def _flush(self, posts: list[BlogPost], fields: list[str]) -> int:
+    if not posts:
+      return 0
+    with transaction.atomic():
+      BlogPost.objects.bulk_update(posts, fields)
+      # bulk_update skips save(), so refresh the stored cards and search index explicitly.
+      refresh_cards([post.pk for post in posts])
+      for post in BlogPost.objects.filter(pk__in=[post.pk for post in posts]):
+        post._update_search_index(post._state.db)
+    return len(posts)
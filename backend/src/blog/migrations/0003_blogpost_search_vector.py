@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:58
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+FTS_TABLE = 'blog_blogpost_fts'
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            "UPDATE blog_blogpost SET search_vector = "
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(seo_title, '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(excerpt, '') || ' ' || coalesce(seo_description, '')), 'C') || "
+            "setweight(to_tsvector('english', coalesce(body, '')), 'D')"
+        )
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS blog_post_search_gin ON blog_blogpost USING gin (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            "USING fts5(title, seo_title, excerpt, body, tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, seo_title, excerpt, body) '
+            "SELECT id, title, seo_title, excerpt || ' ' || seo_description, body FROM blog_blogpost"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS blog_post_search_gin')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_blogpost_hero_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:00
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_relations(apps, schema_editor):
+    # A frozen copy of blog.relations as of this migration, on historical models.
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    BlogPostRelation = apps.get_model('blog', 'BlogPostRelation')
+    db_alias = schema_editor.connection.alias
+    through = BlogPost.categories.through
+
+    published = dict(
+        BlogPost.objects.using(db_alias)
+        .filter(status='published', published_at__isnull=False)
+        .values_list('pk', 'published_at')
+    )
+    post_categories = defaultdict(set)
+    category_members = defaultdict(list)
+    rows = through.objects.using(db_alias).filter(blogpost_id__in=list(published))
+    for post_id, category_id in rows.values_list('blogpost_id', 'blogcategory_id'):
+        post_categories[post_id].add(category_id)
+        category_members[category_id].append(post_id)
+
+    relations = []
+    for source_id, categories in post_categories.items():
+        overlap = defaultdict(int)
+        for category_id in categories:
+            for candidate_id in category_members[category_id]:
+                if candidate_id != source_id:
+                    overlap[candidate_id] += 1
+        scored = []
+        for candidate_id, count in overlap.items():
+            distance_days = abs((published[source_id] - published[candidate_id]).total_seconds()) / 86400
+            scored.append((count + 1 / (1 + distance_days / 30), candidate_id))
+        scored.sort(key=lambda item: (-item[0], -published[item[1]].timestamp(), -item[1]))
+        for rank, (score, candidate_id) in enumerate(scored[:6], start=1):
+            relations.append(BlogPostRelation(post_id=source_id, related_post_id=candidate_id, score=score, rank=rank))
+    BlogPostRelation.objects.using(db_alias).bulk_create(relations, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_blogpost_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlogPostRelation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relations', to='blog.blogpost')),
+                ('related_post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbound_relations', to='blog.blogpost')),
+            ],
+            options={
+                'ordering': ['post', 'rank'],
+                'indexes': [models.Index(fields=['post', 'rank'], name='blog_post_relation_rank_idx')],
+                'constraints': [models.UniqueConstraint(fields=('post', 'related_post'), name='blog_post_relation_unique_pair')],
+            },
+        ),
+        migrations.RunPython(backfill_relations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_blogpostrelation'),
+    ]
+
+    operations = [
+        # The auto-created through table only has single-column indexes; a
+        # (category, post) index answers ``categories__slug`` filters from the index alone.
+        migrations.RunSQL(
+            'CREATE INDEX blog_post_categories_cat_post_idx ON blog_blogpost_categories (blogcategory_id, blogpost_id)',
+            'DROP INDEX blog_post_categories_cat_post_idx',
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(condition=models.Q(('published_at__isnull', False), ('status', 'published')), fields=['-published_at', '-created_at', '-id'], name='blog_post_published_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_blogpost_sanitized_digests'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='card_json',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+def clear_cards(apps, schema_editor):
+    # Stored cards predate the ``hero_image_variants`` field; until
+    # ``rebuild_post_cards`` runs the API renders these posts with the serializers.
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    BlogPost.objects.using(schema_editor.connection.alias).update(card_json='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_blogpost_card_json'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='hero_image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(clear_cards, migrations.RunPython.noop),
+    ]
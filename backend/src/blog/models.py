@@ -1,56 +1,13 @@
 from __future__ import annotations
 
 import typing
-import uuid
 
-import bleach
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.utils import timezone
-from django.utils.text import slugify
-
-ALLOWED_BODY_TAGS = [
-  'a',
-  'abbr',
-  'blockquote',
-  'br',
-  'code',
-  'em',
-  'figcaption',
-  'figure',
-  'h2',
-  'h3',
-  'h4',
-  'hr',
-  'img',
-  'li',
-  'ol',
-  'p',
-  'pre',
-  'strong',
-  'ul'
-]
-
-ALLOWED_BODY_ATTRIBUTES = {
-  '*': ['class'],
-  'a': ['href', 'title', 'rel', 'target'],
-  'img': ['src', 'alt', 'title', 'loading', 'width', 'height']
-}
-
-ALLOWED_PROTOCOLS = ['http', 'https', 'mailto']
-
-
-def sanitize_rich_text(value: str) -> str:
-  return bleach.clean(
-    value or '',
-    tags=ALLOWED_BODY_TAGS,
-    attributes=ALLOWED_BODY_ATTRIBUTES,
-    protocols=ALLOWED_PROTOCOLS,
-    strip=True
-  ).strip()
-
-
-def sanitize_plain_text(value: str) -> str:
-  return bleach.clean(value or '', tags=[], attributes={}, strip=True).strip()
+
+from .sanitizers import SanitizationPipeline, count_words, sanitize_plain_text, sanitize_rich_text
+from .slugs import save_with_unique_slug, slug_base
 
 
 class TimeStampedModel(models.Model):
@@ -76,10 +33,10 @@ class BlogCategory(TimeStampedModel):
     self.description = sanitize_plain_text(self.description)
 
   def save(self, *args, **kwargs):
-    if not self.slug:
-      self.slug = slugify(self.name)
     self.clean()
-    super().save(*args, **kwargs)
+    if not self.slug:
+      return save_with_unique_slug(self, slug_base(self.name), super().save, *args, **kwargs)
+    return super().save(*args, **kwargs)
 
 
 class BlogAuthor(TimeStampedModel):
@@ -107,6 +64,15 @@ class BlogPostQuerySet(models.QuerySet):
     now = timezone.now()
     return self.filter(status=BlogPost.Status.PUBLISHED, published_at__isnull=False, published_at__lte=now)
 
+  def next_publish_at(self):
+    """When the earliest scheduled post goes live, or ``None``."""
+    return (
+      self.filter(status=BlogPost.Status.PUBLISHED, published_at__gt=timezone.now())
+      .order_by('published_at')
+      .values_list('published_at', flat=True)
+      .first()
+    )
+
 
 class BlogPost(TimeStampedModel):
   class Status(models.TextChoices):
@@ -119,6 +85,8 @@ class BlogPost(TimeStampedModel):
   body = models.TextField()
   hero_image_url = models.URLField(blank=True)
   hero_image = models.ImageField(upload_to='blog/heroes/', blank=True, null=True)
+  # Resized copies of ``hero_image``, maintained by ``blog.images``.
+  hero_image_variants = models.JSONField(default=dict, blank=True, editable=False)
   reading_time_minutes = models.PositiveIntegerField(default=4, editable=False)
   status = models.CharField(max_length=12, choices=Status.choices, default=Status.DRAFT)
   published_at = models.DateTimeField(blank=True, null=True)
@@ -128,50 +96,93 @@ class BlogPost(TimeStampedModel):
   seo_keywords = models.CharField(max_length=300, blank=True, help_text='Comma-separated list of keywords.')
   author = models.ForeignKey(BlogAuthor, on_delete=models.SET_NULL, related_name='posts', null=True, blank=True)
   categories = models.ManyToManyField(BlogCategory, related_name='posts', blank=True)
+  search_vector = SearchVectorField(null=True, editable=False)
+  sanitized_digests = models.JSONField(default=dict, blank=True, editable=False)
+  # Serialized list payload, maintained by ``blog.cards``.
+  card_json = models.TextField(blank=True, default='', editable=False)
 
   objects = BlogPostQuerySet.as_manager()
 
   class Meta:
     ordering = ['-published_at', '-created_at']
+    indexes = [
+      # Serves ``published()`` plus the default ordering (and keyset pagination's id tie-breaker).
+      models.Index(
+        fields=['-published_at', '-created_at', '-id'],
+        name='blog_post_published_idx',
+        condition=models.Q(status='published', published_at__isnull=False)
+      )
+    ]
 
   def __str__(self) -> str:
     return self.title
 
+  @classmethod
+  def from_db(cls, db, field_names, values):
+    instance = super().from_db(db, field_names, values)
+    # Remember the persisted state so post_save handlers can tell what changed.
+    instance._loaded_values = dict(zip(field_names, values))
+    return instance
+
+  def has_changed(self, *field_names: str) -> bool:
+    loaded = getattr(self, '_loaded_values', None)
+    if loaded is None:
+      return True
+    return any(
+      loaded.get(name, models.DEFERRED) is not models.DEFERRED and loaded[name] != getattr(self, name)
+      for name in field_names
+    )
+
+  def _snapshot_loaded_values(self) -> None:
+    self._loaded_values = {
+      field.attname: self.__dict__[field.attname]
+      for field in self._meta.concrete_fields
+      if field.attname in self.__dict__
+    }
+
+  sanitization = SanitizationPipeline({
+    'excerpt': sanitize_plain_text,
+    'body': sanitize_rich_text,
+    'seo_title': sanitize_plain_text,
+    'seo_description': sanitize_plain_text,
+    'seo_keywords': sanitize_plain_text,
+    'hero_image_url': sanitize_plain_text
+  })
+
   def clean(self):
-    self.excerpt = sanitize_plain_text(self.excerpt)
-    self.body = sanitize_rich_text(self.body)
-    self.seo_title = sanitize_plain_text(self.seo_title)
-    self.seo_description = sanitize_plain_text(self.seo_description)
-    self.seo_keywords = sanitize_plain_text(self.seo_keywords)
-    self.hero_image_url = sanitize_plain_text(self.hero_image_url)
+    self.sanitize()
 
-  def save(self, *args, **kwargs):
-    if not self.slug:
-      self.slug = self._generate_unique_slug()
+  def sanitize(self, force: bool = False) -> set[str]:
+    """Sanitize changed fields and keep ``reading_time_minutes`` in step with the body."""
+    sanitized = self.sanitization.run(self, self.sanitized_digests, force=force)
+    if 'body' in sanitized:
+      self.reading_time_minutes = self._estimate_read_time()
+    return sanitized
 
+  def save(self, *args, **kwargs):
     if self.status == self.Status.PUBLISHED and not self.published_at:
       self.published_at = timezone.now()
     elif self.status == self.Status.DRAFT:
       self.published_at = None
 
-    self.clean()
-    self.reading_time_minutes = self._estimate_read_time()
-    return super().save(*args, **kwargs)
+    self.sanitize()
+    if self.slug:
+      result = super().save(*args, **kwargs)
+    else:
+      result = save_with_unique_slug(self, slug_base(self.title), super().save, *args, **kwargs)
+    self._update_search_index(kwargs.get('using') or self._state.db)
+    self._snapshot_loaded_values()
+    return result
 
-  def _generate_unique_slug(self) -> str:
-    base_slug = slugify(self.title) if self.title else ''
-    if not base_slug:
-      base_slug = uuid.uuid4().hex[:16]
+  def _update_search_index(self, alias: str) -> None:
+    from .search import get_search_backend
 
-    slug_candidate = base_slug
-    index = 1
-    while BlogPost.objects.filter(slug=slug_candidate).exclude(pk=self.pk).exists():
-      slug_candidate = f"{base_slug}-{index}"
-      index += 1
-    return slug_candidate
+    backend = get_search_backend(alias)
+    if backend is not None:
+      backend.index_post(self)
 
   def _estimate_read_time(self) -> int:
-    word_count = len(sanitize_plain_text(self.body).split())
+    word_count = count_words(self.body)
     minutes = max(1, int(round(word_count / 200)))  # assume 200 WPM
     return minutes
 
@@ -193,3 +204,24 @@ class BlogPost(TimeStampedModel):
     if self.hero_image:
       return self.hero_image.url
     return self.hero_image_url or None
+
+
+class BlogPostRelation(models.Model):
+  """Precomputed "related posts" edge, maintained by ``blog.relations``."""
+
+  post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='relations')
+  related_post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='inbound_relations')
+  score = models.FloatField()
+  rank = models.PositiveSmallIntegerField()
+
+  class Meta:
+    ordering = ['post', 'rank']
+    constraints = [
+      models.UniqueConstraint(fields=['post', 'related_post'], name='blog_post_relation_unique_pair')
+    ]
+    indexes = [
+      models.Index(fields=['post', 'rank'], name='blog_post_relation_rank_idx')
+    ]
+
+  def __str__(self) -> str:
+    return f"BlogPostRelation<{self.post_id} -> {self.related_post_id} #{self.rank}>"
@@ -1,7 +1,212 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import functools
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .cache import aget_content_version, get_blog_cache, get_content_version
+
+COUNT_KEY_PREFIX = 'blog:count'
+
+
+def _count_timeout() -> int | None:
+  return getattr(settings, 'BLOG_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+class CachedCountPaginator(Paginator):
+  """``Paginator`` whose ``count`` is shared through the blog cache under ``count_key``."""
+
+  def __init__(self, *args, count_key: str | None = None, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.count_key = count_key
+
+  @cached_property
+  def count(self):
+    if self.count_key is None:
+      return super().count
+    cache = get_blog_cache()
+    count = cache.get(self.count_key)
+    if count is None:
+      count = super().count
+      cache.set(self.count_key, count, _count_timeout())
+    return count
 
 
 class BlogPostPagination(PageNumberPagination):
+  """Page-number pagination whose total comes from a per-filter counter cache.
+
+  The key covers everything that narrows the published set (category and
+  search terms) plus the content version, so any ``BlogPost``,
+  ``BlogCategory`` or ``BlogAuthor`` signal invalidates it and every page of
+  the same listing shares one ``COUNT(*)``.
+  """
+
   page_size = 6
   page_size_query_param = 'page_size'
   max_page_size = 24
+  count_filter_params = ('category', 'search')
+
+  def paginate_queryset(self, queryset, request, view=None):
+    self._count_key = self.get_count_cache_key(request)
+    return super().paginate_queryset(queryset, request, view)
+
+  @property
+  def django_paginator_class(self):
+    return functools.partial(CachedCountPaginator, count_key=getattr(self, '_count_key', None))
+
+  async def apaginate_queryset(self, queryset, request):
+    """``paginate_queryset`` for async views: count and rows come from the async cache and ORM."""
+    self.request = request
+    count_key = self._count_cache_key(request, await aget_content_version())
+    cache = get_blog_cache()
+    count = await cache.aget(count_key)
+    if count is None:
+      count = await queryset.acount()
+      await cache.aset(count_key, count, _count_timeout())
+
+    paginator = Paginator(queryset, self.get_page_size(request))
+    paginator.count = count
+    page_number = self.get_page_number(request, paginator)
+    try:
+      self.page = paginator.page(page_number)
+    except InvalidPage as exc:
+      raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+    self.page.object_list = [row async for row in self.page.object_list]
+    return self.page.object_list
+
+  def get_count_cache_key(self, request) -> str:
+    return self._count_cache_key(request, get_content_version())
+
+  def _count_cache_key(self, request, version: int) -> str:
+    # Exactly the values the view and search filter apply: the last one of each
+    # parameter, unnormalized (the category match is case-sensitive).
+    filters = [(name, request.query_params.get(name, '')) for name in self.count_filter_params]
+    digest = hashlib.sha256(repr(('published', filters)).encode('utf-8')).hexdigest()
+    return f'{COUNT_KEY_PREFIX}:{version}:{digest}'
+
+
+class BlogPostKeysetPagination(BasePagination):
+  """Keyset pagination over ``(published_at, created_at, id)``, newest first.
+
+  Matches ``BlogPost.Meta.ordering`` with ``id`` as the tie-breaker, so each
+  page is a single indexed range scan with no ``COUNT(*)`` and no ``OFFSET``.
+  Cursors are opaque to clients; pass ``?cursor=`` (empty) for the first page.
+  """
+
+  cursor_query_param = 'cursor'
+  page_size = BlogPostPagination.page_size
+  page_size_query_param = BlogPostPagination.page_size_query_param
+  max_page_size = BlogPostPagination.max_page_size
+  ordering = ('-published_at', '-created_at', '-id')
+  invalid_cursor_message = 'Invalid cursor'
+
+  def paginate_queryset(self, queryset, request, view=None):
+    self.request = request
+    self.base_url = request.build_absolute_uri()
+    self.page_size = self.get_page_size(request)
+    reverse, position = self.decode_cursor(request)
+
+    if reverse:
+      queryset = queryset.order_by(*(field.lstrip('-') for field in self.ordering))
+    else:
+      queryset = queryset.order_by(*self.ordering)
+    if position is not None:
+      queryset = queryset.filter(self._after(position, reverse))
+
+    results = list(queryset[:self.page_size + 1])
+    has_more = len(results) > self.page_size
+    results = results[:self.page_size]
+    if reverse:
+      results.reverse()
+
+    self.has_next = has_more if not reverse else position is not None
+    self.has_previous = position is not None if not reverse else has_more
+    self.first_position = self._position(results[0]) if results else None
+    self.last_position = self._position(results[-1]) if results else None
+    if not results and position is not None:
+      # Nothing past the cursor: let the client step back to where it came from.
+      self.first_position = self.last_position = position
+      self.has_next, self.has_previous = reverse, not reverse
+    return results
+
+  def get_page_size(self, request):
+    try:
+      size = int(request.query_params[self.page_size_query_param])
+    except (KeyError, ValueError):
+      return self.page_size
+    return min(max(size, 1), self.max_page_size)
+
+  def get_paginated_response(self, data):
+    return Response(OrderedDict([
+      ('next', self.get_next_link()),
+      ('previous', self.get_previous_link()),
+      ('results', data)
+    ]))
+
+  def get_paginated_response_schema(self, schema):
+    return {
+      'type': 'object',
+      'required': ['results'],
+      'properties': {
+        'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+        'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+        'results': schema,
+      },
+    }
+
+  def get_next_link(self):
+    if not self.has_next:
+      return None
+    return self._link(False, self.last_position)
+
+  def get_previous_link(self):
+    if not self.has_previous:
+      return None
+    return self._link(True, self.first_position)
+
+  def _link(self, reverse: bool, position) -> str:
+    url = remove_query_param(self.base_url, 'page')
+    return replace_query_param(url, self.cursor_query_param, self.encode_cursor(reverse, position))
+
+  @staticmethod
+  def _position(post):
+    return (post.published_at, post.created_at, post.pk)
+
+  @staticmethod
+  def _after(position, reverse: bool) -> Q:
+    published_at, created_at, pk = position
+    lookup = 'gt' if reverse else 'lt'
+    return (
+      Q(**{f'published_at__{lookup}': published_at})
+      | Q(published_at=published_at, **{f'created_at__{lookup}': created_at})
+      | Q(published_at=published_at, created_at=created_at, **{f'id__{lookup}': pk})
+    )
+
+  def encode_cursor(self, reverse: bool, position) -> str:
+    published_at, created_at, pk = position
+    payload = json.dumps([int(reverse), published_at.isoformat(), created_at.isoformat(), pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('ascii')).decode('ascii').rstrip('=')
+
+  def decode_cursor(self, request):
+    raw = request.query_params.get(self.cursor_query_param, '')
+    if not raw:
+      return False, None
+    try:
+      padded = raw + '=' * (-len(raw) % 4)
+      reverse, published_at, created_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+      position = (parse_datetime(published_at), parse_datetime(created_at), int(pk))
+    except (TypeError, ValueError, UnicodeError):
+      raise NotFound(self.invalid_cursor_message)
+    if position[0] is None or position[1] is None:
+      raise NotFound(self.invalid_cursor_message)
+    return bool(reverse), position
@@ -0,0 +1,193 @@
+"""Byte-level read path for the posts API.
+
+Responses are assembled from the stored list cards (``blog.cards``) and a
+few columns fetched with ``values_list``, then encoded straight to bytes.
+The output is byte-for-byte what ``JSONRenderer`` produces for the regular
+serializers; whenever that cannot be guaranteed (pretty-printing requested,
+a card not rendered yet) the view falls back to DRF.
+"""
+from __future__ import annotations
+
+import json
+import typing
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from backend_project.metrics import serializer_timer
+
+from .images import absolute_srcset
+from .models import BlogPost
+from .relations import RELATED_POSTS_LIMIT
+
+try:
+  import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+  orjson = None
+
+_EMPTY_RESULTS_TAIL = b'[]}'
+_LINE_SEPARATORS = (('\u2028'.encode(), b'\\u2028'), ('\u2029'.encode(), b'\\u2029'))
+
+
+def encode_json(value, renderer: JSONRenderer) -> bytes:
+  """Encode ``value`` exactly like ``renderer.render`` does without indentation."""
+  if orjson is not None and not renderer.ensure_ascii:
+    try:
+      encoded = orjson.dumps(value)
+    except TypeError:
+      pass
+    else:
+      for raw, escaped in _LINE_SEPARATORS:
+        encoded = encoded.replace(raw, escaped)
+      return encoded
+  return renderer.render(value)
+
+
+def card_bytes(card_json: str, hero_image: str, request, renderer: JSONRenderer) -> bytes:
+  if hero_image:
+    # Uploaded images are made absolute per request, as the serializer does.
+    card = json.loads(card_json)
+    if card['hero_image_url'] or card['hero_image_variants']:
+      if card['hero_image_url']:
+        card['hero_image_url'] = request.build_absolute_uri(card['hero_image_url'])
+      card['hero_image_variants'] = absolute_srcset(card['hero_image_variants'], request.build_absolute_uri)
+      return encode_json(card, renderer)
+  return card_json.encode()
+
+
+class DetailField(typing.NamedTuple):
+  prefix: bytes
+  columns: tuple[str, ...]
+  extract: typing.Callable[..., typing.Any]
+
+
+def _detail_field(name: str, columns: tuple[str, ...], extract) -> DetailField:
+  return DetailField(f',"{name}":'.encode(), columns, extract)
+
+
+# ``BlogPostDetailSerializer`` fields beyond the card, in serializer order.
+DETAIL_FIELDS = (
+  _detail_field('body', ('body',), lambda body: body),
+  _detail_field('canonical_url', ('canonical_url', 'slug'), lambda canonical_url, slug: canonical_url or f'/blog/{slug}'),
+)
+DETAIL_COLUMNS = tuple(dict.fromkeys(['pk', 'card_json', 'hero_image', *(c for field in DETAIL_FIELDS for c in field.columns)]))
+
+
+def raw_renderer(request) -> JSONRenderer | None:
+  """The negotiated renderer if its output can be reproduced byte for byte, else ``None``."""
+  if not getattr(settings, 'BLOG_RAW_PAYLOADS', True):
+    return None
+  renderer = getattr(request, 'accepted_renderer', None)
+  if type(renderer) is not JSONRenderer or not renderer.compact:
+    return None
+  if renderer.get_indent(request.accepted_media_type, {}) is not None:
+    return None
+  return renderer
+
+
+def raw_response(content: bytes) -> HttpResponse:
+  return HttpResponse(content, content_type=JSONRenderer.media_type)
+
+
+def detail_row_queryset(queryset, **lookup):
+  # The row needs no joined author or prefetched categories, only the columns.
+  return queryset.select_related(None).prefetch_related(None).filter(**lookup).values_list(*DETAIL_COLUMNS)
+
+
+def related_cards_queryset(post_id: int):
+  return (
+    BlogPost.objects.published()
+    .filter(inbound_relations__post_id=post_id)
+    .order_by('inbound_relations__rank')
+    .values_list('card_json', 'hero_image')[:RELATED_POSTS_LIMIT]
+  )
+
+
+def list_payload(posts, envelope: dict | None, request, renderer: JSONRenderer) -> bytes:
+  """``posts`` (all with a stored card) inside the paginated ``envelope``, or as a bare list."""
+  with serializer_timer():
+    results = b'[' + b','.join(card_bytes(post.card_json, post.hero_image.name, request, renderer) for post in posts) + b']'
+    if envelope is None:
+      return results
+    # ``results`` is the last key of every paginated envelope.
+    return encode_json(envelope, renderer)[:-len(_EMPTY_RESULTS_TAIL)] + results + b'}'
+
+
+def detail_payload(post: dict, related: list[tuple], request, renderer: JSONRenderer) -> bytes:
+  """``post`` is a ``DETAIL_COLUMNS`` row, ``related`` the ``related_cards_queryset`` rows."""
+  with serializer_timer():
+    parts = [card_bytes(post['card_json'], post['hero_image'], request, renderer)[:-1]]
+    for field in DETAIL_FIELDS:
+      parts.append(field.prefix + encode_json(field.extract(*(post[column] for column in field.columns)), renderer))
+    parts.append(b',"related_posts":[')
+    parts.append(b','.join(card_bytes(card_json, hero_image, request, renderer) for card_json, hero_image in related))
+    parts.append(b']}')
+    return b''.join(parts)
+
+
+def has_cards(post: dict | None, related: list[tuple]) -> bool:
+  return post is not None and bool(post['card_json']) and all(card_json for card_json, _ in related)
+
+
+def fetch_detail(queryset, **lookup) -> tuple[dict | None, list[tuple]]:
+  """The ``DETAIL_COLUMNS`` row of the post matching ``lookup`` (as a dict) and its related cards."""
+  row = detail_row_queryset(queryset, **lookup).first()
+  if row is None:
+    return None, []
+  post = dict(zip(DETAIL_COLUMNS, row))
+  return post, list(related_cards_queryset(post['pk']))
+
+
+async def afetch_detail(queryset, **lookup) -> tuple[dict | None, list[tuple]]:
+  row = await detail_row_queryset(queryset, **lookup).afirst()
+  if row is None:
+    return None, []
+  post = dict(zip(DETAIL_COLUMNS, row))
+  return post, [cards async for cards in related_cards_queryset(post['pk'])]
+
+
+def raw_list_response(posts, envelope: dict | None, request, renderer: JSONRenderer) -> HttpResponse | None:
+  """The list response built from stored cards, or ``None`` when a post has no card yet."""
+  if not all(post.card_json for post in posts):
+    return None
+  return raw_response(list_payload(posts, envelope, request, renderer))
+
+
+def raw_detail_response(post: dict | None, related: list[tuple], request, renderer: JSONRenderer) -> HttpResponse | None:
+  """The detail response for a ``fetch_detail`` result, or ``None`` when it cannot be built from cards."""
+  if not has_cards(post, related):
+    return None
+  return raw_response(detail_payload(post, related, request, renderer))
+
+
+class RawPayloadMixin:
+  """Serve ``BlogPostViewSet`` list/retrieve without instantiating serializers."""
+
+  def list(self, request, *args, **kwargs):
+    renderer = raw_renderer(request)
+    if renderer is None:
+      return super().list(request, *args, **kwargs)
+
+    queryset = self.filter_queryset(self.get_queryset())
+    page = self.paginate_queryset(queryset)
+    posts = page if page is not None else list(queryset)
+    envelope = self.paginator.get_paginated_response([]).data if page is not None else None
+    response = raw_list_response(posts, envelope, request, renderer)
+    if response is None:
+      serializer = self.get_serializer(posts, many=True)
+      return self.get_paginated_response(serializer.data) if page is not None else Response(serializer.data)
+    return response
+
+  def retrieve(self, request, *args, **kwargs):
+    renderer = raw_renderer(request)
+    if renderer is None:
+      return super().retrieve(request, *args, **kwargs)
+
+    lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+    post, related = fetch_detail(self.filter_queryset(self.get_queryset()), **{self.lookup_field: lookup})
+    response = raw_detail_response(post, related, request, renderer)
+    if response is None:
+      return super().retrieve(request, *args, **kwargs)
+    return response
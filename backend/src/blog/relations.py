@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import typing
+from collections import defaultdict
+
+from django.db import transaction
+
+RELATED_POSTS_LIMIT = 3
+# Keep a few spare edges so a scheduled (not yet visible) neighbour does not
+# leave a gap in the visible top three.
+RELATED_POSTS_STORED = 6
+RECENCY_WINDOW_DAYS = 30
+REFRESH_BATCH_SIZE = 500
+PUBLISHED = 'published'
+
+
+def _get_models(post_model=None, relation_model=None):
+  if post_model is None or relation_model is None:
+    from .models import BlogPost, BlogPostRelation
+
+    post_model = post_model or BlogPost
+    relation_model = relation_model or BlogPostRelation
+  return post_model, relation_model
+
+
+def _batched(values: list[int], size: int):
+  for start in range(0, len(values), size):
+    yield values[start:start + size]
+
+
+def relation_score(overlap: int, source_published_at, candidate_published_at) -> float:
+  """Shared categories dominate; closeness in publish date breaks ties within (0, 1]."""
+  distance_days = abs((source_published_at - candidate_published_at).total_seconds()) / 86400
+  return overlap + 1 / (1 + distance_days / RECENCY_WINDOW_DAYS)
+
+
+def neighbour_post_ids(category_ids: typing.Iterable[int], *, post_model=None) -> set[int]:
+  """Published posts filed under any of ``category_ids``."""
+  post_model, _ = _get_models(post_model)
+  category_ids = list(category_ids)
+  if not category_ids:
+    return set()
+  through = post_model.categories.through
+  return set(
+    through.objects.filter(
+      blogcategory_id__in=category_ids,
+      blogpost__status=PUBLISHED,
+      blogpost__published_at__isnull=False
+    ).values_list('blogpost_id', flat=True)
+  )
+
+
+def refresh_relations(post_ids: typing.Iterable[int], *, post_model=None, relation_model=None) -> int:
+  """Recompute the stored related posts for ``post_ids`` in a fixed number of queries.
+
+  Returns the number of relation rows written.
+  """
+  post_model, relation_model = _get_models(post_model, relation_model)
+  post_ids = set(post_ids)
+  if not post_ids:
+    return 0
+
+  through = post_model.categories.through
+  sources = dict(
+    post_model.objects.filter(pk__in=post_ids, status=PUBLISHED, published_at__isnull=False)
+    .values_list('pk', 'published_at')
+  )
+
+  source_categories: dict[int, set[int]] = defaultdict(set)
+  source_rows = through.objects.filter(blogpost_id__in=list(sources)).values_list('blogpost_id', 'blogcategory_id')
+  for post_id, category_id in source_rows:
+    source_categories[post_id].add(category_id)
+
+  category_members: dict[int, list[int]] = defaultdict(list)
+  candidate_published: dict[int, typing.Any] = {}
+  all_categories = set().union(*source_categories.values()) if source_categories else set()
+  candidate_rows = through.objects.filter(
+    blogcategory_id__in=all_categories,
+    blogpost__status=PUBLISHED,
+    blogpost__published_at__isnull=False
+  ).values_list('blogcategory_id', 'blogpost_id', 'blogpost__published_at')
+  for category_id, post_id, published_at in candidate_rows:
+    category_members[category_id].append(post_id)
+    candidate_published[post_id] = published_at
+
+  relations = []
+  for source_id, categories in source_categories.items():
+    overlap: dict[int, int] = defaultdict(int)
+    for category_id in categories:
+      for candidate_id in category_members[category_id]:
+        if candidate_id != source_id:
+          overlap[candidate_id] += 1
+
+    scored = sorted(
+      (
+        (relation_score(count, sources[source_id], candidate_published[candidate_id]), candidate_id)
+        for candidate_id, count in overlap.items()
+      ),
+      # Highest score first; newest post and then highest id make the order total.
+      key=lambda item: (-item[0], -candidate_published[item[1]].timestamp(), -item[1])
+    )
+    for rank, (score, candidate_id) in enumerate(scored[:RELATED_POSTS_STORED], start=1):
+      relations.append(relation_model(post_id=source_id, related_post_id=candidate_id, score=score, rank=rank))
+
+  with transaction.atomic(using=relation_model.objects.db):
+    relation_model.objects.filter(post_id__in=post_ids).delete()
+    relation_model.objects.bulk_create(relations)
+  return len(relations)
+
+
+def _rank_key(edge: tuple) -> tuple:
+  score, related_id, related_published_at = edge
+  # Same order as ``refresh_relations``.
+  return (-score, -related_published_at.timestamp(), -related_id)
+
+
+def refresh_relations_around(post_id: int, category_ids: typing.Iterable[int] = (), holders: typing.Iterable[int] = ()) -> int:
+  """Refresh ``post_id``'s related posts, then fold its new score into each neighbour's stored list.
+
+  Scores are symmetric, so a neighbour's list only changes by the edge to
+  ``post_id``: it is re-ranked against that one post instead of recomputed.
+  Only a neighbour whose full list ``post_id`` dropped out of (or down in) is
+  recomputed, as its next-best candidate was never stored. ``category_ids``
+  lets callers include categories the post has just left, ``holders`` posts
+  whose edge to it was deleted along with it.
+  """
+  post_model, relation_model = _get_models()
+  through = post_model.categories.through
+  holders = set(holders)
+  written = refresh_relations([post_id])
+
+  published_at = (
+    post_model.objects.filter(pk=post_id, status=PUBLISHED, published_at__isnull=False)
+    .values_list('published_at', flat=True).first()
+  )
+  categories = set()
+  if published_at is not None:
+    categories = set(through.objects.filter(blogpost_id=post_id).values_list('blogcategory_id', flat=True))
+  neighbours = neighbour_post_ids(set(category_ids) | categories) | holders
+  neighbours.update(relation_model.objects.filter(related_post_id=post_id).values_list('post_id', flat=True))
+  neighbours.discard(post_id)
+  neighbour_published = dict(
+    post_model.objects.filter(pk__in=neighbours, status=PUBLISHED, published_at__isnull=False)
+    .values_list('pk', 'published_at')
+  )
+  if not neighbour_published:
+    return written
+
+  overlap: dict[int, int] = defaultdict(int)
+  if categories:
+    overlap_rows = through.objects.filter(blogpost_id__in=list(neighbour_published), blogcategory_id__in=categories)
+    for neighbour_id in overlap_rows.values_list('blogpost_id', flat=True):
+      overlap[neighbour_id] += 1
+  stored: dict[int, list[tuple]] = defaultdict(list)
+  stored_rows = relation_model.objects.filter(post_id__in=list(neighbour_published)).values_list(
+    'post_id', 'score', 'related_post_id', 'related_post__published_at'
+  )
+  for neighbour_id, score, related_id, related_published_at in stored_rows:
+    stored[neighbour_id].append((score, related_id, related_published_at))
+
+  recompute, rewrite, relations = set(), set(), []
+  for neighbour_id, neighbour_published_at in neighbour_published.items():
+    edges = stored[neighbour_id]
+    previous = next((edge for edge in edges if edge[1] == post_id), None)
+    had_post = previous is not None or neighbour_id in holders
+    candidate = None
+    if overlap[neighbour_id]:
+      score = relation_score(overlap[neighbour_id], neighbour_published_at, published_at)
+      candidate = (score, post_id, published_at)
+    if not had_post and candidate is None:
+      continue
+    was_full = len(edges) + (previous is None and had_post) >= RELATED_POSTS_STORED
+    demoted = candidate is None or (previous is not None and _rank_key(candidate) > _rank_key(previous))
+    if had_post and was_full and demoted:
+      recompute.add(neighbour_id)
+      continue
+    ranked = [edge for edge in edges if edge[1] != post_id]
+    if candidate is not None:
+      ranked.append(candidate)
+    ranked.sort(key=_rank_key)
+    rewrite.add(neighbour_id)
+    for rank, (score, related_id, _) in enumerate(ranked[:RELATED_POSTS_STORED], start=1):
+      relations.append(relation_model(post_id=neighbour_id, related_post_id=related_id, score=score, rank=rank))
+
+  with transaction.atomic(using=relation_model.objects.db):
+    relation_model.objects.filter(post_id__in=rewrite).delete()
+    relation_model.objects.bulk_create(relations)
+  written += len(relations)
+  return written + sum(refresh_relations(batch) for batch in _batched(sorted(recompute), REFRESH_BATCH_SIZE))
+
+
+def rebuild_all_relations(*, batch_size: int = REFRESH_BATCH_SIZE, post_model=None, relation_model=None) -> int:
+  post_model, relation_model = _get_models(post_model, relation_model)
+  relation_model.objects.exclude(post__status=PUBLISHED).delete()
+  post_ids = list(post_model.objects.filter(status=PUBLISHED).values_list('pk', flat=True).order_by('pk'))
+  return sum(
+    refresh_relations(batch, post_model=post_model, relation_model=relation_model)
+    for batch in _batched(post_ids, batch_size)
+  )
@@ -0,0 +1,364 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import re
+import string
+import typing
+from html.entities import html5 as HTML5_ENTITIES
+
+import bleach
+from django.conf import settings
+
+Sanitizer = typing.Callable[[str], str]
+
+ALLOWED_BODY_TAGS = [
+  'a',
+  'abbr',
+  'blockquote',
+  'br',
+  'code',
+  'em',
+  'figcaption',
+  'figure',
+  'h2',
+  'h3',
+  'h4',
+  'hr',
+  'img',
+  'li',
+  'ol',
+  'p',
+  'pre',
+  'strong',
+  'ul'
+]
+
+ALLOWED_BODY_ATTRIBUTES = {
+  '*': ['class'],
+  'a': ['href', 'title', 'rel', 'target'],
+  'img': ['src', 'alt', 'title', 'loading', 'width', 'height']
+}
+
+ALLOWED_PROTOCOLS = ['http', 'https', 'mailto']
+
+
+class BleachSanitizer:
+  """Reference sanitizer: html5lib tree building via ``bleach.clean``."""
+
+  def __init__(self, tags: typing.Iterable[str], attributes: dict[str, list[str]], protocols: typing.Iterable[str]):
+    self.tags = frozenset(tags)
+    self.attributes = attributes
+    self.protocols = frozenset(protocols)
+
+  def __call__(self, value: str) -> str:
+    return bleach.clean(value, tags=self.tags, attributes=self.attributes, protocols=self.protocols, strip=True)
+
+
+class _Unsupported(Exception):
+  """Raised by ``StreamingSanitizer`` for markup it cannot reproduce exactly."""
+
+
+# html5lib normalizes newlines before tokenizing; everything else in this set
+# is rewritten by bleach in ways not worth mirroring, so it goes to the fallback.
+_UNSUPPORTED_CHARS_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff]')
+_TEXT_RE = re.compile(r'[^<>&]+')
+_SPACE = '[ \t\n]'
+_ATTR_NAME = '[a-zA-Z_:][-a-zA-Z0-9_:.]*'
+_ATTR_VALUE = '"[^"]*"|\'[^\']*\'|[^ \t\n"\'=<>`]+'
+_ATTR_RE = re.compile(rf'{_SPACE}+({_ATTR_NAME})(?:{_SPACE}*={_SPACE}*({_ATTR_VALUE}))?')
+_TAG_TOKEN_RE = re.compile(
+  rf'<(/?)([a-zA-Z][a-zA-Z0-9]*)((?:{_SPACE}+{_ATTR_NAME}(?:{_SPACE}*={_SPACE}*(?:{_ATTR_VALUE}))?)*){_SPACE}*(/?)>'
+)
+_NUMERIC_ENTITY_RE = re.compile(r'&#(?:[0-9]+|[xX][0-9a-fA-F]+);')
+# bleach ends an entity name at any of these (see ``html5lib_shim.match_entity``).
+_ENTITY_NAME_RE = re.compile('[^<&=;%s]*' % re.escape(string.whitespace))
+_URI_JUNK_RE = re.compile(r'[`\000-\040\177-\240\s]+|[^\x00-\x7f]')
+_URI_SCHEME_RE = re.compile(r'([a-z][a-z0-9+.-]*):')
+_URI_ATTRIBUTES = frozenset(['href', 'src'])
+
+_VOID_TAGS = frozenset(['br', 'hr', 'img'])
+_HEADINGS = frozenset(['h2', 'h3', 'h4'])
+# Start tags that implicitly close an open <p>.
+_CLOSES_P = frozenset(['blockquote', 'figcaption', 'figure', 'hr', 'li', 'ol', 'p', 'pre', 'ul', *_HEADINGS])
+# "Special" elements in the HTML5 sense; they bound the search for an open <li>.
+_SPECIAL = _CLOSES_P | frozenset(['br', 'img'])
+# Tags bleach replaces with a newline when stripping them.
+_BLOCK_LEVEL = _CLOSES_P - frozenset(['img', 'br'])
+# Disallowed tags with no parsing side effects; stripping them just drops the tag.
+_INLINE_TAGS = frozenset([
+  'b', 'bdi', 'bdo', 'big', 'cite', 'data', 'del', 'dfn', 'i', 'ins', 'kbd', 'mark', 'q', 's', 'samp', 'small',
+  'span', 'strike', 'sub', 'sup', 'time', 'tt', 'u', 'var'
+])
+_MODELLED_TAGS = frozenset(ALLOWED_BODY_TAGS) | _INLINE_TAGS
+
+
+class StreamingSanitizer:
+  """Single-pass allowlist sanitizer producing byte-identical output to ``bleach.clean``.
+
+  Input without ``<`` or ``&`` is answered without tokenizing at all. Anything
+  else is scanned once with a regex tokenizer that tracks open elements; it only
+  accepts markup whose HTML5 tree is the token stream itself (properly nested,
+  no implied end tags, no raw-text elements). Markup outside that subset is
+  handed to ``fallback`` so the result never differs from the reference.
+  """
+
+  def __init__(
+    self,
+    tags: typing.Iterable[str],
+    attributes: dict[str, list[str]],
+    protocols: typing.Iterable[str],
+    fallback: Sanitizer | None = None
+  ):
+    self.tags = frozenset(tags)
+    self.attributes = {
+      tag: frozenset(attributes.get(tag, ())) | frozenset(attributes.get('*', ()))
+      for tag in self.tags
+    }
+    self.protocols = frozenset(protocols)
+    self.fallback = fallback or BleachSanitizer(tags, attributes, protocols)
+
+  def __call__(self, value: str) -> str:
+    if '\r' in value:
+      value = value.replace('\r\n', '\n').replace('\r', '\n')
+    if _UNSUPPORTED_CHARS_RE.search(value) is None:
+      if '<' not in value and '&' not in value:
+        return value.replace('>', '&gt;')
+      try:
+        return ''.join(self.stream(value))
+      except _Unsupported:
+        pass
+    return self.fallback(value)
+
+  def stream(self, value: str) -> typing.Iterator[str]:
+    open_tags: list[str] = []
+    position, end = 0, len(value)
+    while position < end:
+      text = _TEXT_RE.match(value, position)
+      if text is not None:
+        yield text.group()
+        position = text.end()
+        continue
+
+      char = value[position]
+      if char == '>':
+        yield '&gt;'
+        position += 1
+      elif char == '&':
+        entity, position = _text_entity(value, position)
+        yield entity
+      else:
+        tag = _TAG_TOKEN_RE.match(value, position)
+        if tag is None:
+          following = value[position + 1:position + 2]
+          if not following or following in '!/?' or (following.isascii() and following.isalpha()):
+            raise _Unsupported
+          yield '&lt;'
+          position += 1
+          continue
+        position = tag.end()
+        closing, name, raw_attributes, self_closing = tag.groups()
+        name = name.lower()
+        if closing:
+          yield self._end_tag(name, raw_attributes, self_closing, open_tags)
+        else:
+          if name == 'pre' and value.startswith('\n', position):
+            raise _Unsupported
+          yield self._start_tag(name, raw_attributes, open_tags)
+
+    if open_tags:
+      raise _Unsupported
+
+  def _start_tag(self, name: str, raw_attributes: str, open_tags: list[str]) -> str:
+    if name not in _MODELLED_TAGS or (name not in self.tags and name in _BLOCK_LEVEL):
+      raise _Unsupported
+    if name in _CLOSES_P and 'p' in open_tags:
+      raise _Unsupported
+    if name in _HEADINGS and open_tags and open_tags[-1] in _HEADINGS:
+      raise _Unsupported
+    if name == 'a' and 'a' in open_tags:
+      raise _Unsupported
+    if name == 'li':
+      for tag in reversed(open_tags):
+        if tag == 'li':
+          raise _Unsupported
+        if tag in _SPECIAL and tag != 'p':
+          break
+
+    if name not in _VOID_TAGS:
+      open_tags.append(name)
+    if name not in self.tags:
+      return ''
+
+    allowed = self.attributes[name]
+    seen: set[str] = set()
+    parts = [name]
+    for match in _ATTR_RE.finditer(raw_attributes):
+      attribute = match.group(1).lower()
+      if attribute in seen:
+        continue
+      seen.add(attribute)
+      if attribute not in allowed:
+        continue
+      value = match.group(2) or ''
+      if value[:1] in ('"', "'"):
+        value = value[1:-1]
+      if attribute in _URI_ATTRIBUTES and not self._allowed_uri(value):
+        continue
+      parts.append(f'{attribute}="{_escape_attribute(value)}"')
+    return f'<{" ".join(parts)}>'
+
+  def _end_tag(self, name: str, raw_attributes: str, self_closing: str, open_tags: list[str]) -> str:
+    if raw_attributes or self_closing or not open_tags or open_tags[-1] != name:
+      raise _Unsupported
+    open_tags.pop()
+    return f'</{name}>' if name in self.tags else ''
+
+  def _allowed_uri(self, value: str) -> bool:
+    # Character references are decoded before the scheme check; only the part
+    # before the first "&" is needed once it already contains the scheme.
+    head, ampersand, _ = value.partition('&')
+    normalized = _URI_JUNK_RE.sub('', head).lower()
+    if ampersand and ':' not in normalized:
+      raise _Unsupported
+    if '[' in value or ']' in value:
+      raise _Unsupported
+    scheme = _URI_SCHEME_RE.match(normalized)
+    if scheme is not None:
+      return scheme.group(1) in self.protocols
+    if ':' in normalized:
+      raise _Unsupported
+    return normalized.startswith('#') or 'http' in self.protocols or 'https' in self.protocols
+
+
+def _text_entity(value: str, position: int) -> tuple[str, int]:
+  """Copy a character reference in text the way bleach does, or escape the ``&``."""
+  if value.startswith('&#', position):
+    numeric = _NUMERIC_ENTITY_RE.match(value, position)
+    if numeric is None:
+      raise _Unsupported
+    return numeric.group(), numeric.end()
+  name = _ENTITY_NAME_RE.match(value, position + 1).group()
+  after = position + 1 + len(name)
+  if not value.startswith(';', after) or not name:
+    return '&amp;', position + 1
+  if name not in _entity_name_prefixes():
+    return '&amp;', position + 1
+  # bleach keeps any prefix of a known name, so "&am;" survives like "&amp;".
+  return value[position:after + 1], after + 1
+
+
+@functools.lru_cache(maxsize=None)
+def _entity_name_prefixes() -> frozenset[str]:
+  return frozenset(name[:end] for name in HTML5_ENTITIES for end in range(1, len(name.rstrip(';')) + 1))
+
+
+def _escape_attribute(value: str) -> str:
+  if '"' in value:
+    # html5lib would switch to single quotes.
+    raise _Unsupported
+  if '&' not in value:
+    return value.replace('<', '&lt;')
+  chunks = []
+  for index, part in enumerate(value.split('&')):
+    if index:
+      numeric = _NUMERIC_ENTITY_RE.match('&' + part)
+      if numeric is not None:
+        reference = numeric.group()
+        code_point = int(reference[3:-1], 16) if reference[2] in 'xX' else int(reference[2:-1])
+        keep = 0 < code_point < 0x110000
+      elif part.startswith('#'):
+        raise _Unsupported
+      else:
+        name = _ENTITY_NAME_RE.match(part).group()
+        reference = f'&{name};'
+        # Attribute values only keep references whose name is valid without the ";".
+        keep = bool(name) and part.startswith(';', len(name)) and name in HTML5_ENTITIES
+      if keep:
+        chunks.append(reference)
+        part = part[len(reference) - 1:]
+      else:
+        chunks.append('&amp;')
+    chunks.append(part.replace('<', '&lt;'))
+  return ''.join(chunks)
+
+
+SANITIZER_BACKENDS = {
+  'bleach': BleachSanitizer,
+  'streaming': StreamingSanitizer
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _build_sanitizer(backend: str, kind: str) -> Sanitizer:
+  try:
+    factory = SANITIZER_BACKENDS[backend]
+  except KeyError:
+    raise ValueError(f'Unknown BLOG_SANITIZER_BACKEND {backend!r}; expected one of {sorted(SANITIZER_BACKENDS)}')
+  if kind == 'rich':
+    return factory(ALLOWED_BODY_TAGS, ALLOWED_BODY_ATTRIBUTES, ALLOWED_PROTOCOLS)
+  return factory([], {}, ALLOWED_PROTOCOLS)
+
+
+def get_sanitizer(kind: str) -> Sanitizer:
+  """Return the configured ``'rich'`` or ``'plain'`` sanitizer."""
+  return _build_sanitizer(getattr(settings, 'BLOG_SANITIZER_BACKEND', 'streaming'), kind)
+
+
+def sanitize_rich_text(value: str) -> str:
+  return get_sanitizer('rich')(value or '').strip()
+
+
+def sanitize_plain_text(value: str) -> str:
+  return get_sanitizer('plain')(value or '').strip()
+
+
+# Opening block-level tags separate words (as they do when stripped to plain
+# text); every other tag is dropped without a gap.
+_WORD_BREAK_TAGS = frozenset([
+  'address', 'article', 'aside', 'blockquote', 'dd', 'details', 'div', 'dl', 'dt', 'figcaption', 'figure', 'footer',
+  'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'ul'
+])
+
+
+def digest(value: str) -> str:
+  return hashlib.sha256(value.encode('utf-8')).hexdigest()[:32]
+
+
+def count_words(sanitized_html: str) -> int:
+  """Word count of the text nodes in already-sanitized markup.
+
+  Sanitizer output is serialized HTML (any ``<`` in text is escaped), so its
+  own tag grammar splits it into tags and text in one pass; quoted attribute
+  values such as ``title="a>b"`` stay inside their tag.
+  """
+  def separator(tag: re.Match) -> str:
+    closing, name = tag.group(1), tag.group(2).lower()
+    return ' ' if not closing and name in _WORD_BREAK_TAGS else ''
+
+  return len(_TAG_TOKEN_RE.sub(separator, sanitized_html).split())
+
+
+class SanitizationPipeline:
+  """Sanitize model fields, skipping any whose value is already our own output.
+
+  ``digests`` maps field name to the digest of the last sanitized value; it is
+  stored on the row, so a field that still hashes to it is left untouched and
+  costs a hash instead of an HTML parse.
+  """
+
+  def __init__(self, fields: dict[str, Sanitizer]):
+    self.fields = fields
+
+  def run(self, instance, digests: dict[str, str], force: bool = False) -> set[str]:
+    """Sanitize ``instance`` in place and return the names of the fields that were re-run."""
+    sanitized: set[str] = set()
+    for name, sanitizer in self.fields.items():
+      value = getattr(instance, name) or ''
+      if not force and digests.get(name) == digest(value):
+        continue
+      value = sanitizer(value)
+      setattr(instance, name, value)
+      digests[name] = digest(value)
+      sanitized.add(name)
+    return sanitized
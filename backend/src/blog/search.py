@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import re
+import typing
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import F
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+if typing.TYPE_CHECKING:
+  from .models import BlogPost
+
+SEARCH_CONFIG = 'english'
+FTS_TABLE = 'blog_blogpost_fts'
+
+# Relative weights, highest first: title > seo_title > excerpt/seo_description > body.
+FTS_COLUMNS = ('title', 'seo_title', 'excerpt', 'body')
+FTS_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_tokens(terms: typing.Iterable[str]) -> list[str]:
+  """Reduce raw search terms to bare word tokens safe to embed in a full-text query."""
+  tokens: list[str] = []
+  for term in terms:
+    tokens.extend(_TOKEN_RE.findall(term.lower()))
+  return tokens
+
+
+def build_search_vector() -> SearchVector:
+  return (
+    SearchVector('title', weight='A', config=SEARCH_CONFIG)
+    + SearchVector('seo_title', weight='B', config=SEARCH_CONFIG)
+    + SearchVector('excerpt', 'seo_description', weight='C', config=SEARCH_CONFIG)
+    + SearchVector('body', weight='D', config=SEARCH_CONFIG)
+  )
+
+
+class PostgresSearchBackend:
+  """Weighted ``tsvector`` column on ``blog_blogpost`` backed by a GIN index."""
+
+  vendor = 'postgresql'
+
+  def __init__(self, alias: str):
+    self.alias = alias
+
+  def index_post(self, post: BlogPost) -> None:
+    type(post).objects.using(self.alias).filter(pk=post.pk).update(search_vector=build_search_vector())
+
+  def remove_post(self, post_id: int) -> None:
+    # The vector lives on the row itself and disappears with it.
+    return None
+
+  def search(self, queryset, tokens: list[str]):
+    query = SearchQuery(' & '.join(f'{token}:*' for token in tokens), config=SEARCH_CONFIG, search_type='raw')
+    return (
+      queryset.filter(search_vector=query)
+      .annotate(search_rank=SearchRank(F('search_vector'), query))
+      .order_by('-search_rank', *queryset.model._meta.ordering)
+    )
+
+
+class SqliteFtsSearchBackend:
+  """FTS5 shadow table keyed by ``rowid == blog_blogpost.id``."""
+
+  vendor = 'sqlite'
+
+  def __init__(self, alias: str):
+    self.alias = alias
+
+  def index_post(self, post: BlogPost) -> None:
+    values = [
+      post.title or '',
+      post.seo_title or '',
+      f'{post.excerpt or ""} {post.seo_description or ""}',
+      post.body or ''
+    ]
+    with connections[self.alias].cursor() as cursor:
+      cursor.execute(
+        f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, {", ".join(FTS_COLUMNS)}) VALUES (%s, %s, %s, %s, %s)',
+        [post.pk, *values]
+      )
+
+  def remove_post(self, post_id: int) -> None:
+    with connections[self.alias].cursor() as cursor:
+      cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id])
+
+  def search(self, queryset, tokens: list[str]):
+    match = ' '.join(f'"{token}"*' for token in tokens)
+    table = queryset.model._meta.db_table
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    rank = RawSQL(
+      f'SELECT bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+      f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = {table}.id',
+      [match]
+    )
+    matches = RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+    # bm25() scores are negative; the best match sorts first ascending.
+    return (
+      queryset.filter(pk__in=matches)
+      .annotate(search_rank=rank)
+      .order_by('search_rank', *queryset.model._meta.ordering)
+    )
+
+
+def _sqlite_has_fts_table(alias: str) -> bool:
+  connection = connections[alias]
+  return FTS_TABLE in connection.introspection.table_names()
+
+
+_backend_cache: dict[str, typing.Any] = {}
+
+
+def get_search_backend(alias: str = 'default'):
+  """Return the full-text backend for ``alias`` or ``None`` when the database has none."""
+  if alias in _backend_cache:
+    return _backend_cache[alias]
+
+  vendor = connections[alias].vendor
+  backend = None
+  if vendor == PostgresSearchBackend.vendor:
+    backend = PostgresSearchBackend(alias)
+  elif vendor == SqliteFtsSearchBackend.vendor and _sqlite_has_fts_table(alias):
+    backend = SqliteFtsSearchBackend(alias)
+  # Only cache positive answers so a freshly migrated database is picked up.
+  if backend is not None:
+    _backend_cache[alias] = backend
+  return backend
+
+
+class BlogPostSearchFilter(filters.SearchFilter):
+  """Drop-in ``SearchFilter`` that uses the full-text index and orders by rank.
+
+  Falls back to the stock ``icontains`` behaviour over ``search_fields`` when the
+  database has no full-text backend available.
+  """
+
+  def filter_queryset(self, request, queryset, view):
+    terms = self.get_search_terms(request)
+    if not terms:
+      return queryset
+
+    backend = get_search_backend(queryset.db)
+    if backend is None:
+      return super().filter_queryset(request, queryset, view)
+
+    tokens = search_tokens(terms)
+    if not tokens:
+      return queryset.none()
+    return backend.search(queryset, tokens)
@@ -1,9 +1,15 @@
+import json
+
 from rest_framework import serializers
 
+from backend_project.metrics import TimedSerializerMixin
+
+from .images import absolute_srcset, srcset_payload
 from .models import BlogAuthor, BlogCategory, BlogPost
+from .relations import RELATED_POSTS_LIMIT
 
 
-class BlogCategorySerializer(serializers.ModelSerializer):
+class BlogCategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
   class Meta:
     model = BlogCategory
     fields = ['id', 'name', 'slug', 'description']
@@ -15,11 +21,12 @@ class BlogAuthorSerializer(serializers.ModelSerializer):
     fields = ['id', 'full_name', 'role', 'bio', 'avatar_url']
 
 
-class BlogPostListSerializer(serializers.ModelSerializer):
+class BlogPostListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
   author = BlogAuthorSerializer()
   categories = BlogCategorySerializer(many=True)
   seo = serializers.SerializerMethodField()
   hero_image_url = serializers.SerializerMethodField()
+  hero_image_variants = serializers.SerializerMethodField()
 
   class Meta:
     model = BlogPost
@@ -29,6 +36,7 @@ class BlogPostListSerializer(serializers.ModelSerializer):
       'slug',
       'excerpt',
       'hero_image_url',
+      'hero_image_variants',
       'reading_time_minutes',
       'published_at',
       'author',
@@ -46,6 +54,41 @@ class BlogPostListSerializer(serializers.ModelSerializer):
       return request.build_absolute_uri(url)
     return url
 
+  def get_hero_image_variants(self, obj: BlogPost):
+    request = self.context.get('request')
+    build_url = request.build_absolute_uri if request is not None else None
+    return srcset_payload(obj.hero_image_variants, obj.hero_image.name, build_url)
+
+
+class BlogPostCardListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+  def to_representation(self, data):
+    posts = list(data)
+    missing = [post.pk for post in posts if not post.card_json]
+    fallback = {}
+    if missing:
+      # Rows whose card has not been rendered yet take the regular serializer.
+      queryset = BlogPost.objects.filter(pk__in=missing).select_related('author').prefetch_related('categories')
+      fallback = {post.pk: BlogPostListSerializer(post, context=self.context).data for post in queryset}
+    return [fallback.get(post.pk) or self.child.to_representation(post) for post in posts]
+
+
+class BlogPostCardSerializer(TimedSerializerMixin, serializers.BaseSerializer):
+  """Read-only ``BlogPostListSerializer`` equivalent served from ``BlogPost.card_json``."""
+
+  card_fields = ('id', 'published_at', 'created_at', 'hero_image', 'card_json')
+
+  class Meta:
+    list_serializer_class = BlogPostCardListSerializer
+
+  def to_representation(self, instance: BlogPost):
+    card = json.loads(instance.card_json)
+    request = self.context.get('request')
+    if card['hero_image_url'] and instance.hero_image and request is not None:
+      card['hero_image_url'] = request.build_absolute_uri(card['hero_image_url'])
+    if card['hero_image_variants'] and request is not None:
+      card['hero_image_variants'] = absolute_srcset(card['hero_image_variants'], request.build_absolute_uri)
+    return card
+
 
 class BlogPostDetailSerializer(BlogPostListSerializer):
   body = serializers.CharField()
@@ -61,10 +104,9 @@ class BlogPostDetailSerializer(BlogPostListSerializer):
   def get_related_posts(self, obj: BlogPost):
     related_qs = (
       BlogPost.objects.published()
-      .filter(categories__in=obj.categories.values_list('pk', flat=True))
-      .exclude(pk=obj.pk)
+      .filter(inbound_relations__post=obj)
       .select_related('author')
       .prefetch_related('categories')
-      .distinct()[:3]
+      .order_by('inbound_relations__rank')[:RELATED_POSTS_LIMIT]
     )
     return BlogPostListSerializer(related_qs, many=True, context=self.context).data
@@ -0,0 +1,196 @@
+from django.db.models import DEFERRED
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import bump_content_version
+from .cards import refresh_cards
+from .images import schedule_hero_variants
+from .models import BlogAuthor, BlogCategory, BlogPost
+from .relations import refresh_relations, refresh_relations_around
+from .search import get_search_backend
+from .sitemap_artifacts import schedule_sitemap_rebuild
+
+
+@receiver(post_delete, sender=BlogPost, dispatch_uid='blog_post_remove_from_search_index')
+def remove_post_from_search_index(sender, instance: BlogPost, using: str, **kwargs):
+  backend = get_search_backend(using)
+  if backend is not None:
+    backend.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=BlogPost, dispatch_uid='blog_post_refresh_relations_on_save')
+def refresh_relations_on_save(sender, instance: BlogPost, created: bool, raw: bool, **kwargs):
+  if raw:
+    return
+  if created or instance.has_changed('status', 'published_at'):
+    refresh_relations_around(instance.pk)
+
+
+@receiver(m2m_changed, sender=BlogPost.categories.through, dispatch_uid='blog_post_refresh_relations_on_categories')
+def refresh_relations_on_categories(sender, instance, action: str, reverse: bool, pk_set, **kwargs):
+  if action == 'pre_clear':
+    if reverse:
+      instance._cleared_post_ids = set(instance.posts.values_list('pk', flat=True))
+    else:
+      instance._cleared_category_ids = set(instance.categories.values_list('pk', flat=True))
+    return
+  if action not in ('post_add', 'post_remove', 'post_clear'):
+    return
+
+  if reverse:
+    # ``category.posts.add(...)``: ``pk_set`` holds post ids.
+    post_ids = pk_set if action != 'post_clear' else instance.__dict__.pop('_cleared_post_ids', set())
+    for post_id in post_ids or ():
+      refresh_relations_around(post_id, [instance.pk])
+  else:
+    category_ids = pk_set if action != 'post_clear' else instance.__dict__.pop('_cleared_category_ids', set())
+    refresh_relations_around(instance.pk, category_ids or ())
+
+
+@receiver(pre_delete, sender=BlogPost, dispatch_uid='blog_post_stash_categories_before_delete')
+def stash_post_categories(sender, instance: BlogPost, **kwargs):
+  instance._deleted_category_ids = set(instance.categories.values_list('pk', flat=True))
+  # Their edges to this post are deleted with it.
+  instance._deleted_holder_ids = set(instance.inbound_relations.values_list('post_id', flat=True))
+
+
+@receiver(post_delete, sender=BlogPost, dispatch_uid='blog_post_refresh_relations_on_delete')
+def refresh_relations_on_post_delete(sender, instance: BlogPost, **kwargs):
+  category_ids = instance.__dict__.pop('_deleted_category_ids', set())
+  holder_ids = instance.__dict__.pop('_deleted_holder_ids', set())
+  if category_ids or holder_ids:
+    refresh_relations_around(instance.pk, category_ids, holder_ids)
+
+
+@receiver(pre_delete, sender=BlogCategory, dispatch_uid='blog_category_stash_posts_before_delete')
+def stash_category_posts(sender, instance: BlogCategory, **kwargs):
+  instance._deleted_post_ids = set(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=BlogCategory, dispatch_uid='blog_category_refresh_relations_on_delete')
+def refresh_relations_on_category_delete(sender, instance: BlogCategory, **kwargs):
+  post_ids = instance.__dict__.pop('_deleted_post_ids', set())
+  if post_ids:
+    # The through rows are gone already, so refresh each post's remaining neighbourhood.
+    refresh_relations(post_ids)
+
+
+def invalidate_blog_cache(sender, **kwargs):
+  if kwargs.get('raw'):
+    return
+  action = kwargs.get('action')
+  if action is not None and not action.startswith('post_'):
+    return
+  bump_content_version()
+
+
+for model in (BlogPost, BlogAuthor, BlogCategory):
+  post_save.connect(invalidate_blog_cache, sender=model, dispatch_uid=f'blog_cache_save_{model.__name__}')
+  post_delete.connect(invalidate_blog_cache, sender=model, dispatch_uid=f'blog_cache_delete_{model.__name__}')
+m2m_changed.connect(invalidate_blog_cache, sender=BlogPost.categories.through, dispatch_uid='blog_cache_categories')
+
+
+def touch_posts(queryset) -> None:
+  """Advance ``updated_at`` on posts whose payload embeds a changed author or category.
+
+  Keeps ``MAX(updated_at)`` a faithful fingerprint for conditional GETs.
+  """
+  if queryset.update(updated_at=timezone.now()):
+    schedule_sitemap_rebuild(queryset.db)
+
+
+@receiver(post_save, sender=BlogAuthor, dispatch_uid='blog_author_touch_posts_on_save')
+@receiver(pre_delete, sender=BlogAuthor, dispatch_uid='blog_author_touch_posts_on_delete')
+def touch_author_posts(sender, instance: BlogAuthor, **kwargs):
+  if not kwargs.get('raw'):
+    touch_posts(BlogPost.objects.filter(author=instance))
+
+
+@receiver(post_save, sender=BlogCategory, dispatch_uid='blog_category_touch_posts_on_save')
+@receiver(pre_delete, sender=BlogCategory, dispatch_uid='blog_category_touch_posts_on_delete')
+def touch_category_posts(sender, instance: BlogCategory, **kwargs):
+  if not kwargs.get('raw'):
+    touch_posts(BlogPost.objects.filter(categories=instance))
+
+
+@receiver(m2m_changed, sender=BlogPost.categories.through, dispatch_uid='blog_post_touch_on_categories')
+def touch_posts_on_categories(sender, instance, action: str, reverse: bool, pk_set, **kwargs):
+  if action == 'pre_clear':
+    queryset = BlogPost.objects.filter(categories=instance) if reverse else BlogPost.objects.filter(pk=instance.pk)
+  elif action in ('post_add', 'post_remove'):
+    queryset = BlogPost.objects.filter(pk__in=pk_set) if reverse else BlogPost.objects.filter(pk=instance.pk)
+  else:
+    return
+  touch_posts(queryset)
+
+
+def sitemap_entry_changed(instance: BlogPost) -> bool:
+  if instance.has_changed('slug', 'canonical_url', 'published_at', 'status'):
+    return True
+  # ``<lastmod>`` has day precision, so same-day edits leave the sitemap as is.
+  previous = getattr(instance, '_loaded_values', {}).get('updated_at')
+  return not previous or previous is DEFERRED or previous.date() != instance.updated_at.date()
+
+
+@receiver(post_save, sender=BlogPost, dispatch_uid='blog_post_rebuild_sitemap_on_save')
+def rebuild_sitemap_on_save(sender, instance: BlogPost, created: bool, raw: bool, using: str, **kwargs):
+  if raw:
+    return
+  was_published = not created and instance.has_changed('status')
+  if instance.status == BlogPost.Status.PUBLISHED or was_published:
+    if sitemap_entry_changed(instance):
+      schedule_sitemap_rebuild(using)
+
+
+@receiver(post_delete, sender=BlogPost, dispatch_uid='blog_post_rebuild_sitemap_on_delete')
+def rebuild_sitemap_on_delete(sender, instance: BlogPost, using: str, **kwargs):
+  if instance.status == BlogPost.Status.PUBLISHED:
+    schedule_sitemap_rebuild(using)
+
+
+@receiver(post_save, sender=BlogPost, dispatch_uid='blog_post_refresh_card_on_save')
+def refresh_card_on_save(sender, instance: BlogPost, raw: bool, using: str, **kwargs):
+  if not raw:
+    instance.card_json = refresh_cards([instance.pk], using).get(instance.pk, '')
+
+
+@receiver(post_save, sender=BlogPost, dispatch_uid='blog_post_build_hero_variants_on_save')
+def build_hero_variants_on_save(sender, instance: BlogPost, raw: bool, using: str, **kwargs):
+  if raw or not instance.hero_image:
+    return
+  if instance.hero_image_variants.get('source') != instance.hero_image.name:
+    schedule_hero_variants(instance, using)
+
+
+@receiver(m2m_changed, sender=BlogPost.categories.through, dispatch_uid='blog_post_refresh_cards_on_categories')
+def refresh_cards_on_categories(sender, instance, action: str, reverse: bool, pk_set, using: str, **kwargs):
+  if action == 'pre_clear' and reverse:
+    instance._card_post_ids = set(instance.posts.values_list('pk', flat=True))
+  if action not in ('post_add', 'post_remove', 'post_clear'):
+    return
+  if not reverse:
+    instance.card_json = refresh_cards([instance.pk], using).get(instance.pk, '')
+  elif action == 'post_clear':
+    refresh_cards(instance.__dict__.pop('_card_post_ids', ()), using)
+  else:
+    refresh_cards(pk_set or (), using)
+
+
+@receiver(post_save, sender=BlogAuthor, dispatch_uid='blog_author_refresh_cards_on_save')
+@receiver(post_save, sender=BlogCategory, dispatch_uid='blog_category_refresh_cards_on_save')
+def refresh_cards_on_related_save(sender, instance, raw: bool, using: str, **kwargs):
+  if not raw:
+    refresh_cards(instance.posts.values_list('pk', flat=True), using)
+
+
+@receiver(pre_delete, sender=BlogAuthor, dispatch_uid='blog_author_stash_card_posts')
+@receiver(pre_delete, sender=BlogCategory, dispatch_uid='blog_category_stash_card_posts')
+def stash_card_posts(sender, instance, **kwargs):
+  instance._card_post_ids = set(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=BlogAuthor, dispatch_uid='blog_author_refresh_cards_on_delete')
+@receiver(post_delete, sender=BlogCategory, dispatch_uid='blog_category_refresh_cards_on_delete')
+def refresh_cards_on_related_delete(sender, instance, using: str, **kwargs):
+  refresh_cards(instance.__dict__.pop('_card_post_ids', ()), using)
@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+from .sitemaps import (
+  SITEMAP_CHUNK_SIZE,
+  UrlBuilder,
+  iter_sitemap_index,
+  iter_urlset,
+  max_urls_per_sitemap,
+  sitemap_queryset
+)
+
+MANIFEST_NAME = 'sitemap.json'
+LOCK_NAME = '.sitemap.lock'
+# Touched (mtime = when) each time a committed change makes the artifacts stale.
+DIRTY_NAME = '.sitemap.dirty'
+INDEX_NAME = 'sitemap.xml'
+NO_SCHEDULED_POSTS = 0
+
+
+def artifact_origin() -> str:
+  """Public origin baked into pre-rendered sitemaps; empty disables artifacts."""
+  return getattr(settings, 'BLOG_SITEMAP_ORIGIN', '').rstrip('/')
+
+
+def artifact_root() -> Path:
+  return Path(getattr(settings, 'BLOG_SITEMAP_ROOT', Path(settings.MEDIA_ROOT) / 'sitemaps'))
+
+
+def rebuild_interval() -> float:
+  return getattr(settings, 'BLOG_SITEMAP_REBUILD_INTERVAL', 30)
+
+
+def page_name(page: int) -> str:
+  return f'sitemap-{page}.xml'
+
+
+class _ArtifactWriter:
+  """Write ``name`` and ``name.gz`` side by side and swap them in atomically on close."""
+
+  def __init__(self, root: Path, name: str):
+    self.root = root
+    self.name = name
+    self._plain = tempfile.NamedTemporaryFile(dir=root, prefix=f'.{name}.', delete=False)
+    self._packed = tempfile.NamedTemporaryFile(dir=root, prefix=f'.{name}.gz.', delete=False)
+    self._gzip = gzip.GzipFile(fileobj=self._packed, mode='wb', mtime=0)
+    self._digest = hashlib.sha256()
+
+  def write(self, text: str) -> None:
+    data = text.encode('utf-8')
+    self._plain.write(data)
+    self._gzip.write(data)
+    self._digest.update(data)
+
+  def close(self) -> str:
+    self._gzip.close()
+    for handle, target in ((self._plain, self.name), (self._packed, f'{self.name}.gz')):
+      handle.flush()
+      os.fchmod(handle.fileno(), 0o644)
+      handle.close()
+      os.replace(handle.name, self.root / target)
+    return self._digest.hexdigest()[:32]
+
+
+def _write(root: Path, name: str, chunks) -> str:
+  writer = _ArtifactWriter(root, name)
+  for chunk in chunks:
+    writer.write(chunk)
+  return writer.close()
+
+
+def _next_publish_at() -> int:
+  from .models import BlogPost
+
+  upcoming = BlogPost.objects.next_publish_at()
+  return int(upcoming.timestamp()) if upcoming else NO_SCHEDULED_POSTS
+
+
+@contextlib.contextmanager
+def rebuild_lock(blocking: bool = True):
+  """Hold the artifact directory's rebuild lock across processes; yields whether it was acquired."""
+  root = artifact_root()
+  root.mkdir(parents=True, exist_ok=True)
+  with open(root / LOCK_NAME, 'a') as handle:
+    try:
+      fcntl.flock(handle, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+      yield False
+      return
+    try:
+      yield True
+    finally:
+      fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def build_sitemap_artifacts(origin: str | None = None, blocking: bool = True) -> dict | None:
+  """Render every sitemap file in a single pass over the published posts.
+
+  Returns ``None`` without building when ``blocking`` is false and another
+  rebuild holds the lock.
+  """
+  origin = (origin or artifact_origin()).rstrip('/')
+  with rebuild_lock(blocking) as acquired:
+    return _build(origin) if acquired else None
+
+
+def _build(origin: str) -> dict:
+  from .models import BlogPost
+
+  root = artifact_root()
+  # Changes marked dirty after this point may be missing from the rows read below.
+  started_at = time.time()
+  build_url = UrlBuilder(origin)
+  per_page = max_urls_per_sitemap()
+  next_publish_at = _next_publish_at()
+
+  rows = iter(sitemap_queryset(BlogPost.objects.published()).iterator(chunk_size=SITEMAP_CHUNK_SIZE))
+  files: dict[str, str] = {}
+  pages = 0
+  while True:
+    first = next(rows, None)
+    if first is None and pages:
+      break
+    pages += 1
+    page_rows = itertools.chain([first] if first else [], itertools.islice(rows, per_page - 1))
+    files[page_name(pages)] = _write(root, page_name(pages), iter_urlset(page_rows, build_url))
+
+  if pages == 1:
+    for suffix in ('', '.gz'):
+      shutil.copyfile(root / f'{page_name(1)}{suffix}', root / f'{INDEX_NAME}{suffix}')
+    files[INDEX_NAME] = files[page_name(1)]
+  else:
+    files[INDEX_NAME] = _write(root, INDEX_NAME, iter_sitemap_index(pages, build_url))
+
+  manifest = {
+    'origin': origin,
+    'built_at': int(time.time()),
+    'started_at': started_at,
+    'next_publish_at': next_publish_at,
+    'pages': pages,
+    'files': files
+  }
+  _write_manifest(root, manifest)
+
+  for stale in root.glob('sitemap-*.xml*'):
+    number = stale.name.split('-', 1)[1].split('.', 1)[0]
+    if number.isdigit() and int(number) > pages:
+      stale.unlink(missing_ok=True)
+  return manifest
+
+
+def _write_manifest(root: Path, manifest: dict) -> None:
+  handle = tempfile.NamedTemporaryFile('w', dir=root, prefix=f'.{MANIFEST_NAME}.', delete=False)
+  with handle:
+    json.dump(manifest, handle)
+  os.replace(handle.name, root / MANIFEST_NAME)
+
+
+def load_manifest() -> dict | None:
+  try:
+    return json.loads((artifact_root() / MANIFEST_NAME).read_text())
+  except (FileNotFoundError, ValueError):
+    return None
+
+
+def mark_dirty() -> None:
+  path = artifact_root() / DIRTY_NAME
+  path.parent.mkdir(parents=True, exist_ok=True)
+  now = time.time()
+  path.touch()
+  os.utime(path, (now, now))
+
+
+def _dirty_since() -> float:
+  try:
+    return (artifact_root() / DIRTY_NAME).stat().st_mtime
+  except FileNotFoundError:
+    return 0.0
+
+
+def _is_current(manifest: dict | None, origin: str) -> bool:
+  if manifest is None or manifest['origin'] != origin:
+    return False
+  if _dirty_since() >= manifest.get('started_at', 0):
+    return False
+  next_publish_at = manifest['next_publish_at']
+  return next_publish_at == NO_SCHEDULED_POSTS or time.time() < next_publish_at
+
+
+def current_manifest() -> dict | None:
+  """Manifest for the configured origin, rebuilt first when missing or outdated.
+
+  Saves mark the artifacts dirty, and a scheduled post going live (the only
+  change that happens without a save) is remembered in the manifest. One
+  worker rebuilds while the others keep serving the previous artifact; they
+  only wait when there is none for this origin.
+  """
+  origin = artifact_origin()
+  if not origin:
+    return None
+  manifest = load_manifest()
+  if _is_current(manifest, origin):
+    return manifest
+
+  servable = manifest is not None and manifest['origin'] == origin
+  with rebuild_lock(blocking=not servable) as acquired:
+    if not acquired:
+      return manifest
+    # Another worker may have finished the rebuild while this one waited.
+    manifest = load_manifest()
+    if not _is_current(manifest, origin):
+      manifest = _build(origin)
+  return manifest
+
+
+_rebuilds = threading.local()
+
+
+def schedule_sitemap_rebuild(using: str | None = None) -> None:
+  """Mark the artifacts stale once the current transaction commits, and rebuild them if due.
+
+  Rebuilds are debounced: a commit only rebuilds when the artifacts are
+  older than ``BLOG_SITEMAP_REBUILD_INTERVAL`` and no other rebuild is
+  running. Otherwise the dirty mark is left for the next sitemap request
+  (``current_manifest``), so a loop of saves under autocommit costs one
+  file touch each rather than a full rebuild. Within one transaction only
+  the first callback to run after the latest request does anything; the
+  counters are per thread, as connections are. A rolled-back transaction's
+  callbacks never run, so they cannot leave a stale "already scheduled"
+  mark behind.
+  """
+  if not artifact_origin():
+    return
+  if not hasattr(_rebuilds, 'requested'):
+    _rebuilds.requested = _rebuilds.built = 0
+  _rebuilds.requested += 1
+
+  def rebuild():
+    if _rebuilds.built >= _rebuilds.requested:
+      return
+    _rebuilds.built = _rebuilds.requested
+    mark_dirty()
+    manifest = load_manifest()
+    if manifest is None or time.time() - manifest['built_at'] >= rebuild_interval():
+      build_sitemap_artifacts(blocking=False)
+
+  transaction.on_commit(rebuild, using=using)
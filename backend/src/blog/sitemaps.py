@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import typing
+import zlib
+from urllib.parse import urljoin
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+
+# https://www.sitemaps.org/protocol.html#index
+SITEMAP_PROTOCOL_MAX_URLS = 50000
+SITEMAP_CHUNK_SIZE = 2000
+SITEMAP_NAMESPACE = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+SITEMAP_FIELDS = ('slug', 'canonical_url', 'updated_at', 'published_at')
+
+
+def max_urls_per_sitemap() -> int:
+  return min(getattr(settings, 'BLOG_SITEMAP_MAX_URLS', SITEMAP_PROTOCOL_MAX_URLS), SITEMAP_PROTOCOL_MAX_URLS)
+
+
+def sitemap_queryset(queryset):
+  """Stable order so paginated child sitemaps never overlap or skip rows.
+
+  The database is fixed now: rows are streamed after the request's replica
+  routing (``backend_project.routers``) has ended.
+  """
+  return queryset.using(queryset.db).order_by('-published_at', '-created_at', '-pk').values_list(*SITEMAP_FIELDS)
+
+
+def page_count(total: int) -> int:
+  return max(1, -(-total // max_urls_per_sitemap()))
+
+
+class UrlBuilder:
+  """Resolve post locations against an origin computed once per sitemap."""
+
+  def __init__(self, origin: str):
+    self.origin = origin.rstrip('/')
+
+  @classmethod
+  def for_request(cls, request) -> UrlBuilder:
+    return cls(request.build_absolute_uri('/'))
+
+  def __call__(self, path: str) -> str:
+    if path.startswith('http'):
+      return path
+    if path.startswith('/'):
+      return f'{self.origin}{path}'
+    return urljoin(f'{self.origin}/', path)
+
+
+def render_url_entry(loc: str, lastmod_dt) -> str:
+  lastmod = (lastmod_dt or timezone.now()).date().isoformat()
+  return '\n'.join([
+    '  <url>',
+    f'    <loc>{escape(loc)}</loc>',
+    f'    <lastmod>{lastmod}</lastmod>',
+    '    <changefreq>monthly</changefreq>',
+    '    <priority>0.7</priority>',
+    '  </url>'
+  ])
+
+
+URLSET_HEAD = f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NAMESPACE}">\n'
+URLSET_TAIL = '</urlset>\n'
+
+
+def render_url_entries(rows: list[tuple], build_url: typing.Callable[[str], str]) -> str:
+  return '\n'.join(
+    render_url_entry(build_url(canonical_url or f'/blog/{slug}'), updated_at or published_at)
+    for slug, canonical_url, updated_at, published_at in rows
+  ) + '\n'
+
+
+def iter_urlset(rows: typing.Iterable[tuple], build_url: typing.Callable[[str], str]) -> typing.Iterator[str]:
+  """Yield a ``<urlset>`` document, one chunk of ``<url>`` entries at a time."""
+  yield URLSET_HEAD
+  buffer: list[tuple] = []
+  for row in rows:
+    buffer.append(row)
+    if len(buffer) >= SITEMAP_CHUNK_SIZE:
+      yield render_url_entries(buffer, build_url)
+      buffer = []
+  if buffer:
+    yield render_url_entries(buffer, build_url)
+  yield URLSET_TAIL
+
+
+async def aiter_urlset(rows: typing.AsyncIterable[tuple], build_url: typing.Callable[[str], str]) -> typing.AsyncIterator[str]:
+  """``iter_urlset`` over an async iterator such as ``QuerySet.aiterator()``."""
+  yield URLSET_HEAD
+  buffer: list[tuple] = []
+  async for row in rows:
+    buffer.append(row)
+    if len(buffer) >= SITEMAP_CHUNK_SIZE:
+      yield render_url_entries(buffer, build_url)
+      buffer = []
+  if buffer:
+    yield render_url_entries(buffer, build_url)
+  yield URLSET_TAIL
+
+
+def iter_sitemap_index(pages: int, build_url: typing.Callable[[str], str]) -> typing.Iterator[str]:
+  yield f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NAMESPACE}">\n'
+  for page in range(1, pages + 1):
+    loc = build_url(reverse('blog:blog-sitemap-page', kwargs={'page': page}))
+    yield f'  <sitemap>\n    <loc>{escape(loc)}</loc>\n  </sitemap>\n'
+  yield '</sitemapindex>\n'
+
+
+def accepts_gzip(request) -> bool:
+  accepted = request.META.get('HTTP_ACCEPT_ENCODING', '')
+  return any(part.split(';')[0].strip() == 'gzip' for part in accepted.split(','))
+
+
+def _gzip_compressor():
+  return zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def gzip_stream(chunks: typing.Iterable[str]) -> typing.Iterator[bytes]:
+  compressor = _gzip_compressor()
+  for chunk in chunks:
+    data = compressor.compress(chunk.encode('utf-8'))
+    if data:
+      yield data
+  yield compressor.flush()
+
+
+async def agzip_stream(chunks: typing.AsyncIterable[str]) -> typing.AsyncIterator[bytes]:
+  compressor = _gzip_compressor()
+  async for chunk in chunks:
+    data = compressor.compress(chunk.encode('utf-8'))
+    if data:
+      yield data
+  yield compressor.flush()
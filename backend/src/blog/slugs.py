@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import re
+import uuid
+
+from django.db import IntegrityError, router, transaction
+from django.utils.text import slugify
+
+SLUG_SAVE_ATTEMPTS = 5
+_SUFFIX_RE = re.compile(r'-(\d+)$')
+
+
+def slug_base(value: str) -> str:
+  return (slugify(value) if value else '') or uuid.uuid4().hex[:16]
+
+
+def next_free_slug(instance, base: str, field_name: str = 'slug', using: str | None = None) -> str:
+  """Pick ``base`` or the lowest free ``base-N`` with a single query.
+
+  ``base`` must already be slugified, so it only contains ``[a-z0-9_-]`` and
+  is safe to embed in a regular expression on every backend.
+  """
+  model = type(instance)
+  max_length = model._meta.get_field(field_name).max_length
+  # Leave room for a suffix so the candidate never outgrows the column.
+  base = base[:max_length - 8].rstrip('-') or base[:max_length]
+  taken = set(
+    model._default_manager.using(using or router.db_for_write(model, instance=instance))
+    .filter(**{f'{field_name}__regex': rf'^{base}(-[0-9]+)?$'})
+    .exclude(pk=instance.pk)
+    .values_list(field_name, flat=True)
+  )
+  if base not in taken:
+    return base
+
+  suffixes = {int(match.group(1)) for slug in taken if (match := _SUFFIX_RE.fullmatch(slug[len(base):]))}
+  index = 1
+  while index in suffixes:
+    index += 1
+  return f'{base}-{index}'
+
+
+def save_with_unique_slug(instance, base: str, save, *args, field_name: str = 'slug', **kwargs):
+  """Run ``save`` with a freshly allocated slug, retrying if a concurrent writer takes it first."""
+  using = kwargs.get('using') or router.db_for_write(type(instance), instance=instance)
+  for attempt in range(1, SLUG_SAVE_ATTEMPTS + 1):
+    candidate = next_free_slug(instance, base, field_name=field_name, using=using)
+    setattr(instance, field_name, candidate)
+    try:
+      with transaction.atomic(using=using):
+        return save(*args, **kwargs)
+    except IntegrityError:
+      lost_race = (
+        type(instance)._default_manager.using(using)
+        .filter(**{field_name: candidate})
+        .exclude(pk=instance.pk)
+        .exists()
+      )
+      if not lost_race or attempt == SLUG_SAVE_ATTEMPTS:
+        raise
@@ -1,12 +1,70 @@
+import gzip
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from xml.etree import ElementTree
+
+from asgiref.sync import sync_to_async
+from django.core.files.storage import default_storage
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.response import Response
 from rest_framework.test import APITestCase
 
-from .models import BlogAuthor, BlogCategory, BlogPost
+from backend_project.instrumentation import QueryBudgetExceeded, missing_budgets
+
+from . import async_urls as blog_async_urls
+from . import async_views as blog_async_views
+from . import urls as blog_urls
+from . import views as blog_views
+from . import images as blog_images
+from . import sitemap_artifacts
+from .cache import NEXT_PUBLISH_KEY, get_content_version
+from .models import BlogAuthor, BlogCategory, BlogPost, BlogPostRelation
+from .relations import rebuild_all_relations, refresh_relations
+from .serializers import BlogPostDetailSerializer, BlogPostListSerializer
+from .sanitizers import (
+  ALLOWED_BODY_ATTRIBUTES,
+  ALLOWED_BODY_TAGS,
+  ALLOWED_PROTOCOLS,
+  BleachSanitizer,
+  StreamingSanitizer,
+  count_words,
+  get_sanitizer,
+  sanitize_plain_text,
+  sanitize_rich_text
+)
+from .sitemaps import sitemap_queryset
+from .slugs import next_free_slug
+from .sitemap_artifacts import build_sitemap_artifacts, current_manifest, load_manifest, rebuild_lock
+
+
+class BlogTestCase(APITestCase):
+  def setUp(self):
+    # Cached responses outlive the per-test transaction rollback.
+    cache.clear()
 
 
-class BlogApiTests(APITestCase):
+class BlogApiTests(BlogTestCase):
   def setUp(self):
+    super().setUp()
     self.author = BlogAuthor.objects.create(full_name='Jane Writer', role='Content Lead')
     self.category = BlogCategory.objects.create(name='Product', slug='product')
     self.published_post = BlogPost.objects.create(
@@ -29,7 +87,7 @@ class BlogApiTests(APITestCase):
     url = reverse('blog:blog-posts-list')
     response = self.client.get(url)
     self.assertEqual(response.status_code, status.HTTP_200_OK)
-    slugs = [item['slug'] for item in response.data['results']]
+    slugs = [item['slug'] for item in response.json()['results']]
     self.assertIn(self.published_post.slug, slugs)
     self.assertNotIn(self.draft_post.slug, slugs)
 
@@ -37,9 +95,9 @@ class BlogApiTests(APITestCase):
     url = reverse('blog:blog-posts-detail', kwargs={'slug': self.published_post.slug})
     response = self.client.get(url)
     self.assertEqual(response.status_code, status.HTTP_200_OK)
-    self.assertEqual(response.data['slug'], self.published_post.slug)
-    self.assertIn('body', response.data)
-    self.assertEqual(response.data['canonical_url'], f"/blog/{self.published_post.slug}")
+    self.assertEqual(response.json()['slug'], self.published_post.slug)
+    self.assertIn('body', response.json())
+    self.assertEqual(response.json()['canonical_url'], f"/blog/{self.published_post.slug}")
 
   def test_draft_detail_returns_404(self):
     url = reverse('blog:blog-posts-detail', kwargs={'slug': self.draft_post.slug})
@@ -59,6 +117,1511 @@ class BlogApiTests(APITestCase):
     url = reverse('blog:blog-posts-list')
     response = self.client.get(url, {'category': 'growth'})
     self.assertEqual(response.status_code, status.HTTP_200_OK)
-    slugs = [item['slug'] for item in response.data['results']]
+    slugs = [item['slug'] for item in response.json()['results']]
     self.assertIn(other_post.slug, slugs)
     self.assertNotIn(self.published_post.slug, slugs)
+
+
+class BlogSearchTests(BlogTestCase):
+  def setUp(self):
+    super().setUp()
+    self.url = reverse('blog:blog-posts-list')
+    self.title_match = BlogPost.objects.create(
+      title='Kubernetes Migration Guide',
+      excerpt='Moving workloads.',
+      body='<p>Plain body</p>',
+      status=BlogPost.Status.PUBLISHED,
+    )
+    self.body_match = BlogPost.objects.create(
+      title='Quarterly Review',
+      excerpt='What we shipped.',
+      body='<p>We also finished our kubernetes rollout.</p>',
+      status=BlogPost.Status.PUBLISHED,
+    )
+    self.unrelated = BlogPost.objects.create(
+      title='Design Systems',
+      excerpt='Tokens and components.',
+      body='<p>Nothing to see</p>',
+      status=BlogPost.Status.PUBLISHED,
+    )
+
+  def search(self, term):
+    response = self.client.get(self.url, {'search': term})
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    return [item['slug'] for item in response.json()['results']]
+
+  def test_results_are_ranked_by_field_weight(self):
+    slugs = self.search('kubernetes')
+    self.assertEqual(slugs, [self.title_match.slug, self.body_match.slug])
+
+  def test_prefix_and_multiple_terms(self):
+    self.assertEqual(self.search('kubern migration'), [self.title_match.slug])
+
+  def test_index_follows_saves_and_deletes(self):
+    self.unrelated.title = 'Kubernetes Design Systems'
+    self.unrelated.save()
+    self.assertIn(self.unrelated.slug, self.search('kubernetes'))
+
+    self.title_match.delete()
+    self.assertNotIn(self.title_match.slug, self.search('kubernetes'))
+
+  def test_query_syntax_is_not_interpreted(self):
+    self.assertEqual(self.search('"kubernetes*'), [self.title_match.slug, self.body_match.slug])
+    self.assertEqual(self.search('-- "'), [])
+
+  def test_drafts_are_not_searchable(self):
+    self.body_match.status = BlogPost.Status.DRAFT
+    self.body_match.save()
+    self.assertEqual(self.search('kubernetes'), [self.title_match.slug])
+
+
+class BlogRelatedPostsTests(BlogTestCase):
+  def setUp(self):
+    super().setUp()
+    self.product = BlogCategory.objects.create(name='Product', slug='product')
+    self.growth = BlogCategory.objects.create(name='Growth', slug='growth')
+    now = timezone.now()
+    self.source = self.make_post('Source', now - timedelta(days=1), [self.product, self.growth])
+    self.both = self.make_post('Shares Both', now - timedelta(days=90), [self.product, self.growth])
+    self.near = self.make_post('Product Near', now - timedelta(days=2), [self.product])
+    self.far = self.make_post('Product Far', now - timedelta(days=60), [self.product])
+    self.other = self.make_post('Unrelated', now - timedelta(days=1), [])
+
+  def make_post(self, title, published_at, categories):
+    post = BlogPost.objects.create(
+      title=title,
+      excerpt='Excerpt',
+      body='<p>Body</p>',
+      status=BlogPost.Status.PUBLISHED,
+      published_at=published_at,
+    )
+    post.categories.set(categories)
+    return post
+
+  def related_slugs(self, post):
+    url = reverse('blog:blog-posts-detail', kwargs={'slug': post.slug})
+    response = self.client.get(url)
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    return [item['slug'] for item in response.json()['related_posts']]
+
+  def test_related_posts_ordered_by_overlap_then_recency(self):
+    self.assertEqual(self.related_slugs(self.source), [self.both.slug, self.near.slug, self.far.slug])
+
+  def test_category_changes_update_neighbours(self):
+    self.near.categories.remove(self.product)
+    self.assertEqual(self.related_slugs(self.source), [self.both.slug, self.far.slug])
+
+    self.other.categories.add(self.growth)
+    self.assertIn(self.source.slug, self.related_slugs(self.other))
+
+    self.growth.posts.clear()
+    self.assertNotIn(self.source.slug, self.related_slugs(self.other))
+
+  def test_unpublishing_and_deleting_remove_relations(self):
+    self.both.status = BlogPost.Status.DRAFT
+    self.both.save()
+    self.assertEqual(self.related_slugs(self.source), [self.near.slug, self.far.slug])
+    self.assertFalse(BlogPostRelation.objects.filter(post=self.both).exists())
+
+    self.near.delete()
+    self.assertEqual(self.related_slugs(self.source), [self.far.slug])
+
+  def test_scheduled_posts_are_skipped_until_visible(self):
+    future = self.make_post('Scheduled', timezone.now() + timedelta(days=3), [self.product, self.growth])
+    self.assertTrue(BlogPostRelation.objects.filter(post=self.source, related_post=future).exists())
+    self.assertNotIn(future.slug, self.related_slugs(self.source))
+
+  def test_rebuild_matches_incremental_state(self):
+    incremental = list(BlogPostRelation.objects.values_list('post_id', 'related_post_id', 'rank'))
+    BlogPostRelation.objects.all().delete()
+    rebuild_all_relations()
+    rebuilt = list(BlogPostRelation.objects.values_list('post_id', 'related_post_id', 'rank'))
+    self.assertEqual(rebuilt, incremental)
+
+  def test_neighbours_are_updated_incrementally(self):
+    now = timezone.now()
+    posts = [self.make_post(f'Member {day}', now - timedelta(days=day * 7), [self.product]) for day in range(1, 8)]
+
+    def edges():
+      return sorted(BlogPostRelation.objects.values_list('post_id', 'related_post_id', 'rank'))
+
+    with mock.patch('blog.relations.RELATED_POSTS_STORED', 3):
+      changes = [
+        lambda: setattr(posts[0], 'published_at', now - timedelta(days=200)) or posts[0].save(),
+        lambda: posts[1].categories.add(self.growth),
+        lambda: posts[2].categories.remove(self.product),
+        lambda: setattr(self.near, 'status', BlogPost.Status.DRAFT) or self.near.save(),
+        lambda: posts[3].delete(),
+        lambda: setattr(self.near, 'status', BlogPost.Status.PUBLISHED) or self.near.save(),
+      ]
+      for change in changes:
+        change()
+        incremental = edges()
+        rebuild_all_relations()
+        self.assertEqual(edges(), incremental)
+
+  def test_promoting_a_post_does_not_recompute_its_neighbours(self):
+    now = timezone.now()
+    for day in range(20):
+      self.make_post(f'Member {day}', now - timedelta(days=day + 3), [self.product])
+    with mock.patch('blog.relations.refresh_relations', wraps=refresh_relations) as refresh:
+      self.far.categories.add(self.growth)
+    self.assertEqual([call.args[0] for call in refresh.call_args_list], [[self.far.pk]])
+    self.assertEqual(self.related_slugs(self.source)[:2], [self.far.slug, self.both.slug])
+
+
+class BlogResponseCacheTests(BlogTestCase):
+  def setUp(self):
+    super().setUp()
+    self.author = BlogAuthor.objects.create(full_name='Jane Writer')
+    self.category = BlogCategory.objects.create(name='Product', slug='product')
+    self.post = BlogPost.objects.create(
+      title='Cached Post',
+      excerpt='Excerpt',
+      body='<p>Body</p>',
+      status=BlogPost.Status.PUBLISHED,
+      author=self.author,
+    )
+    self.post.categories.add(self.category)
+    self.list_url = reverse('blog:blog-posts-list')
+
+  def get(self, url, params=None):
+    response = self.client.get(url, params or {})
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    return response
+
+  def test_repeat_requests_are_served_without_queries(self):
+    first = self.get(self.list_url)
+    self.assertEqual(first['X-Blog-Cache'], 'miss')
+    with CaptureQueriesContext(connection) as queries:
+      second = self.get(self.list_url)
+    self.assertEqual(second['X-Blog-Cache'], 'hit')
+    self.assertEqual(len(queries), 0)
+    self.assertEqual(first.content, second.content)
+
+  def test_query_params_are_part_of_the_key(self):
+    self.get(self.list_url, {'category': 'product'})
+    self.assertEqual(self.get(self.list_url, {'category': 'other'})['X-Blog-Cache'], 'miss')
+    self.assertEqual(self.get(self.list_url, {'category': 'product', 'utm': 'x'})['X-Blog-Cache'], 'hit')
+
+  def test_media_type_parameters_bypass_the_cache(self):
+    pretty = self.client.get(self.list_url, HTTP_ACCEPT='application/json; indent=4')
+    self.assertNotIn('X-Blog-Cache', pretty)
+    self.assertIn(b'\n    "count"', pretty.content)
+
+    plain = self.get(self.list_url)
+    self.assertEqual(plain['X-Blog-Cache'], 'miss')
+    self.assertNotIn(b'\n', plain.content)
+    self.assertNotEqual(plain['ETag'], pretty['ETag'])
+
+    hit = self.get(self.list_url)
+    self.assertEqual(hit['X-Blog-Cache'], 'hit')
+    self.assertEqual((hit['Vary'], hit['Allow']), (plain['Vary'], plain['Allow']))
+    self.assertIn('Accept', hit['Vary'])
+
+  def test_related_model_changes_invalidate(self):
+    detail_url = reverse('blog:blog-posts-detail', kwargs={'slug': self.post.slug})
+    self.get(detail_url)
+
+    self.author.full_name = 'Jane Editor'
+    self.author.save()
+    response = self.get(detail_url)
+    self.assertEqual(response['X-Blog-Cache'], 'miss')
+    self.assertEqual(response.json()['author']['full_name'], 'Jane Editor')
+
+    self.category.name = 'Products'
+    self.category.save()
+    self.assertEqual(self.get(detail_url).json()['categories'][0]['name'], 'Products')
+
+    self.post.categories.clear()
+    self.assertEqual(self.get(detail_url).json()['categories'], [])
+
+  def test_category_endpoint_is_cached_and_invalidated(self):
+    url = reverse('blog:blog-categories-list')
+    self.get(url)
+    self.assertEqual(self.get(url)['X-Blog-Cache'], 'hit')
+    BlogCategory.objects.create(name='Growth', slug='growth')
+    slugs = [item['slug'] for item in self.get(url).json()]
+    self.assertEqual(slugs, ['growth', 'product'])
+
+  def test_scheduled_post_appears_once_its_time_arrives(self):
+    scheduled = BlogPost.objects.create(
+      title='Scheduled',
+      excerpt='Soon',
+      body='<p>Soon</p>',
+      status=BlogPost.Status.PUBLISHED,
+      published_at=timezone.now() + timedelta(hours=1),
+    )
+    slugs = [item['slug'] for item in self.get(self.list_url).json()['results']]
+    self.assertNotIn(scheduled.slug, slugs)
+
+    BlogPost.objects.filter(pk=scheduled.pk).update(published_at=timezone.now() - timedelta(seconds=1))
+    cache.set(NEXT_PUBLISH_KEY, 1)
+    slugs = [item['slug'] for item in self.get(self.list_url).json()['results']]
+    self.assertIn(scheduled.slug, slugs)
+
+
+class BlogConditionalGetTests(BlogTestCase):
+  def setUp(self):
+    super().setUp()
+    self.author = BlogAuthor.objects.create(full_name='Jane Writer')
+    self.category = BlogCategory.objects.create(name='Product', slug='product')
+    self.post = BlogPost.objects.create(
+      title='Conditional Post',
+      excerpt='Excerpt',
+      body='<p>Body</p>',
+      status=BlogPost.Status.PUBLISHED,
+      author=self.author,
+    )
+    self.post.categories.add(self.category)
+    self.urls = [
+      reverse('blog:blog-posts-list'),
+      reverse('blog:blog-posts-detail', kwargs={'slug': self.post.slug}),
+      reverse('blog:blog-categories-list'),
+      reverse('blog:blog-sitemap'),
+    ]
+
+  def test_endpoints_send_validators_and_honour_if_none_match(self):
+    for url in self.urls:
+      with self.subTest(url=url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+
+        revalidated = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(revalidated['ETag'], response['ETag'])
+        self.assertEqual(revalidated.content, b'')
+
+  def test_revalidation_costs_one_query_when_not_cached(self):
+    url = reverse('blog:blog-posts-list')
+    etag = self.client.get(url)['ETag']
+    cache.clear()
+    get_content_version()
+    with CaptureQueriesContext(connection) as queries:
+      response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+    self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+    self.assertEqual(len(queries), 1)
+
+  def test_if_modified_since(self):
+    url = reverse('blog:blog-sitemap')
+    last_modified = self.client.get(url)['Last-Modified']
+    response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+    self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+  def test_changes_produce_new_etags(self):
+    list_url, detail_url = self.urls[0], self.urls[1]
+    list_etag = self.client.get(list_url)['ETag']
+    detail_etag = self.client.get(detail_url)['ETag']
+    page_etag = self.client.get(list_url, {'page_size': 1})['ETag']
+    self.assertNotEqual(list_etag, page_etag)
+
+    self.author.full_name = 'Jane Editor'
+    self.author.save()
+    self.assertEqual(self.client.get(list_url, HTTP_IF_NONE_MATCH=list_etag).status_code, status.HTTP_200_OK)
+    self.assertEqual(self.client.get(detail_url, HTTP_IF_NONE_MATCH=detail_etag).status_code, status.HTTP_200_OK)
+
+  def test_new_related_post_changes_detail_etag(self):
+    detail_url = self.urls[1]
+    etag = self.client.get(detail_url)['ETag']
+    related = BlogPost.objects.create(
+      title='Related Post',
+      excerpt='Excerpt',
+      body='<p>Body</p>',
+      status=BlogPost.Status.PUBLISHED,
+    )
+    related.categories.add(self.category)
+    response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    self.assertEqual([item['slug'] for item in response.json()['related_posts']], [related.slug])
+
+
+class BlogSitemapTests(BlogTestCase):
+  namespace = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+  def setUp(self):
+    super().setUp()
+    now = timezone.now()
+    self.posts = [
+      BlogPost.objects.create(
+        title=f'Sitemap Post {index}',
+        excerpt='Excerpt',
+        body='<p>Body</p>',
+        status=BlogPost.Status.PUBLISHED,
+        published_at=now - timedelta(days=index),
+      )
+      for index in range(5)
+    ]
+    self.posts[0].canonical_url = 'https://example.org/canonical?a=1&b=2'
+    self.posts[0].save()
+    BlogPost.objects.create(title='Draft', excerpt='Draft', body='<p>Draft</p>')
+    self.url = reverse('blog:blog-sitemap')
+
+  def fetch(self, url, **headers):
+    response = self.client.get(url, **headers)
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    self.assertTrue(response.streaming)
+    content = b''.join(response.streaming_content)
+    if response.get('Content-Encoding') == 'gzip':
+      content = gzip.decompress(content)
+    return response, ElementTree.fromstring(content)
+
+  def locs(self, root):
+    return [element.text for element in root.iter(f'{self.namespace}loc')]
+
+  def test_urlset_lists_published_posts(self):
+    response, root = self.fetch(self.url)
+    self.assertEqual(root.tag, f'{self.namespace}urlset')
+    locs = self.locs(root)
+    self.assertEqual(locs[0], 'https://example.org/canonical?a=1&b=2')
+    self.assertEqual(locs[1:], [f'http://testserver/blog/{post.slug}' for post in self.posts[1:]])
+
+  def test_gzip_encoding_is_negotiated(self):
+    plain_response, plain = self.fetch(self.url)
+    gzip_response, gzipped = self.fetch(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+    self.assertEqual(gzip_response['Content-Encoding'], 'gzip')
+    self.assertIn('Accept-Encoding', gzip_response['Vary'])
+    self.assertEqual(self.locs(plain), self.locs(gzipped))
+    self.assertNotEqual(plain_response['ETag'], gzip_response['ETag'])
+
+  @override_settings(BLOG_SITEMAP_MAX_URLS=2)
+  def test_index_and_pages_above_the_limit(self):
+    _, root = self.fetch(self.url)
+    self.assertEqual(root.tag, f'{self.namespace}sitemapindex')
+    pages = self.locs(root)
+    self.assertEqual(pages, [f'http://testserver/api/blog/sitemap-{page}.xml' for page in (1, 2, 3)])
+
+    collected = []
+    for page_url in pages:
+      _, page_root = self.fetch(page_url.replace('http://testserver', ''))
+      collected.extend(self.locs(page_root))
+    self.assertEqual(len(collected), 5)
+    self.assertEqual(len(set(collected)), 5)
+
+    missing = self.client.get(reverse('blog:blog-sitemap-page', kwargs={'page': 4}))
+    self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BlogSitemapArtifactTests(BlogTestCase):
+  def setUp(self):
+    super().setUp()
+    self.root = tempfile.TemporaryDirectory()
+    self.addCleanup(self.root.cleanup)
+    settings_override = override_settings(
+      BLOG_SITEMAP_ORIGIN='https://api.example.com',
+      BLOG_SITEMAP_ROOT=self.root.name,
+      BLOG_SITEMAP_REBUILD_INTERVAL=0
+    )
+    settings_override.enable()
+    self.addCleanup(settings_override.disable)
+    self.url = reverse('blog:blog-sitemap')
+
+  def publish(self, title):
+    with self.captureOnCommitCallbacks(execute=True):
+      return BlogPost.objects.create(title=title, excerpt='Excerpt', body='<p>Body</p>', status=BlogPost.Status.PUBLISHED)
+
+  def test_publishing_writes_plain_and_gzip_files(self):
+    post = self.publish('Artifact Post')
+    for name in ('sitemap.xml', 'sitemap.xml.gz', 'sitemap.json'):
+      self.assertTrue(os.path.exists(os.path.join(self.root.name, name)))
+
+    with CaptureQueriesContext(connection) as queries:
+      response = self.client.get(self.url)
+      content = b''.join(response.streaming_content)
+    self.assertEqual(len(queries), 0)
+    self.assertIn(f'https://api.example.com/blog/{post.slug}'.encode(), content)
+
+    packed = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+    self.assertEqual(packed['Content-Encoding'], 'gzip')
+    self.assertEqual(gzip.decompress(b''.join(packed.streaming_content)), content)
+
+    revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+    self.assertEqual(revalidated.status_code, status.HTTP_304_NOT_MODIFIED)
+
+  def test_only_sitemap_relevant_changes_rebuild(self):
+    post = self.publish('Artifact Post')
+    built_at = load_manifest()['built_at']
+    os.remove(os.path.join(self.root.name, 'sitemap.xml'))
+
+    with self.captureOnCommitCallbacks(execute=True):
+      post.excerpt = 'New excerpt'
+      post.save()
+      BlogPost.objects.create(title='Draft', excerpt='Draft', body='<p>Draft</p>')
+    self.assertFalse(os.path.exists(os.path.join(self.root.name, 'sitemap.xml')))
+
+    with mock.patch('blog.sitemap_artifacts.build_sitemap_artifacts', wraps=build_sitemap_artifacts) as build:
+      with self.captureOnCommitCallbacks(execute=True):
+        post.slug = 'renamed-post'
+        post.save()
+        post.canonical_url = 'https://example.org/renamed'
+        post.save()
+    self.assertEqual(build.call_count, 1)
+    self.assertTrue(os.path.exists(os.path.join(self.root.name, 'sitemap.xml')))
+    self.assertGreaterEqual(load_manifest()['built_at'], built_at)
+
+  def test_rolled_back_rebuilds_do_not_suppress_later_ones(self):
+    post = self.publish('Artifact Post')
+    with self.assertRaises(RuntimeError), transaction.atomic():
+      post.slug = 'rolled-back'
+      post.save()
+      raise RuntimeError
+    with mock.patch('blog.sitemap_artifacts.build_sitemap_artifacts') as build:
+      with self.captureOnCommitCallbacks(execute=True):
+        post.slug = 'renamed-post'
+        post.save()
+    build.assert_called_once_with(blocking=False)
+
+  @override_settings(BLOG_SITEMAP_REBUILD_INTERVAL=60)
+  def test_saves_in_quick_succession_leave_the_rebuild_to_the_next_request(self):
+    post = self.publish('Artifact Post')
+    with mock.patch('blog.sitemap_artifacts._build', wraps=sitemap_artifacts._build) as build:
+      for index in range(5):
+        # Autocommit: each save commits on its own.
+        with self.captureOnCommitCallbacks(execute=True):
+          post.slug = f'renamed-{index}'
+          post.save()
+      build.assert_not_called()
+
+      content = b''.join(self.client.get(self.url).streaming_content)
+      b''.join(self.client.get(self.url).streaming_content)
+    self.assertEqual(build.call_count, 1)
+    self.assertIn(b'https://api.example.com/blog/renamed-4', content)
+
+  def test_a_running_rebuild_leaves_others_serving_the_previous_artifact(self):
+    self.publish('Artifact Post')
+    previous = load_manifest()
+    with mock.patch('blog.sitemap_artifacts.time.time', return_value=previous['built_at'] + 1):
+      manifest = load_manifest()
+      manifest['next_publish_at'] = previous['built_at']
+      Path(self.root.name, 'sitemap.json').write_text(json.dumps(manifest))
+
+      with rebuild_lock(), mock.patch('blog.sitemap_artifacts._build') as build:
+        self.assertEqual(current_manifest(), manifest)
+        build.assert_not_called()
+      self.assertNotEqual(current_manifest()['next_publish_at'], previous['built_at'])
+
+  @override_settings(BLOG_SITEMAP_MAX_URLS=1)
+  def test_index_pages_are_served_from_disk(self):
+    self.publish('First')
+    self.publish('Second')
+    self.assertEqual(load_manifest()['pages'], 2)
+    index = b''.join(self.client.get(self.url).streaming_content)
+    self.assertIn(b'https://api.example.com/api/blog/sitemap-2.xml', index)
+    page = self.client.get(reverse('blog:blog-sitemap-page', kwargs={'page': 2}))
+    self.assertEqual(page.status_code, status.HTTP_200_OK)
+    self.assertEqual(self.client.get(reverse('blog:blog-sitemap-page', kwargs={'page': 3})).status_code, 404)
+
+
+class BlogKeysetPaginationTests(BlogTestCase):
+  def setUp(self):
+    super().setUp()
+    self.url = reverse('blog:blog-posts-list')
+    published_at = timezone.now() - timedelta(days=1)
+    # Shared timestamps exercise the created_at/id tie-breakers.
+    self.posts = [
+      BlogPost.objects.create(
+        title=f'Keyset Post {index}',
+        excerpt='Excerpt',
+        body='<p>Body</p>',
+        status=BlogPost.Status.PUBLISHED,
+        published_at=published_at - timedelta(hours=index // 3),
+      )
+      for index in range(8)
+    ]
+    self.expected = list(BlogPost.objects.published().order_by('-published_at', '-created_at', '-id').values_list('slug', flat=True))
+
+  def walk(self, url, params=None):
+    slugs, pages = [], []
+    while url:
+      response = self.client.get(url, params)
+      self.assertEqual(response.status_code, status.HTTP_200_OK)
+      self.assertNotIn('count', response.json())
+      pages.append(response.json())
+      slugs.extend(item['slug'] for item in response.json()['results'])
+      url, params = response.json()['next'], None
+    return slugs, pages
+
+  def test_forward_walk_matches_default_ordering(self):
+    slugs, pages = self.walk(self.url, {'cursor': '', 'page_size': 3})
+    self.assertEqual(slugs, self.expected)
+    self.assertEqual(len(pages), 3)
+    self.assertIsNone(pages[0]['previous'])
+
+  def test_previous_links_walk_back(self):
+    _, pages = self.walk(self.url, {'cursor': '', 'page_size': 3})
+    response = self.client.get(pages[-1]['previous'])
+    self.assertEqual([item['slug'] for item in response.json()['results']], self.expected[3:6])
+    response = self.client.get(response.json()['previous'])
+    self.assertEqual([item['slug'] for item in response.json()['results']], self.expected[:3])
+    self.assertIsNone(response.json()['previous'])
+
+  def test_no_count_or_offset_query(self):
+    _, pages = self.walk(self.url, {'cursor': '', 'page_size': 3})
+    with CaptureQueriesContext(connection) as queries:
+      self.client.get(pages[-1]['previous'])
+    sql = [query['sql'].upper() for query in queries.captured_queries]
+    self.assertFalse(any('COUNT(*)' in statement or 'OFFSET' in statement for statement in sql))
+
+  def test_page_number_mode_is_unchanged(self):
+    response = self.client.get(self.url, {'page': 2, 'page_size': 3})
+    self.assertEqual(response.json()['count'], 8)
+    self.assertEqual([item['slug'] for item in response.json()['results']], self.expected[3:6])
+
+  def test_invalid_cursor(self):
+    response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+    self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BlogPaginationCountTests(BlogTestCase):
+  def setUp(self):
+    super().setUp()
+    self.url = reverse('blog:blog-posts-list')
+    self.growth = BlogCategory.objects.create(name='Growth', slug='growth')
+    for index in range(5):
+      post = BlogPost.objects.create(
+        title=f'Counted Post {index}',
+        excerpt='Excerpt',
+        body='<p>Body</p>',
+        status=BlogPost.Status.PUBLISHED,
+      )
+      if index < 2:
+        post.categories.add(self.growth)
+
+  def count(self, params) -> tuple[int, bool]:
+    """The listed count and whether the paginator ran its ``COUNT(*)`` (the validators' aggregate does not count)."""
+    with CaptureQueriesContext(connection) as queries:
+      response = self.client.get(self.url, params)
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    counted = any('"__count"' in query['sql'] for query in queries.captured_queries)
+    return response.json()['count'], counted
+
+  def test_count_is_shared_by_every_page(self):
+    self.assertEqual(self.count({'page_size': 2}), (5, True))
+    self.assertEqual(self.count({'page_size': 2, 'page': 2}), (5, False))
+    self.assertEqual(self.count({'page_size': 2, 'page': 3}), (5, False))
+
+  def test_saves_invalidate_the_count(self):
+    self.count({'page_size': 2})
+    BlogPost.objects.create(title='Another', excerpt='Excerpt', body='<p>Body</p>', status=BlogPost.Status.PUBLISHED)
+    self.assertEqual(self.count({'page_size': 2, 'page': 2}), (6, True))
+
+  def test_each_filter_value_has_its_own_count(self):
+    self.assertEqual(self.count({'category': 'growth'})[0], 2)
+    # Category slugs match case-sensitively, so this is a different (empty) listing.
+    response = self.client.get(self.url, {'category': 'Growth'})
+    self.assertEqual((response.json()['count'], response.json()['results']), (0, []))
+    self.assertEqual(self.count({'category': 'growth', 'page_size': 1, 'page': 2}), (2, False))
+
+
+class BlogQueryPlanTests(BlogTestCase):
+  """Guard the hot read paths against falling back to full table scans."""
+
+  unindexed_scan = re.compile(r'\bSCAN (blog_\w+)(?! USING)')
+
+  def setUp(self):
+    super().setUp()
+    self.category = BlogCategory.objects.create(name='Product', slug='product')
+    self.post = BlogPost.objects.create(
+      title='Planned Post',
+      excerpt='Excerpt',
+      body='<p>Body</p>',
+      status=BlogPost.Status.PUBLISHED,
+    )
+    self.post.categories.add(self.category)
+
+  def assertUsesIndexes(self, queryset, *index_names):
+    if connection.vendor == 'postgresql':
+      self.fill_for_planner()
+      plan = queryset.explain()
+      for table in self.planner_tables:
+        self.assertNotIn(f'Seq Scan on {table} ', plan)
+      # Which of several overlapping indexes serves a join depends on the data;
+      # the partial index is the one the published filter must always reach.
+      for index_name in set(index_names) & self.partial_indexes:
+        self.assertIn(index_name, plan)
+    elif connection.vendor == 'sqlite':
+      plan = queryset.explain()
+      self.assertIsNone(self.unindexed_scan.search(plan), plan)
+      # SQLite's planner is deterministic enough to pin the exact index.
+      for index_name in index_names:
+        self.assertIn(index_name, plan)
+    else:
+      self.skipTest(f'No plan assertions for {connection.vendor}.')
+
+  partial_indexes = {'blog_post_published_idx'}
+  planner_tables = ('blog_blogpost', 'blog_blogpost_categories', 'blog_blogpostrelation')
+
+  def fill_for_planner(self):
+    """Give PostgreSQL's planner tables where scanning everything is the expensive choice."""
+    other = BlogCategory.objects.create(name='Other', slug='other')
+    drafts = BlogPost.objects.bulk_create(
+      BlogPost(title=f'Draft {index}', slug=f'planner-draft-{index}', excerpt='Excerpt', body='<p>Body</p>')
+      for index in range(3000)
+    )
+    BlogPost.categories.through.objects.bulk_create(
+      BlogPost.categories.through(blogpost_id=draft.pk, blogcategory_id=other.pk) for draft in drafts
+    )
+    BlogPostRelation.objects.bulk_create(
+      BlogPostRelation(post=draft, related_post=drafts[index - 1], score=1, rank=1) for index, draft in enumerate(drafts)
+    )
+    with connection.cursor() as cursor:
+      cursor.execute(f'ANALYZE {", ".join(self.planner_tables)}')
+
+  def test_published_list(self):
+    self.assertUsesIndexes(BlogPost.objects.published().select_related('author'), 'blog_post_published_idx')
+
+  def test_category_filter(self):
+    queryset = BlogPost.objects.published().filter(categories__slug='product')
+    self.assertUsesIndexes(queryset, 'blog_post_categories_cat_post_idx')
+
+  def test_sitemap(self):
+    self.assertUsesIndexes(sitemap_queryset(BlogPost.objects.published()), 'blog_post_published_idx')
+
+  def test_keyset_page(self):
+    queryset = BlogPost.objects.published().order_by('-published_at', '-created_at', '-id').filter(
+      published_at__lt=timezone.now()
+    )
+    self.assertUsesIndexes(queryset, 'blog_post_published_idx')
+
+  def test_related_posts(self):
+    queryset = (
+      BlogPost.objects.published()
+      .filter(inbound_relations__post=self.post)
+      .order_by('inbound_relations__rank')
+    )
+    self.assertUsesIndexes(queryset, 'blog_post_relation_rank_idx')
+
+
+class BlogQueryBudgetTests(BlogTestCase):
+  """Every blog route declares a query budget and the suite enforces it."""
+
+  def setUp(self):
+    super().setUp()
+    author = BlogAuthor.objects.create(full_name='Jane Writer')
+    categories = [BlogCategory.objects.create(name=name) for name in ('Product', 'Cloud', 'Security')]
+    for index in range(24):
+      post = BlogPost.objects.create(
+        title=f'Budget Post {index}',
+        excerpt='Excerpt',
+        body='<p>Body</p>',
+        status=BlogPost.Status.PUBLISHED,
+        author=author,
+        published_at=timezone.now() - timedelta(hours=index)
+      )
+      post.categories.set(categories[:index % 3 + 1])
+    rebuild_all_relations()
+
+  def query_count(self, url, params=None):
+    cache.clear()
+    response = self.client.get(url, params or {})
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    if response.streaming:
+      b''.join(response.streaming_content)
+    return response, response.wsgi_request.query_stats.count
+
+  def test_every_route_declares_a_budget(self):
+    self.assertEqual(missing_budgets(blog_urls.urlpatterns), [])
+
+  def test_list_queries_do_not_grow_with_page_size(self):
+    url = reverse('blog:blog-posts-list')
+    for raw in (True, False):
+      for pagination in ({}, {'cursor': ''}, {'category': 'cloud'}):
+        with self.subTest(raw=raw, pagination=pagination), override_settings(BLOG_RAW_PAYLOADS=raw):
+          counts = {}
+          for size in (1, 6, 24):
+            response, counts[size] = self.query_count(url, {'page_size': size, **pagination})
+            self.assertLessEqual(len(response.json()['results']), size)
+          self.assertEqual(len(set(counts.values())), 1, counts)
+
+  def test_detail_queries_do_not_grow_with_related_posts(self):
+    single, full = BlogPost.objects.filter(relations__rank=3).distinct()[:2]
+    single.relations.exclude(rank=1).delete()
+    for raw in (True, False):
+      with self.subTest(raw=raw), override_settings(BLOG_RAW_PAYLOADS=raw):
+        counts = []
+        for post, expected in ((single, 1), (full, 3)):
+          response, count = self.query_count(reverse('blog:blog-posts-detail', kwargs={'slug': post.slug}))
+          self.assertEqual(len(response.json()['related_posts']), expected)
+          counts.append(count)
+        self.assertEqual(counts[0], counts[1])
+
+  def test_sitemaps_and_categories_stay_within_budget(self):
+    for url in (
+      reverse('blog:blog-sitemap'),
+      reverse('blog:blog-sitemap-page', kwargs={'page': 1}),
+      reverse('blog:blog-categories-list'),
+      reverse('blog:blog-categories-detail', kwargs={'slug': 'cloud'}),
+      reverse('blog:api-root')
+    ):
+      with self.subTest(url=url):
+        self.query_count(url)
+
+  def test_overrun_fails_the_request(self):
+    url = reverse('blog:blog-posts-list')
+    with mock.patch.object(blog_views.BlogPostViewSet, 'query_budget', {'list': 1}):
+      with self.assertRaisesMessage(QueryBudgetExceeded, 'budget 1'):
+        self.query_count(url)
+      with override_settings(QUERY_BUDGET_ENFORCE=False), self.assertLogs('backend_project.instrumentation', 'WARNING'):
+        self.query_count(url)
+
+  def test_streamed_sitemap_is_charged_for_its_body(self):
+    with mock.patch.object(blog_views.blog_sitemap, 'query_budget', 2):
+      with self.assertRaises(QueryBudgetExceeded):
+        self.query_count(reverse('blog:blog-sitemap'))
+
+  def test_server_timing_header(self):
+    url = reverse('blog:blog-posts-list')
+    with override_settings(QUERY_BUDGET_SERVER_TIMING=True):
+      header = self.client.get(url)['Server-Timing']
+    self.assertRegex(header, r'^db;desc="\d+ queries";dur=[\d.]+, total;dur=[\d.]+$')
+    with override_settings(QUERY_BUDGET_SERVER_TIMING=False):
+      self.assertNotIn('Server-Timing', self.client.get(url))
+
+
+class BlogSlugAllocationTests(BlogTestCase):
+  def make_post(self, title='Launch Notes'):
+    return BlogPost.objects.create(title=title, excerpt='Excerpt', body='<p>Body</p>')
+
+  def test_collisions_get_the_lowest_free_suffix(self):
+    slugs = [self.make_post().slug for _ in range(3)]
+    self.assertEqual(slugs, ['launch-notes', 'launch-notes-1', 'launch-notes-2'])
+
+    BlogPost.objects.filter(slug='launch-notes-1').delete()
+    self.assertEqual(self.make_post().slug, 'launch-notes-1')
+    self.assertEqual(self.make_post('Launch Notes 2').slug, 'launch-notes-2-1')
+
+  def test_allocation_is_a_single_query(self):
+    for _ in range(5):
+      self.make_post()
+    with CaptureQueriesContext(connection) as queries:
+      slug = next_free_slug(BlogPost(title='Launch Notes'), 'launch-notes')
+    self.assertEqual(slug, 'launch-notes-5')
+    self.assertEqual(len(queries), 1)
+
+  def test_lost_race_is_retried(self):
+    self.make_post()
+    # Simulate a concurrent writer claiming the slug between allocation and INSERT.
+    with mock.patch('blog.slugs.next_free_slug', side_effect=['launch-notes', 'launch-notes-1']) as allocator:
+      post = self.make_post()
+    self.assertEqual(post.slug, 'launch-notes-1')
+    self.assertEqual(allocator.call_count, 2)
+
+  def test_categories_share_the_allocator(self):
+    first = BlogCategory.objects.create(name='C')
+    second = BlogCategory.objects.create(name='C!')
+    self.assertEqual((first.slug, second.slug), ('c', 'c-1'))
+
+
+class BlogSanitizationTests(BlogTestCase):
+  def make_post(self, **overrides):
+    fields = {
+      'title': 'Hardening Notes',
+      'excerpt': 'Short <b>excerpt</b>',
+      'body': '<p>Patch <strong>early</strong></p><script>alert(1)</script>',
+      'status': BlogPost.Status.DRAFT
+    }
+    fields.update(overrides)
+    return BlogPost.objects.create(**fields)
+
+  def count_sanitizer_calls(self):
+    return mock.patch('blog.sanitizers.get_sanitizer', wraps=get_sanitizer)
+
+  def test_body_is_parsed_once_on_create(self):
+    with self.count_sanitizer_calls() as clean:
+      post = self.make_post()
+    self.assertEqual(clean.call_count, len(BlogPost.sanitization.fields))
+    self.assertNotIn('<script>', post.body)
+    self.assertEqual(set(post.sanitized_digests), set(BlogPost.sanitization.fields))
+
+  def test_unchanged_fields_skip_the_sanitizer(self):
+    post = BlogPost.objects.get(pk=self.make_post().pk)
+    post.status = BlogPost.Status.PUBLISHED
+    with self.count_sanitizer_calls() as clean:
+      post.save()
+    self.assertEqual(clean.call_count, 0)
+
+    post.excerpt = 'New <i>excerpt</i>'
+    with self.count_sanitizer_calls() as clean:
+      post.save()
+    self.assertEqual(clean.call_count, 1)
+    self.assertEqual(post.excerpt, 'New excerpt')
+
+  def test_reading_time_follows_the_body(self):
+    post = self.make_post(body='<p>' + 'word ' * 1000 + '</p>')
+    self.assertEqual(post.reading_time_minutes, 5)
+    post.title = 'Renamed'
+    post.save()
+    self.assertEqual(BlogPost.objects.get(pk=post.pk).reading_time_minutes, 5)
+
+  def test_word_count_matches_plain_text_sanitizer(self):
+    samples = [
+      '<p>One <em>two</em> three</p><p>four</p>',
+      '<h2>Title</h2>Intro<blockquote>quoted</blockquote>',
+      '<ul><li>a</li><li>b &amp; c</li></ul>',
+      '<p>Less &lt; than</p><pre>x</pre>',
+      'plain words only',
+      '<p>See <a href="/x" title="a>b c">the link</a> here</p>',
+      '<img src="/i.png" alt="x > y z">caption'
+    ]
+    for sample in samples:
+      post = self.make_post(body=sample)
+      self.assertEqual(count_words(post.body), len(sanitize_plain_text(post.body).split()), sample)
+
+  def test_tampered_rows_are_resanitized(self):
+    post = self.make_post()
+    BlogPost.objects.filter(pk=post.pk).update(body='<p>ok</p><script>x()</script>')
+    post = BlogPost.objects.get(pk=post.pk)
+    post.save()
+    self.assertNotIn('<script>', BlogPost.objects.get(pk=post.pk).body)
+
+  def test_resanitize_command(self):
+    post = self.make_post()
+    BlogPost.objects.filter(pk=post.pk).update(excerpt='<b>raw</b>')
+    untouched = self.make_post(title='Other')
+
+    stale = timezone.now() - timedelta(days=1)
+    BlogPost.objects.update(updated_at=stale)
+
+    out = StringIO()
+    call_command('resanitize_posts', stdout=out)
+    self.assertIn('Scanned 2 posts, rewrote 1.', out.getvalue())
+    self.assertEqual(BlogPost.objects.get(pk=post.pk).excerpt, 'raw')
+    self.assertGreater(BlogPost.objects.get(pk=post.pk).updated_at, stale)
+    self.assertEqual(json.loads(BlogPost.objects.get(pk=post.pk).card_json)['excerpt'], 'raw')
+    self.assertEqual(BlogPost.objects.get(pk=untouched.pk).updated_at, stale)
+
+    with self.count_sanitizer_calls() as clean:
+      call_command('resanitize_posts', '--force', stdout=StringIO())
+    self.assertEqual(clean.call_count, 2 * len(BlogPost.sanitization.fields))
+    self.assertEqual(BlogPost.objects.get(pk=untouched.pk).body, untouched.body)
+
+  def test_resanitize_command_backfills_missing_digests(self):
+    post = self.make_post()
+    digests = BlogPost.objects.get(pk=post.pk).sanitized_digests
+    stale = timezone.now() - timedelta(days=1)
+    BlogPost.objects.update(sanitized_digests={}, updated_at=stale)
+
+    out = StringIO()
+    call_command('resanitize_posts', stdout=out)
+    self.assertIn('Scanned 1 posts, rewrote 1.', out.getvalue())
+    post = BlogPost.objects.get(pk=post.pk)
+    self.assertEqual(post.sanitized_digests, digests)
+    # The output did not change, so neither do the validators.
+    self.assertEqual(post.updated_at, stale)
+
+    with self.count_sanitizer_calls() as clean:
+      post.save()
+    self.assertEqual(clean.call_count, 0)
+
+
+SANITIZER_CORPUS = [
+  '',
+  'Plain title',
+  'a > b',
+  'a "q" \'s\'',
+  'x\r\ny\rz',
+  'nul\x00x',
+  'bell\x07',
+  '&amp; &nbsp; &copy &#39; &#x27; &bogus; & x &lt; &am; &AMP; &ampx &amp',
+  '&#0; &#99999999; &#; &#x; &#12a;',
+  'a<b',
+  'a < b',
+  '<3',
+  'trailing <',
+  '</>',
+  '<!-- c -->x',
+  '<!doctype html>x',
+  '<![CDATA[x]]>y',
+  '<?php x ?>y',
+  '<p class="a b" id=x>t</p>',
+  '<P CLASS=A>t</P>',
+  '<p\tclass=x>y</p>',
+  '<p class="x"id="y">z</p>',
+  '<p class=x/>y',
+  '<p class>x</p>',
+  '<p CLASS="x" class="y">z</p>',
+  '<p class="&nbsp;&hellip;&am;&#0;&#x110000;&#1;">x</p>',
+  '<p class="a&b&amp;c<d>e\'f">x</p>',
+  "<p class='a\"b'>x</p>",
+  '<p class=`x`>y</p>',
+  '<a href="javascript:alert(1)">x</a>',
+  '<a href=" java\tscript:x">x</a>',
+  '<a href="&#106;avascript:x">x</a>',
+  '<a href="java&#x09;script:x">x</a>',
+  '<a href="HTTP://x">x</a>',
+  '<a href="/rel">x</a>',
+  '<a href="#f">x</a>',
+  '<a href="#x:y">x</a>',
+  '<a href="/x:y">x</a>',
+  '<a href="1x:y">x</a>',
+  '<a href="x:">x</a>',
+  '<a href="mailto:">x</a>',
+  '<a href="data:text/html,x">x</a>',
+  '<a href="https://x.com/é?a=1&b=2&amp;c=3">x</a>',
+  '<a href="https://[::1]/">x</a>',
+  '<a href="//[x">x</a>',
+  '<a href="x" href="y">z</a>',
+  '<a title=x href=y target=_blank rel=noopener onclick=z>w</a>',
+  '<img src=x onerror=alert(1)>',
+  '<img src="x"/>',
+  '<img src=x/>',
+  '<img>x</img>',
+  '<br/>', '<br>', '</br>', '<hr>', '</hr>',
+  '<b>x</b>',
+  '<span>x</span><p>y</p>',
+  'a<span></span>b',
+  '<script>alert(1)</script>',
+  '<style>p{}</style>x',
+  '<textarea><b>x</b></textarea>',
+  '<title>x</title>',
+  '<iframe>a<b>c</iframe>',
+  '<svg><p>x</p></svg>',
+  '<x-y>z</x-y>',
+  '<div><p>x</p></div>',
+  '<div>a</div><div>b</div>',
+  '<h1>x</h1>y',
+  '<table><tr><td>a</td></tr></table>',
+  '<p>a<p>b',
+  '<p>a<ul><li>b</li></ul></p>',
+  '<strong>x',
+  '</p>x',
+  '</strong>x',
+  '<em><strong>x</em></strong>',
+  '<p><strong>x</p>y',
+  '<a href="/1"><a href="/2">x</a></a>',
+  '<h2><h3>x</h3></h2>',
+  '<ul><li>a<li>b</ul>',
+  '<ul><li>a<ul><li>b</li></ul></li></ul>',
+  '<ul>\n<li>a</li>\n</ul>',
+  '<pre>\nx</pre>',
+  '<pre>\n\nx</pre>',
+  '<pre>  x\n  y</pre>',
+  '<figure><img src="/m.png" alt=""><figcaption>Cap &amp; more</figcaption></figure>',
+  '<blockquote><p>Quote</p></blockquote>',
+  '<p>Line<br>break &mdash; <code>x &lt; y</code> <abbr title="HyperText">HTML</abbr></p>',
+]
+
+
+
+class BlogCardTests(BlogTestCase):
+  def setUp(self):
+    super().setUp()
+    self.author = BlogAuthor.objects.create(full_name='Jane Writer', role='Content Lead')
+    self.category = BlogCategory.objects.create(name='Product', slug='product')
+    self.post = BlogPost.objects.create(
+      title='Launch Playbook',
+      excerpt='How to launch.',
+      body='<p>Body</p>',
+      status=BlogPost.Status.PUBLISHED,
+      seo_keywords='launch, product',
+      author=self.author
+    )
+    self.post.categories.add(self.category)
+
+  def card(self, post=None):
+    return json.loads(BlogPost.objects.get(pk=(post or self.post).pk).card_json)
+
+  def list_results(self):
+    response = self.client.get(reverse('blog:blog-posts-list'))
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    return response
+
+  def test_list_payload_matches_the_serializer(self):
+    media_root = tempfile.mkdtemp()
+    with override_settings(MEDIA_ROOT=media_root):
+      uploaded = BlogPost.objects.create(
+        title='With Upload',
+        excerpt='Image',
+        body='<p>x</p>',
+        status=BlogPost.Status.PUBLISHED,
+        hero_image=SimpleUploadedFile('hero.gif', b'GIF89a')
+      )
+      response = self.list_results()
+    posts = BlogPost.objects.published().filter(pk__in=[self.post.pk, uploaded.pk])
+    expected = BlogPostListSerializer(posts, many=True, context={'request': response.wsgi_request}).data
+    self.assertEqual(json.loads(response.content)['results'], json.loads(json.dumps(expected)))
+    self.assertTrue(json.loads(response.content)['results'][0]['hero_image_url'].startswith('http://testserver/'))
+
+  def test_list_does_not_touch_authors_or_categories(self):
+    with CaptureQueriesContext(connection) as queries:
+      self.list_results()
+    tables = ' '.join(query['sql'] for query in queries.captured_queries)
+    self.assertNotIn('blog_blogauthor', tables)
+    self.assertNotIn('blog_blogcategory', tables)
+
+  def test_cards_follow_author_and_category_changes(self):
+    self.author.full_name = 'Jane Editor'
+    self.author.save()
+    self.assertEqual(self.card()['author']['full_name'], 'Jane Editor')
+
+    self.category.name = 'Platform'
+    self.category.save()
+    self.assertEqual([category['name'] for category in self.card()['categories']], ['Platform'])
+
+    growth = BlogCategory.objects.create(name='Growth')
+    growth.posts.add(self.post)
+    self.assertEqual(len(self.card()['categories']), 2)
+    growth.posts.clear()
+    self.assertEqual(len(self.card()['categories']), 1)
+    self.post.categories.clear()
+    self.assertEqual(self.card()['categories'], [])
+
+    self.post.categories.add(growth)
+    growth.delete()
+    self.assertEqual(self.card()['categories'], [])
+    self.author.delete()
+    self.assertIsNone(self.card()['author'])
+
+  def test_post_edits_refresh_the_card(self):
+    self.post.seo_keywords = 'zero trust'
+    self.post.save()
+    self.assertEqual(self.card()['seo']['keywords'], ['zero trust'])
+    self.assertEqual(self.post.card_json, BlogPost.objects.get(pk=self.post.pk).card_json)
+
+  def test_missing_cards_fall_back_to_the_serializer(self):
+    BlogPost.objects.filter(pk=self.post.pk).update(card_json='')
+    results = self.list_results().json()['results']
+    self.assertEqual(results[0]['author']['full_name'], 'Jane Writer')
+
+    out = StringIO()
+    call_command('rebuild_post_cards', stdout=out)
+    self.assertIn('Rendered 1 post cards.', out.getvalue())
+    self.assertEqual(self.card()['slug'], self.post.slug)
+
+
+
+class BlogRawPayloadTests(BlogTestCase):
+  def setUp(self):
+    super().setUp()
+    self.media_root = tempfile.mkdtemp()
+    author = BlogAuthor.objects.create(full_name='Zoë Writer', bio='Line\u2028separator "quoted"')
+    security = BlogCategory.objects.create(name='Security')
+    cloud = BlogCategory.objects.create(name='Cloud')
+    with override_settings(MEDIA_ROOT=self.media_root):
+      for index in range(4):
+        post = BlogPost.objects.create(
+          title=f'Post {index} — ünïcode',
+          excerpt='Tabs\tand "quotes" </script>',
+          body='<p>Body with <strong>markup</strong> &amp; emoji 🔐</p>',
+          status=BlogPost.Status.PUBLISHED,
+          seo_keywords='a, b',
+          canonical_url='https://example.com/canonical' if index == 1 else '',
+          author=author if index % 2 else None,
+          hero_image=SimpleUploadedFile('hero.gif', b'GIF89a') if index == 2 else None
+        )
+        post.categories.add(security, *([cloud] if index % 2 else []))
+    rebuild_all_relations()
+    self.slugs = list(BlogPost.objects.values_list('slug', flat=True))
+
+  def fetch(self, url, params=None, raw=True, **headers):
+    cache.clear()
+    with override_settings(BLOG_RAW_PAYLOADS=raw, MEDIA_ROOT=self.media_root):
+      response = self.client.get(url, params or {}, **headers)
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    return response
+
+  def assertSameBytes(self, url, params=None):
+    raw = self.fetch(url, params)
+    self.assertNotIsInstance(raw, Response)
+    self.assertEqual(raw.content, self.fetch(url, params, raw=False).content)
+    self.assertEqual(raw['Content-Type'], 'application/json')
+
+  def test_list_bytes_match_the_serializers(self):
+    url = reverse('blog:blog-posts-list')
+    for params in ({}, {'page': 2, 'page_size': 1}, {'category': 'cloud'}, {'cursor': ''}, {'search': 'post'}):
+      with self.subTest(params=params):
+        self.assertSameBytes(url, params)
+
+  def test_detail_bytes_match_the_serializers(self):
+    for slug in self.slugs:
+      with self.subTest(slug=slug):
+        self.assertSameBytes(reverse('blog:blog-posts-detail', kwargs={'slug': slug}))
+
+  def test_detail_honours_the_category_filter(self):
+    in_cloud = BlogPost.objects.filter(categories__slug='cloud').first()
+    security_only = BlogPost.objects.exclude(categories__slug='cloud').first()
+    self.assertSameBytes(reverse('blog:blog-posts-detail', kwargs={'slug': in_cloud.slug}), {'category': 'cloud'})
+    for raw in (True, False):
+      with self.subTest(raw=raw), override_settings(BLOG_RAW_PAYLOADS=raw):
+        cache.clear()
+        response = self.client.get(reverse('blog:blog-posts-detail', kwargs={'slug': security_only.slug}), {'category': 'cloud'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+  def test_stdlib_encoder_matches_too(self):
+    with mock.patch('blog.payloads.orjson', None):
+      self.assertSameBytes(reverse('blog:blog-posts-detail', kwargs={'slug': self.slugs[0]}))
+
+  def test_pretty_printing_uses_the_renderer(self):
+    url = reverse('blog:blog-posts-list')
+    response = self.fetch(url, HTTP_ACCEPT='application/json; indent=2')
+    self.assertIsInstance(response, Response)
+    self.assertIn(b'\n  ', response.content)
+
+  def test_missing_cards_fall_back(self):
+    BlogPost.objects.update(card_json='')
+    detail = reverse('blog:blog-posts-detail', kwargs={'slug': self.slugs[0]})
+    self.assertIsInstance(self.fetch(detail), Response)
+    self.assertIsInstance(self.fetch(reverse('blog:blog-posts-list')), Response)
+
+
+def image_bytes(width: int, height: int, format: str = 'JPEG', mode: str = 'RGB') -> bytes:
+  from PIL import Image
+
+  buffer = io.BytesIO()
+  Image.new(mode, (width, height), 'teal').save(buffer, format=format)
+  return buffer.getvalue()
+
+
+class BlogHeroImageTests(BlogTestCase):
+  def setUp(self):
+    super().setUp()
+    media_override = override_settings(
+      MEDIA_ROOT=tempfile.mkdtemp(),
+      BLOG_IMAGE_WORKERS=0,
+      BLOG_HERO_WIDTHS=[160, 320],
+      BLOG_HERO_FORMATS=['webp', 'jpeg']
+    )
+    media_override.enable()
+    self.addCleanup(media_override.disable)
+
+  def create_post(self, content: bytes, name: str = 'hero.jpg', **fields) -> BlogPost:
+    with self.captureOnCommitCallbacks(execute=True):
+      post = BlogPost.objects.create(
+        title=fields.pop('title', 'Hero'),
+        excerpt='Hero image',
+        body='<p>x</p>',
+        status=BlogPost.Status.PUBLISHED,
+        hero_image=SimpleUploadedFile(name, content),
+        **fields
+      )
+    post.refresh_from_db()
+    return post
+
+  def test_render_variants_never_upscales(self):
+    rendered = blog_images.render_variants(image_bytes(400, 200), (160, 320, 640), ('webp', 'jpeg'))
+    self.assertEqual((rendered['width'], rendered['height']), (400, 200))
+    self.assertEqual(
+      [(variant['format'], variant['width'], variant['height']) for variant in rendered['variants']],
+      [('webp', 160, 80), ('jpeg', 160, 80), ('webp', 320, 160), ('jpeg', 320, 160)]
+    )
+    small = blog_images.render_variants(image_bytes(100, 50, 'PNG', 'RGBA'), (160, 320), ('jpeg',))
+    self.assertEqual([(variant['width'], variant['height']) for variant in small['variants']], [(100, 50)])
+    self.assertTrue(small['variants'][0]['content'].startswith(b'\xff\xd8'))
+
+  def test_upload_builds_hashed_variants(self):
+    post = self.create_post(image_bytes(400, 200))
+    variants = post.hero_image_variants
+    self.assertEqual(variants['source'], post.hero_image.name)
+    self.assertEqual((variants['width'], variants['height']), (400, 200))
+    self.assertEqual([entry['width'] for entry in variants['formats']['webp']], [160, 320])
+    for entry in variants['formats']['webp'] + variants['formats']['jpeg']:
+      self.assertRegex(entry['name'], r'^blog/heroes/variants/[0-9a-f]{20}-\d+w\.(webp|jpg)$')
+      self.assertTrue(default_storage.exists(entry['name']))
+    self.assertIn('hero_image_variants', post.card_json)
+
+    # Identical content reuses the stored files.
+    again = self.create_post(image_bytes(400, 200), title='Again')
+    self.assertEqual(again.hero_image_variants['formats'], variants['formats'])
+
+  def test_serializers_expose_a_srcset(self):
+    post = self.create_post(image_bytes(400, 200))
+    results = self.client.get(reverse('blog:blog-posts-list')).json()['results']
+    payload = results[0]['hero_image_variants']
+    self.assertEqual((payload['width'], payload['height']), (400, 200))
+    self.assertEqual(list(payload['srcset']), ['image/webp', 'image/jpeg'])
+    names = [entry['name'] for entry in post.hero_image_variants['formats']['webp']]
+    self.assertEqual(
+      payload['srcset']['image/webp'],
+      f'http://testserver/media/{names[0]} 160w, http://testserver/media/{names[1]} 320w'
+    )
+    detail = self.client.get(reverse('blog:blog-posts-detail', kwargs={'slug': post.slug})).json()
+    self.assertEqual(detail['hero_image_variants'], payload)
+    self.assertEqual(
+      BlogPostDetailSerializer(post).data['hero_image_variants']['srcset']['image/jpeg'].split(' ')[0],
+      default_storage.url(post.hero_image_variants['formats']['jpeg'][0]['name'])
+    )
+
+  def test_raw_payloads_match_the_serializers(self):
+    post = self.create_post(image_bytes(400, 200))
+    for url in (reverse('blog:blog-posts-list'), reverse('blog:blog-posts-detail', kwargs={'slug': post.slug})):
+      with self.subTest(url=url):
+        cache.clear()
+        raw = self.client.get(url)
+        self.assertNotIsInstance(raw, Response)
+        cache.clear()
+        with override_settings(BLOG_RAW_PAYLOADS=False):
+          self.assertEqual(raw.content, self.client.get(url).content)
+
+  def test_posts_without_variants_serialize_null(self):
+    with self.assertLogs('blog.images', 'ERROR'):
+      post = self.create_post(b'GIF89a', name='hero.gif')
+    self.assertEqual(post.hero_image_variants, {})
+    self.assertIsNone(self.client.get(reverse('blog:blog-posts-list')).json()['results'][0]['hero_image_variants'])
+
+  def test_replaced_hero_discards_stale_variants(self):
+    post = self.create_post(image_bytes(400, 200))
+    stale = blog_images.render_variants(image_bytes(300, 300), (160,), ('webp',))
+    self.assertFalse(blog_images.apply_variants(post.pk, 'blog/heroes/replaced.jpg', stale))
+    self.assertEqual(BlogPost.objects.get(pk=post.pk).hero_image_variants, post.hero_image_variants)
+
+  def test_render_runs_in_the_process_pool(self):
+    with override_settings(BLOG_IMAGE_WORKERS=1):
+      executor = blog_images.get_executor()
+      self.addCleanup(blog_images._discard_executor, executor)
+      rendered = executor.submit(blog_images.render_variants, image_bytes(400, 200), (160,), ('webp',)).result(timeout=60)
+    self.assertEqual([variant['width'] for variant in rendered['variants']], [160])
+
+  def test_a_worker_dying_mid_render_discards_the_pool(self):
+    post = self.create_post(image_bytes(400, 200))
+    broken = Future()
+    executor = mock.Mock(spec=ProcessPoolExecutor)
+    executor.submit.return_value = broken
+    with mock.patch.object(blog_images, '_executor', executor), mock.patch.object(blog_images, 'get_executor', return_value=executor):
+      done = blog_images.build_hero_variants(post.pk, post.hero_image.name)
+      # Resolved off the test thread, like the pool's management thread would.
+      with self.assertLogs('blog.images', 'ERROR'):
+        worker = threading.Thread(target=broken.set_exception, args=(BrokenProcessPool('worker died'),))
+        worker.start()
+        worker.join()
+      self.assertIsInstance(done.exception(timeout=5), BrokenProcessPool)
+      self.assertIsNone(blog_images._executor)
+    executor.shutdown.assert_called_once_with(wait=False)
+
+  def test_command_backfills_missing_variants(self):
+    post = self.create_post(image_bytes(400, 200))
+    BlogPost.objects.filter(pk=post.pk).update(hero_image_variants={})
+    out = StringIO()
+    call_command('build_hero_variants', stdout=out)
+    self.assertIn('Built hero variants for 1 of 1 posts.', out.getvalue())
+    self.assertEqual(BlogPost.objects.get(pk=post.pk).hero_image_variants, post.hero_image_variants)
+
+
+@override_settings(ROOT_URLCONF='backend_project.async_urls')
+class BlogAsyncViewTests(BlogTestCase):
+  """The async views answer byte-for-byte like the DRF views and share their cache."""
+
+  def setUp(self):
+    super().setUp()
+    author = BlogAuthor.objects.create(full_name='Zoë Writer')
+    cloud = BlogCategory.objects.create(name='Cloud')
+    for index in range(5):
+      post = BlogPost.objects.create(
+        title=f'Async Post {index}',
+        excerpt='Excerpt with "quotes"',
+        body='<p>Body</p>',
+        status=BlogPost.Status.PUBLISHED,
+        author=author if index % 2 else None,
+        published_at=timezone.now() - timedelta(hours=index)
+      )
+      post.categories.add(cloud)
+    rebuild_all_relations()
+    self.slug = BlogPost.objects.values_list('slug', flat=True).first()
+
+  def sync_get(self, url, params=None, **headers):
+    cache.clear()
+    with override_settings(ROOT_URLCONF='backend_project.urls'):
+      return self.client.get(url, params or {}, **headers)
+
+  async def async_get(self, url, params=None, **headers):
+    await cache.aclear()
+    return await self.async_client.get(url, params or {}, **headers)
+
+  async def test_responses_match_the_drf_views(self):
+    detail = reverse('blog:blog-posts-detail', kwargs={'slug': self.slug})
+    cases = [
+      (reverse('blog:api-root'), {}),
+      (reverse('blog:blog-posts-list'), {}),
+      (reverse('blog:blog-posts-list'), {'page': 2, 'page_size': 2}),
+      (reverse('blog:blog-posts-list'), {'page': 9}),
+      (reverse('blog:blog-posts-list'), {'category': 'cloud'}),
+      (reverse('blog:blog-posts-list'), {'cursor': ''}),
+      (reverse('blog:blog-posts-list'), {'search': 'async'}),
+      (reverse('blog:blog-posts-list', kwargs={'format': 'json'}), {}),
+      (detail, {}),
+      (detail, {'category': 'cloud'}),
+      (detail, {'category': 'missing'}),
+      (reverse('blog:blog-posts-detail', kwargs={'slug': 'missing'}), {}),
+      (reverse('blog:blog-categories-list'), {}),
+      (reverse('blog:blog-categories-detail', kwargs={'slug': 'cloud'}), {}),
+      (reverse('blog:blog-categories-detail', kwargs={'slug': 'missing'}), {}),
+    ]
+    for url, params in cases:
+      with self.subTest(url=url, params=params):
+        expected = await sync_to_async(self.sync_get)(url, params)
+        response = await self.async_get(url, params)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response.get('ETag'), expected.get('ETag'))
+        self.assertEqual(response['Content-Type'], expected['Content-Type'])
+
+  async def test_missing_cards_fall_back_to_the_serializers(self):
+    await BlogPost.objects.aupdate(card_json='')
+    for url in (reverse('blog:blog-posts-list'), reverse('blog:blog-posts-detail', kwargs={'slug': self.slug})):
+      with self.subTest(url=url):
+        expected = await sync_to_async(self.sync_get)(url)
+        self.assertEqual((await self.async_get(url)).content, expected.content)
+
+  async def test_cache_and_validators_are_shared_with_the_sync_views(self):
+    url = reverse('blog:blog-posts-list')
+    with override_settings(ROOT_URLCONF='backend_project.urls'):
+      first = await sync_to_async(self.client.get)(url)
+    cached = await self.async_client.get(url)
+    self.assertEqual(cached['X-Blog-Cache'], 'hit')
+    self.assertEqual(cached.content, first.content)
+
+    revalidated = await self.async_client.get(url, headers={'If-None-Match': first['ETag']})
+    self.assertEqual(revalidated.status_code, status.HTTP_304_NOT_MODIFIED)
+    await cache.aclear()
+    revalidated = await self.async_client.get(url, headers={'If-None-Match': first['ETag']})
+    self.assertEqual(revalidated.status_code, status.HTTP_304_NOT_MODIFIED)
+
+  async def test_other_methods_are_answered_by_drf(self):
+    url = reverse('blog:blog-posts-list')
+    with override_settings(ROOT_URLCONF='backend_project.urls'):
+      expected = await sync_to_async(self.client.post)(url, {})
+    response = await self.async_client.post(url, {})
+    self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+    self.assertEqual(response.content, expected.content)
+
+  async def test_sitemaps_stream_asynchronously(self):
+    for url, headers in (
+      (reverse('blog:blog-sitemap'), {}),
+      (reverse('blog:blog-sitemap'), {'Accept-Encoding': 'gzip'}),
+      (reverse('blog:blog-sitemap-page', kwargs={'page': 1}), {}),
+    ):
+      with self.subTest(url=url, headers=headers):
+        with override_settings(ROOT_URLCONF='backend_project.urls'):
+          expected = await sync_to_async(self.client.get)(url, headers=headers)
+          expected_body = await sync_to_async(b''.join)(expected.streaming_content)
+        response = await self.async_client.get(url, headers=headers)
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), expected_body)
+        self.assertEqual(response['ETag'], expected['ETag'])
+
+    missing = await self.async_client.get(reverse('blog:blog-sitemap-page', kwargs={'page': 2}))
+    self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+  async def test_abandoned_sitemap_streams_close_their_rows(self):
+    closed = []
+
+    def iterator(chunk_size):
+      try:
+        yield from range(3)
+      finally:
+        closed.append(True)
+
+    rows = blog_async_views._arows(mock.Mock(iterator=iterator))
+    self.assertEqual(await anext(rows), 0)
+    await rows.aclose()
+    self.assertEqual(closed, [True])
+
+  async def test_queries_match_the_sync_views(self):
+    url = reverse('blog:blog-posts-list')
+    expected = await sync_to_async(self.sync_get)(url)
+    response = await self.async_get(url)
+    self.assertEqual(response.asgi_request.query_stats.count, expected.wsgi_request.query_stats.count)
+
+  def test_every_async_route_declares_a_budget(self):
+    self.assertEqual(missing_budgets(blog_async_urls.urlpatterns), [])
+
+
+GENERATED_TEXT = [
+  'Hello world', 'a > b', 'a < b', 'Tom &amp; Jerry', 'x&nbsp;y', '&copy 2024', 'it&#39;s', '&bogus; thing',
+  '& more', '"quoted"', 'café', '  spaced  ', 'line\nbreak', 'x&AMP;y', 'rock&roll'
+]
+GENERATED_ATTRIBUTES = {
+  'a': [
+    ' href="https://example.com/a?b=1&c=2"', ' href="/relative"', ' href="#anchor"', ' href="javascript:x()"',
+    ' href="mailto:a@b.c"', ' HREF=HTTPS://X', ' title="T &amp; t"', " title='single'", ' target="_blank"'
+  ],
+  'img': [' src="/media/a.png"', ' alt=""', ' alt="A &lt; B"', ' width="600"', ' onerror="x"', ' src=x.png/'],
+  '*': [' class="lead"', ' id="x"', ' style="color:red"', ' class', ' CLASS="Up"']
+}
+GENERATED_INLINE_TAGS = ['strong', 'em', 'code', 'a', 'abbr', 'b', 'i', 'span', 'sub']
+GENERATED_BLOCK_TAGS = ['p', 'h2', 'h3', 'h4', 'blockquote', 'figure', 'figcaption', 'pre', 'ul', 'ol']
+
+
+def generate_attributes(rng, tag):
+  pool = GENERATED_ATTRIBUTES.get(tag, []) + GENERATED_ATTRIBUTES['*']
+  return ''.join(rng.sample(pool, rng.randint(0, 3)))
+
+
+def generate_inline(rng, depth):
+  parts = []
+  for _ in range(rng.randint(1, 4)):
+    roll = rng.random()
+    if roll < 0.5 or depth > 3:
+      parts.append(rng.choice(GENERATED_TEXT))
+    elif roll < 0.6:
+      parts.append(rng.choice(['<br>', '<br/>', f'<img{generate_attributes(rng, "img")}>']))
+    else:
+      tag = rng.choice(GENERATED_INLINE_TAGS)
+      inner = rng.choice(GENERATED_TEXT) if tag == 'a' else generate_inline(rng, depth + 1)
+      parts.append(f'<{tag}{generate_attributes(rng, tag)}>{inner}</{tag}>')
+  return ''.join(parts)
+
+
+def generate_block(rng, depth=0):
+  tag = rng.choice(GENERATED_BLOCK_TAGS)
+  if tag in ('ul', 'ol'):
+    items = ''.join(
+      f'<li>{generate_inline(rng, 1) if depth > 1 or rng.random() < 0.7 else generate_block(rng, depth + 1)}</li>'
+      for _ in range(rng.randint(1, 3))
+    )
+    return f'<{tag}>{items}</{tag}>'
+  if tag in ('blockquote', 'figure') and depth < 2:
+    return f'<{tag}>{generate_block(rng, depth + 1)}</{tag}>'
+  return f'<{tag}{generate_attributes(rng, tag)}>{generate_inline(rng, 0)}</{tag}>'
+
+
+def generate_body(rng):
+  return '\n'.join(generate_block(rng) for _ in range(rng.randint(1, 4)))
+
+
+class BlogSanitizerBackendTests(SimpleTestCase):
+  """The streaming backend must agree with bleach byte for byte."""
+
+  def sanitizer_pair(self, rich: bool):
+    args = (ALLOWED_BODY_TAGS, ALLOWED_BODY_ATTRIBUTES, ALLOWED_PROTOCOLS) if rich else ([], {}, ALLOWED_PROTOCOLS)
+    reference = BleachSanitizer(*args)
+    fallback = mock.Mock(side_effect=reference)
+    return reference, StreamingSanitizer(*args, fallback=fallback), fallback
+
+  def assertSameOutput(self, samples, rich: bool):
+    reference, streaming, fallback = self.sanitizer_pair(rich)
+    for sample in samples:
+      self.assertEqual(streaming(sample), reference(sample), sample)
+    return fallback
+
+  def test_corpus_matches_bleach(self):
+    for rich in (True, False):
+      with self.subTest(rich=rich):
+        self.assertSameOutput(SANITIZER_CORPUS, rich)
+
+  def test_generated_markup_matches_bleach_without_fallback(self):
+    generated = [generate_body(random.Random(seed)) for seed in range(300)]
+    fallback = self.assertSameOutput(generated, rich=True)
+    self.assertEqual(fallback.call_count, 0)
+
+    inline = [generate_inline(random.Random(seed), 0) for seed in range(300)]
+    fallback = self.assertSameOutput(inline, rich=False)
+    self.assertEqual(fallback.call_count, 0)
+
+  def test_plain_text_skips_the_tokenizer(self):
+    _, streaming, fallback = self.sanitizer_pair(rich=False)
+    with mock.patch.object(StreamingSanitizer, 'stream') as stream:
+      self.assertEqual(streaming('Kubernetes > VMs, "really"'), 'Kubernetes &gt; VMs, "really"')
+    stream.assert_not_called()
+    fallback.assert_not_called()
+
+  def test_backend_is_configurable(self):
+    with override_settings(BLOG_SANITIZER_BACKEND='bleach'):
+      self.assertIsInstance(get_sanitizer('rich'), BleachSanitizer)
+      self.assertEqual(sanitize_rich_text(' <p onclick=x>Hi</p> '), '<p>Hi</p>')
+    with override_settings(BLOG_SANITIZER_BACKEND='streaming'):
+      self.assertIsInstance(get_sanitizer('plain'), StreamingSanitizer)
+      self.assertEqual(sanitize_plain_text(' <b>Hi</b> '), 'Hi')
+    with override_settings(BLOG_SANITIZER_BACKEND='nope'):
+      with self.assertRaises(ValueError):
+        get_sanitizer('rich')
@@ -1,16 +1,18 @@
 from django.urls import path
 from rest_framework.routers import DefaultRouter
 
-from .views import BlogCategoryViewSet, BlogPostViewSet, blog_sitemap
+from .views import BlogAPIRootView, BlogCategoryViewSet, BlogPostViewSet, blog_sitemap, blog_sitemap_page
 
 app_name = 'blog'
 
 router = DefaultRouter()
+router.APIRootView = BlogAPIRootView
 router.register('posts', BlogPostViewSet, basename='blog-posts')
 router.register('categories', BlogCategoryViewSet, basename='blog-categories')
 
 urlpatterns = [
-  path('sitemap.xml', blog_sitemap, name='blog-sitemap')
+  path('sitemap.xml', blog_sitemap, name='blog-sitemap'),
+  path('sitemap-<int:page>.xml', blog_sitemap_page, name='blog-sitemap-page')
 ]
 
 urlpatterns += router.urls
@@ -1,72 +1,174 @@
-from xml.sax.saxutils import escape
+from django.db.models import Q
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers, quote_etag
+from django.utils.http import http_date
+from rest_framework import routers, viewsets
 
-from django.http import HttpResponse
-from django.utils import timezone
-from rest_framework import filters, viewsets
+from backend_project.instrumentation import query_budget
 
+from .cache import VersionedResponseCacheMixin
+from .conditional import ConditionalGetMixin, conditional_on, not_modified_response
 from .models import BlogCategory, BlogPost
-from .pagination import BlogPostPagination
-from .serializers import BlogCategorySerializer, BlogPostDetailSerializer, BlogPostListSerializer
+from .pagination import BlogPostKeysetPagination, BlogPostPagination
+from .payloads import RawPayloadMixin
+from .search import BlogPostSearchFilter
+from .serializers import BlogCategorySerializer, BlogPostCardSerializer, BlogPostDetailSerializer, BlogPostListSerializer
+from .sitemap_artifacts import INDEX_NAME, artifact_root, current_manifest, page_name
+from .sitemaps import (
+  SITEMAP_CHUNK_SIZE,
+  UrlBuilder,
+  accepts_gzip,
+  agzip_stream,
+  gzip_stream,
+  iter_sitemap_index,
+  iter_urlset,
+  max_urls_per_sitemap,
+  page_count,
+  sitemap_queryset
+)
 
 
-class BlogPostViewSet(viewsets.ReadOnlyModelViewSet):
+class BlogPostViewSet(VersionedResponseCacheMixin, ConditionalGetMixin, RawPayloadMixin, viewsets.ReadOnlyModelViewSet):
   serializer_class = BlogPostListSerializer
   lookup_field = 'slug'
-  filter_backends = [filters.SearchFilter]
+  filter_backends = [BlogPostSearchFilter]
   search_fields = ['title', 'excerpt', 'seo_title', 'seo_description']
   pagination_class = BlogPostPagination
+  keyset_pagination_class = BlogPostKeysetPagination
+  variant_query_params = ('page', 'page_size', 'cursor', 'category', 'search')
+  # Cold-cache worst case: content version refresh, validators, count and page,
+  # plus two batched queries when rows without a stored card take the serializer.
+  # Detail: version, validators, post and related posts, then the serializer
+  # fallback (post, categories, related posts, their categories).
+  query_budget = {'list': 6, 'retrieve': 8}
 
   def get_queryset(self):
-    queryset = BlogPost.objects.published().select_related('author').prefetch_related('categories')
-    category_slug = self.request.query_params.get('category')
-    if category_slug:
-      queryset = queryset.filter(categories__slug=category_slug)
-    return queryset
+    return post_queryset(self.action, self.request.query_params.get('category'))
+
+  @property
+  def paginator(self):
+    # ``?cursor=`` opts into keyset pagination; page-number clients are unaffected.
+    if not hasattr(self, '_paginator'):
+      use_keyset = self.keyset_pagination_class.cursor_query_param in self.request.query_params
+      self._paginator = self.keyset_pagination_class() if use_keyset else self.pagination_class()
+    return self._paginator
 
   def get_serializer_class(self):
     if self.action == 'retrieve':
       return BlogPostDetailSerializer
+    if self.action == 'list':
+      return BlogPostCardSerializer
     return super().get_serializer_class()
 
+  def get_validator_queryset(self):
+    if self.action == 'retrieve':
+      return post_validator_queryset(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+    return super().get_validator_queryset()
+
+
+def post_queryset(action: str, category_slug: str | None = None):
+  """The published posts ``action`` reads, narrowed to ``?category=`` when given."""
+  if action == 'list':
+    # List rows are served from their stored card; no joins or model hydration needed.
+    queryset = BlogPost.objects.published().only(*BlogPostCardSerializer.card_fields)
+  else:
+    queryset = BlogPost.objects.published().select_related('author').prefetch_related('categories')
+  if category_slug:
+    queryset = queryset.filter(categories__slug=category_slug)
+  return queryset
+
+
+def post_validator_queryset(slug: str):
+  # The detail payload embeds its related posts, so they take part in the fingerprint.
+  return BlogPost.objects.published().filter(Q(slug=slug) | Q(inbound_relations__post__slug=slug))
 
-class BlogCategoryViewSet(viewsets.ReadOnlyModelViewSet):
+
+class BlogCategoryViewSet(VersionedResponseCacheMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
   serializer_class = BlogCategorySerializer
   lookup_field = 'slug'
   queryset = BlogCategory.objects.all()
+  query_budget = {'list': 3, 'retrieve': 3}
+
+
+class BlogAPIRootView(routers.APIRootView):
+  query_budget = 0
+
+
+def _published_posts(request, **kwargs):
+  return BlogPost.objects.published()
+
+
+def _sitemap_encoding(request) -> str:
+  return 'gzip' if accepts_gzip(request) else 'identity'
 
 
+def _sitemap_response(request, chunks) -> StreamingHttpResponse:
+  """Stream ``chunks`` (an iterator, or an async iterator for async views), gzipped if accepted."""
+  if accepts_gzip(request):
+    compress = agzip_stream if hasattr(chunks, '__aiter__') else gzip_stream
+    response = StreamingHttpResponse(compress(chunks), content_type='application/xml')
+    response['Content-Encoding'] = 'gzip'
+  else:
+    response = StreamingHttpResponse(chunks, content_type='application/xml')
+  patch_vary_headers(response, ['Accept-Encoding'])
+  return response
+
+
+def _serve_sitemap_artifact(request, name: str):
+  """Serve a pre-rendered sitemap file, or ``None`` when artifacts are disabled."""
+  manifest = current_manifest()
+  if manifest is None:
+    return None
+  etag = manifest['files'].get(name)
+  if etag is None:
+    raise Http404('Sitemap page out of range.')
+
+  use_gzip = accepts_gzip(request)
+  etag = quote_etag(f'{etag}-gz' if use_gzip else etag)
+  not_modified = not_modified_response(request, etag, manifest['built_at'])
+  if not_modified is not None:
+    patch_vary_headers(not_modified, ['Accept-Encoding'])
+    return not_modified
+
+  path = artifact_root() / (f'{name}.gz' if use_gzip else name)
+  response = FileResponse(path.open('rb'), content_type='application/xml')
+  if use_gzip:
+    response['Content-Encoding'] = 'gzip'
+  response['ETag'] = etag
+  response['Last-Modified'] = http_date(manifest['built_at'])
+  patch_vary_headers(response, ['Accept-Encoding'])
+  return response
+
+
+@conditional_on(_published_posts, variant=_sitemap_encoding)
+def _stream_sitemap(request):
+  posts = BlogPost.objects.published()
+  build_url = UrlBuilder.for_request(request)
+  total = posts.count()
+  if total > max_urls_per_sitemap():
+    return _sitemap_response(request, iter_sitemap_index(page_count(total), build_url))
+
+  rows = sitemap_queryset(posts).iterator(chunk_size=SITEMAP_CHUNK_SIZE)
+  return _sitemap_response(request, iter_urlset(rows, build_url))
+
+
+@conditional_on(_published_posts, variant=_sitemap_encoding)
+def _stream_sitemap_page(request, page: int):
+  posts = BlogPost.objects.published()
+  if page < 1 or page > page_count(posts.count()):
+    raise Http404('Sitemap page out of range.')
+
+  per_page = max_urls_per_sitemap()
+  offset = (page - 1) * per_page
+  rows = sitemap_queryset(posts)[offset:offset + per_page].iterator(chunk_size=SITEMAP_CHUNK_SIZE)
+  return _sitemap_response(request, iter_urlset(rows, UrlBuilder.for_request(request)))
+
+
+@query_budget(3)
 def blog_sitemap(request):
-  posts = BlogPost.objects.published().only('slug', 'updated_at', 'published_at', 'canonical_url')
-  url_entries: list[str] = []
-
-  for post in posts:
-    canonical = post.canonical_url
-    if canonical and canonical.startswith('http'):
-      loc = canonical
-    else:
-      path = canonical or post.get_absolute_url()
-      loc = request.build_absolute_uri(path)
-
-    lastmod_dt = post.updated_at or post.published_at or timezone.now()
-    lastmod = lastmod_dt.date().isoformat()
-
-    url_entries.append(
-      '\n'.join([
-        '  <url>',
-        f'    <loc>{escape(loc)}</loc>',
-        f'    <lastmod>{lastmod}</lastmod>',
-        '    <changefreq>monthly</changefreq>',
-        '    <priority>0.7</priority>',
-        '  </url>'
-      ])
-    )
-
-  xml = '\n'.join([
-    '<?xml version="1.0" encoding="UTF-8"?>',
-    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
-    *url_entries,
-    '</urlset>',
-    ''
-  ])
-
-  return HttpResponse(xml, content_type='application/xml')
+  return _serve_sitemap_artifact(request, INDEX_NAME) or _stream_sitemap(request)
+
+
+@query_budget(3)
+def blog_sitemap_page(request, page: int):
+  return _serve_sitemap_artifact(request, page_name(page)) or _stream_sitemap_page(request, page=page)
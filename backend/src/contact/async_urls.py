@@ -0,0 +1,15 @@
+from django.urls import path
+
+from .async_views import contact_submission_create, lead_create, subscription_create, workshop_request_create
+from .views import SubscriptionImportView
+
+app_name = 'contact'
+
+urlpatterns = [
+  path('contact-submissions/', contact_submission_create, name='contact-submissions'),
+  path('subscriptions/', subscription_create, name='subscriptions'),
+  # Reads the upload as a blocking stream; served by the DRF view in a thread.
+  path('subscriptions/import/', SubscriptionImportView.as_view(), name='subscriptions-import'),
+  path('workshop-requests/', workshop_request_create, name='workshop-requests'),
+  path('leads/', lead_create, name='leads')
+]
@@ -0,0 +1,60 @@
+"""Async counterparts of ``contact.views``, routed by ``contact.async_urls`` when ``ASYNC_VIEWS`` is on.
+
+Validation runs on the event loop and the row is written with the async ORM,
+so a slow client or database never ties up a worker thread. Methods other
+than ``POST`` are answered by the DRF view.
+"""
+from asgiref.sync import sync_to_async
+from rest_framework import status
+
+from backend_project.async_api import async_api_view, render
+from backend_project.instrumentation import query_budget
+
+from .models import Subscription
+from .spool import enqueue, receipt_payload, spool_enabled
+from .views import (
+  ContactSubmissionView,
+  LeadView,
+  SubscriptionView,
+  WorkshopRequestView,
+  subscription_defaults
+)
+
+
+def async_create_view(view_class):
+  """A ``POST``-only create endpoint equivalent to ``view_class``, a spooled ``CreateAPIView``."""
+  serializer_class = view_class.serializer_class
+  manager = view_class.queryset.model._default_manager
+
+  @query_budget(view_class.query_budget)
+  @async_api_view(view_class.as_view(), methods=('POST',))
+  async def create(request, drf_request):
+    serializer = serializer_class(data=drf_request.data, context={'request': drf_request})
+    serializer.is_valid(raise_exception=True)
+    if spool_enabled():
+      # The spool append waits on an fsync; keep it off the event loop.
+      receipt = await sync_to_async(enqueue, thread_sensitive=False)(manager.model, serializer.validated_data)
+      return render(drf_request, receipt_payload(receipt), status.HTTP_202_ACCEPTED)
+    serializer.instance = await manager.acreate(**serializer.validated_data)
+    return render(drf_request, serializer.data, status.HTTP_201_CREATED)
+
+  return create
+
+
+contact_submission_create = async_create_view(ContactSubmissionView)
+workshop_request_create = async_create_view(WorkshopRequestView)
+lead_create = async_create_view(LeadView)
+
+
+@query_budget(SubscriptionView.query_budget)
+@async_api_view(SubscriptionView.as_view(), methods=('POST',))
+async def subscription_create(request, drf_request):
+  serializer = SubscriptionView.serializer_class(data=drf_request.data, context={'request': drf_request})
+  serializer.is_valid(raise_exception=True)
+  data = serializer.validated_data
+
+  # QuerySet.raw() has no async API.
+  subscription, created = await sync_to_async(Subscription.objects.upsert)(data['email'], **subscription_defaults(data))
+
+  status_code = status.HTTP_201_CREATED if created else status.HTTP_200_OK
+  return render(drf_request, SubscriptionView.serializer_class(subscription).data, status_code)
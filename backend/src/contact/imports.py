@@ -0,0 +1,175 @@
+"""Streaming bulk import of newsletter subscriptions from CSV or JSON lines.
+
+Used by ``manage.py import_subscriptions`` and ``POST /api/subscriptions/import/``.
+Records are read one line at a time, cleaned (emails are validated and
+lowercased, as ``SubscriptionSerializer`` does) and upserted
+``batch_size`` at a time through ``Subscription.objects.upsert_many``, so
+memory use does not depend on the size of the file. Each batch commits on
+its own and the upsert merges like a repeat sign-up, so an interrupted
+import can simply be run again.
+"""
+from __future__ import annotations
+
+import csv
+import json
+import time
+import typing
+from dataclasses import dataclass, field
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DatabaseError, transaction
+
+from .models import Subscription
+
+FORMATS = ('csv', 'jsonl')
+DEFAULT_BATCH_SIZE = 1000
+# Six parameters per row must stay under the database's bind parameter limit.
+MAX_BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y', 'on'}
+
+
+@dataclass
+class ImportReport:
+  rows: int = 0
+  created: int = 0
+  updated: int = 0
+  # Rows folded into an earlier row for the same email in their batch, so that
+  # ``rows == created + updated + merged + failed``.
+  merged: int = 0
+  failed: int = 0
+  # (line, message) for the first MAX_REPORTED_ERRORS failures; ``failed`` counts them all.
+  errors: list[tuple[int, str]] = field(default_factory=list)
+  seconds: float = 0.0
+
+  @property
+  def rows_per_second(self) -> float:
+    return self.rows / self.seconds if self.seconds else 0.0
+
+  def add_error(self, line: int, message: str) -> None:
+    self.failed += 1
+    if len(self.errors) < MAX_REPORTED_ERRORS:
+      self.errors.append((line, message))
+
+  def as_dict(self) -> dict:
+    return {
+      'rows': self.rows,
+      'created': self.created,
+      'updated': self.updated,
+      'merged': self.merged,
+      'failed': self.failed,
+      'errors': [{'line': line, 'message': message} for line, message in self.errors],
+      'seconds': round(self.seconds, 3),
+      'rows_per_second': round(self.rows_per_second, 1)
+    }
+
+
+def format_for_name(name: str) -> str | None:
+  suffix = name.rsplit('.', 1)[-1].lower()
+  return {'csv': 'csv', 'jsonl': 'jsonl', 'ndjson': 'jsonl'}.get(suffix)
+
+
+def read_records(lines: typing.Iterable[str], format: str) -> typing.Iterator[tuple[int, dict | None, str]]:
+  """Yield ``(line, record, error)`` for each record; exactly one of ``record`` and ``error`` is set."""
+  if format == 'csv':
+    reader = csv.DictReader(lines)
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+    if 'email' not in reader.fieldnames:
+      yield 1, None, 'The header row has no "email" column.'
+      return
+    for record in reader:
+      yield reader.line_num, record, ''
+    return
+
+  for number, line in enumerate(lines, 1):
+    if not line.strip():
+      continue
+    try:
+      record = json.loads(line)
+    except ValueError as exc:
+      yield number, None, f'Invalid JSON: {exc}'
+      continue
+    if isinstance(record, dict):
+      yield number, record, ''
+    else:
+      yield number, None, 'Expected a JSON object.'
+
+
+def _parse_bool(value) -> bool:
+  if isinstance(value, bool):
+    return value
+  return str(value or '').strip().lower() in TRUE_VALUES
+
+
+def _text(record: dict, name: str, default: str = '') -> str:
+  value = str(record.get(name) or default).strip()
+  max_length = Subscription._meta.get_field(name).max_length
+  if len(value) > max_length:
+    raise ValidationError(f'{name.capitalize()} is longer than {max_length} characters.')
+  return value
+
+
+def clean_record(record: dict, source: str = '', consent: bool = False) -> dict:
+  email = _text(record, 'email').lower()
+  if not email:
+    raise ValidationError('Email is required.')
+  validate_email(email)
+  if not (consent or _parse_bool(record.get('consent'))):
+    raise ValidationError('Consent is required.')
+  return {'email': email, 'name': _text(record, 'name'), 'source': _text(record, 'source', source), 'consent': True}
+
+
+def _upsert(batch: list[tuple[int, dict]], report: ImportReport) -> None:
+  try:
+    with transaction.atomic():
+      results = Subscription.objects.upsert_many([sign_up for _, sign_up in batch])
+    # ``upsert_many`` returns one result per distinct email.
+    report.merged += len(batch) - len(results)
+  except DatabaseError:
+    # Something validation did not catch; find the offending rows one by one.
+    results = []
+    for line, sign_up in batch:
+      try:
+        with transaction.atomic():
+          results.extend(Subscription.objects.upsert_many([sign_up]))
+      except DatabaseError as exc:
+        report.add_error(line, f'Database error: {exc}')
+  created = sum(1 for _, was_created in results if was_created)
+  report.created += created
+  report.updated += len(results) - created
+
+
+def import_subscriptions(
+  lines: typing.Iterable[str],
+  format: str,
+  batch_size: int = DEFAULT_BATCH_SIZE,
+  source: str = '',
+  consent: bool = False
+) -> ImportReport:
+  """Import every record in ``lines`` (text, one line at a time).
+
+  ``source`` fills in rows without one; ``consent`` records that every row
+  consented elsewhere, otherwise each row needs a truthy ``consent`` value.
+  """
+  batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+  report = ImportReport()
+  started = time.perf_counter()
+  batch = []
+  for line, record, error in read_records(lines, format):
+    report.rows += 1
+    if record is None:
+      report.add_error(line, error)
+      continue
+    try:
+      batch.append((line, clean_record(record, source, consent)))
+    except ValidationError as exc:
+      report.add_error(line, ' '.join(exc.messages))
+      continue
+    if len(batch) >= batch_size:
+      _upsert(batch, report)
+      batch = []
+  if batch:
+    _upsert(batch, report)
+  report.seconds = time.perf_counter() - started
+  return report
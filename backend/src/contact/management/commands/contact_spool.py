@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from contact.spool import flush, get_spool
+
+
+class Command(BaseCommand):
+  help = 'Inspect the contact ingestion spool, drain it into the database, or requeue parked entries.'
+
+  def add_arguments(self, parser):
+    parser.add_argument('action', nargs='?', choices=('inspect', 'drain', 'requeue'), default='inspect')
+    parser.add_argument('--limit', type=int, default=20, help='Entries listed by inspect.')
+    parser.add_argument('--batch-size', type=int, default=None, help='Rows per bulk insert when draining.')
+
+  def handle(self, *args, **options):
+    spool = get_spool()
+    action = options['action']
+    if action == 'drain':
+      started = time.perf_counter()
+      result = flush(spool, options['batch_size'])
+      elapsed = time.perf_counter() - started
+      self.stdout.write(self.style.SUCCESS(
+        f'Delivered {result.delivered} entries in {elapsed:.2f}s ({result.delivered / max(elapsed, 1e-9):.0f}/s), '
+        f'{result.failed} failed.'
+      ))
+    elif action == 'requeue':
+      self.stdout.write(self.style.SUCCESS(f'Requeued {spool.requeue()} parked entries.'))
+
+    stats = spool.stats()
+    self.stdout.write(
+      f"{spool.path}: {stats['pending']} pending ({stats['leased']} leased), {stats['parked']} parked, "
+      f"oldest {stats['oldest_age']:.0f}s old"
+    )
+    if action == 'inspect':
+      for entry in spool.entries(options['limit']):
+        error = f' last error: {entry.last_error}' if entry.last_error else ''
+        self.stdout.write(
+          f'  {entry.receipt} {entry.model} attempts={entry.attempts} '
+          f'age={time.time() - entry.enqueued_at:.0f}s{error}'
+        )
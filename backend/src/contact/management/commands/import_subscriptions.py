@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from contact.imports import DEFAULT_BATCH_SIZE, FORMATS, format_for_name, import_subscriptions
+
+
+class Command(BaseCommand):
+  help = 'Import newsletter subscriptions from a CSV (with an "email" header) or JSON-lines file.'
+
+  def add_arguments(self, parser):
+    parser.add_argument('path', help='File to import, or - for standard input.')
+    parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension (.csv, .jsonl, .ndjson).')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--source', default='', help='Source recorded for rows without one.')
+    parser.add_argument(
+      '--consent', action='store_true', help='Every row consented elsewhere; otherwise rows need a truthy "consent".'
+    )
+
+  def handle(self, *args, **options):
+    path = options['path']
+    format = options['format'] or format_for_name(path)
+    if format is None:
+      raise CommandError('Cannot tell the format from the file name; pass --format.')
+
+    stream = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+    try:
+      report = import_subscriptions(
+        stream, format, batch_size=options['batch_size'], source=options['source'], consent=options['consent']
+      )
+    except UnicodeDecodeError as exc:
+      raise CommandError(f'{path} is not UTF-8: {exc}')
+    finally:
+      if stream is not sys.stdin:
+        stream.close()
+
+    for line, message in report.errors:
+      self.stderr.write(f'line {line}: {message}')
+    if report.failed > len(report.errors):
+      self.stderr.write(f'... and {report.failed - len(report.errors)} more errors')
+    self.stdout.write(self.style.SUCCESS(
+      f'{report.rows} rows in {report.seconds:.2f}s ({report.rows_per_second:.0f} rows/sec): '
+      f'{report.created} created, {report.updated} updated, {report.merged} merged, {report.failed} failed.'
+    ))
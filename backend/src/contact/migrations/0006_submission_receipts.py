@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+  dependencies = [
+    ('contact', '0005_consent_fields'),
+  ]
+
+  operations = [
+    migrations.AddField(
+      model_name='contactsubmission',
+      name='receipt',
+      field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+    ),
+    migrations.AddField(
+      model_name='lead',
+      name='receipt',
+      field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+    ),
+    migrations.AddField(
+      model_name='workshoprequest',
+      name='receipt',
+      field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+    ),
+  ]
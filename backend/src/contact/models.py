@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import connections, models, router
+from django.utils import timezone
 
 
 class TimeStampedModel(models.Model):
@@ -11,7 +12,20 @@ class TimeStampedModel(models.Model):
     abstract = True
 
 
-class ContactSubmission(TimeStampedModel):
+class SpooledSubmission(TimeStampedModel):
+  """Abstract base for submissions that may arrive through the ingestion spool.
+
+  ``receipt`` is the ID handed to the client on ``202 Accepted``; it is unique
+  so a batch delivered twice inserts each row once.
+  """
+
+  receipt = models.UUIDField(unique=True, null=True, blank=True, editable=False)
+
+  class Meta:
+    abstract = True
+
+
+class ContactSubmission(SpooledSubmission):
   name = models.CharField(max_length=150)
   email = models.EmailField()
   phone = models.CharField(max_length=30, blank=True)
@@ -27,12 +41,76 @@ class ContactSubmission(TimeStampedModel):
     return f"ContactSubmission<{self.email}>"
 
 
+def merge_sign_ups(sign_ups) -> list[dict]:
+  """Collapse sign-ups for the same email the way consecutive upserts would."""
+  merged = {}
+  for sign_up in sign_ups:
+    current = merged.get(sign_up['email'])
+    if current is None:
+      merged[sign_up['email']] = {'name': '', 'source': '', 'consent': False, **sign_up}
+      continue
+    for field in ('name', 'source'):
+      if sign_up.get(field):
+        current[field] = sign_up[field]
+    current['consent'] = current['consent'] or bool(sign_up.get('consent'))
+  return list(merged.values())
+
+
+class SubscriptionQuerySet(models.QuerySet):
+  def upsert(self, email: str, name: str = '', source: str = '', consent: bool = False):
+    """Create or merge the subscription for ``email``; returns ``(subscription, created)``."""
+    (subscription, created), = self.upsert_many([{'email': email, 'name': name, 'source': source, 'consent': consent}])
+    return subscription, created
+
+  def upsert_many(self, sign_ups) -> list[tuple]:
+    """Create or merge subscriptions in one ``INSERT ... ON CONFLICT`` statement.
+
+    A repeat sign-up only overwrites ``name``/``source`` when they are
+    non-empty and only ever upgrades ``consent``, so concurrent requests for
+    one address cannot collide. Sign-ups sharing an email are merged first,
+    as a statement may not update the same row twice. Returns
+    ``(subscription, created)`` pairs in no particular order.
+    """
+    rows = merge_sign_ups(sign_ups)
+    if not rows:
+      return []
+    # ``self.db`` follows read routing; this is a write.
+    alias = self._db or router.db_for_write(self.model)
+    connection = connections[alias]
+    meta = self.model._meta
+    quote = connection.ops.quote_name
+    table = quote(meta.db_table)
+    now = timezone.now()
+    fields = ['email', 'name', 'source', 'consent', 'created_at', 'updated_at']
+    columns = {field: quote(meta.get_field(field).column) for field in [*fields, 'id']}
+    prepared_now = meta.get_field('created_at').get_db_prep_save(now, connection)
+    params = []
+    for row in rows:
+      values = {**row, 'created_at': now, 'updated_at': now}
+      params.extend(meta.get_field(field).get_db_prep_save(values[field], connection) for field in fields)
+    placeholders = f"({', '.join(['%s'] * len(fields))})"
+    name, source, consent, created_at = columns['name'], columns['source'], columns['consent'], columns['created_at']
+    sql = f"""
+      INSERT INTO {table} ({', '.join(columns[field] for field in fields)})
+      VALUES {', '.join([placeholders] * len(rows))}
+      ON CONFLICT ({columns['email']}) DO UPDATE SET
+        {name} = CASE WHEN excluded.{name} <> '' THEN excluded.{name} ELSE {table}.{name} END,
+        {source} = CASE WHEN excluded.{source} <> '' THEN excluded.{source} ELSE {table}.{source} END,
+        {consent} = {table}.{consent} OR excluded.{consent}
+      RETURNING {', '.join(columns.values())}, {created_at} = %s AS created
+    """
+    # An update keeps the stored created_at, so only an insert returns this statement's timestamp.
+    return [(subscription, bool(subscription.created)) for subscription in self.raw(sql, [*params, prepared_now], using=alias)]
+
+
 class Subscription(TimeStampedModel):
   email = models.EmailField(unique=True)
   name = models.CharField(max_length=150, blank=True)
   source = models.CharField(max_length=100, blank=True)
   consent = models.BooleanField(default=False)
 
+  objects = SubscriptionQuerySet.as_manager()
+
   class Meta:
     ordering = ['-created_at']
 
@@ -40,7 +118,7 @@ class Subscription(TimeStampedModel):
     return f"Subscription<{self.email}>"
 
 
-class WorkshopRequest(TimeStampedModel):
+class WorkshopRequest(SpooledSubmission):
   preferred_date = models.DateField()
   preferred_time = models.TimeField()
   location = models.CharField(max_length=200)
@@ -55,7 +133,7 @@ class WorkshopRequest(TimeStampedModel):
     return f"WorkshopRequest<{self.email} - {self.preferred_date}>"
 
 
-class Lead(TimeStampedModel):
+class Lead(SpooledSubmission):
   name = models.CharField(max_length=150)
   email = models.EmailField()
   phone = models.CharField(max_length=30, blank=True)
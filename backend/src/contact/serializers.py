@@ -1,9 +1,11 @@
 from rest_framework import serializers
 
+from backend_project.metrics import TimedSerializerMixin
+
 from .models import ContactSubmission, Lead, Subscription, WorkshopRequest
 
 
-class ContactSubmissionSerializer(serializers.ModelSerializer):
+class ContactSubmissionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
   class Meta:
     model = ContactSubmission
     fields = [
@@ -25,7 +27,7 @@ class ContactSubmissionSerializer(serializers.ModelSerializer):
     return value
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class SubscriptionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
   class Meta:
     model = Subscription
     fields = ['id', 'email', 'name', 'source', 'consent', 'created_at']
@@ -45,7 +47,7 @@ class SubscriptionSerializer(serializers.ModelSerializer):
     return value
 
 
-class WorkshopRequestSerializer(serializers.ModelSerializer):
+class WorkshopRequestSerializer(TimedSerializerMixin, serializers.ModelSerializer):
   class Meta:
     model = WorkshopRequest
     fields = [
@@ -61,7 +63,7 @@ class WorkshopRequestSerializer(serializers.ModelSerializer):
     read_only_fields = ['id', 'created_at']
 
 
-class LeadSerializer(serializers.ModelSerializer):
+class LeadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
   class Meta:
     model = Lead
     fields = ['id', 'name', 'email', 'phone', 'company', 'plan', 'message', 'consent_privacy', 'created_at']
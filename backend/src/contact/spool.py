@@ -0,0 +1,315 @@
+"""Write-behind ingestion for contact forms (``CONTACT_INGEST_MODE=spool``).
+
+Validated payloads are appended to a local SQLite spool in WAL mode and
+answered with ``202 Accepted`` and a receipt ID; a background thread in each
+worker flushes them to the database in ``bulk_create`` batches. An entry is
+only removed from the spool after its batch committed, and the receipt is a
+unique column on the target table, so delivery is at-least-once and a batch
+delivered twice inserts each row once. Entries are leased while a flush is
+in flight, which keeps workers sharing the spool from delivering the same
+batch and lets a crashed worker's entries be picked up once the lease
+expires. ``python manage.py contact_spool`` inspects or drains the spool.
+"""
+from __future__ import annotations
+
+import atexit
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from itertools import groupby
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  receipt TEXT NOT NULL UNIQUE,
+  model TEXT NOT NULL,
+  payload TEXT NOT NULL,
+  enqueued_at REAL NOT NULL,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  leased_until REAL NOT NULL DEFAULT 0,
+  last_error TEXT NOT NULL DEFAULT ''
+)
+'''
+COLUMNS = 'id, receipt, model, payload, enqueued_at, attempts, last_error'
+# A flush that has not acknowledged its batch after this long is presumed dead.
+LEASE_SECONDS = 60.0
+# Entries failing this many deliveries are parked until ``contact_spool requeue``.
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 5.0
+
+
+@dataclass
+class SpoolEntry:
+  id: int
+  receipt: uuid.UUID
+  model: str
+  payload: dict
+  enqueued_at: float
+  attempts: int
+  last_error: str
+
+  @classmethod
+  def from_row(cls, row) -> SpoolEntry:
+    id, receipt, model, payload, enqueued_at, attempts, last_error = row
+    return cls(id, uuid.UUID(receipt), model, json.loads(payload), enqueued_at, attempts, last_error)
+
+
+@dataclass
+class FlushResult:
+  delivered: int = 0
+  failed: int = 0
+
+
+class Spool:
+  """Durable FIFO of pending submissions, safe to share between processes."""
+
+  def __init__(self, path):
+    self.path = Path(path)
+    self._local = threading.local()
+
+  def _connection(self) -> sqlite3.Connection:
+    connection = getattr(self._local, 'connection', None)
+    if connection is None:
+      self.path.parent.mkdir(parents=True, exist_ok=True)
+      connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+      connection.execute('PRAGMA journal_mode=WAL')
+      # An accepted submission must survive a power cut, not just a crash.
+      connection.execute('PRAGMA synchronous=FULL')
+      connection.execute(SCHEMA)
+      self._local.connection = connection
+    return connection
+
+  @contextlib.contextmanager
+  def _write(self):
+    connection = self._connection()
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+      yield connection
+    except BaseException:
+      connection.execute('ROLLBACK')
+      raise
+    connection.execute('COMMIT')
+
+  def close(self) -> None:
+    connection = getattr(self._local, 'connection', None)
+    if connection is not None:
+      connection.close()
+      self._local.connection = None
+
+  def append(self, model, data: dict) -> uuid.UUID:
+    receipt = uuid.uuid4()
+    self._connection().execute(
+      'INSERT INTO entries (receipt, model, payload, enqueued_at) VALUES (?, ?, ?, ?)',
+      (str(receipt), model._meta.label_lower, json.dumps(data, cls=DjangoJSONEncoder), time.time())
+    )
+    return receipt
+
+  def lease(self, limit: int, seconds: float = LEASE_SECONDS) -> list[SpoolEntry]:
+    """Claim up to ``limit`` of the oldest deliverable entries for ``seconds``."""
+    now = time.time()
+    with self._write() as connection:
+      rows = connection.execute(
+        f'SELECT {COLUMNS} FROM entries WHERE leased_until <= ? AND attempts < ? ORDER BY id LIMIT ?',
+        (now, MAX_ATTEMPTS, limit)
+      ).fetchall()
+      connection.executemany('UPDATE entries SET leased_until = ? WHERE id = ?', [(now + seconds, row[0]) for row in rows])
+    return [SpoolEntry.from_row(row) for row in rows]
+
+  def ack(self, entries: list[SpoolEntry]) -> None:
+    with self._write() as connection:
+      connection.executemany('DELETE FROM entries WHERE id = ?', [(entry.id,) for entry in entries])
+
+  def fail(self, entry: SpoolEntry, error: str) -> None:
+    with self._write() as connection:
+      connection.execute(
+        'UPDATE entries SET attempts = attempts + 1, last_error = ?, leased_until = ? WHERE id = ?',
+        (error, time.time() + RETRY_DELAY, entry.id)
+      )
+
+  def requeue(self) -> int:
+    """Make parked entries deliverable again; returns how many there were."""
+    with self._write() as connection:
+      return connection.execute(
+        "UPDATE entries SET attempts = 0, leased_until = 0, last_error = '' WHERE attempts >= ?", (MAX_ATTEMPTS,)
+      ).rowcount
+
+  def entries(self, limit: int) -> list[SpoolEntry]:
+    rows = self._connection().execute(f'SELECT {COLUMNS} FROM entries ORDER BY id LIMIT ?', (limit,)).fetchall()
+    return [SpoolEntry.from_row(row) for row in rows]
+
+  def stats(self) -> dict:
+    now = time.time()
+    pending, leased, parked, oldest = self._connection().execute(
+      '''
+      SELECT
+        COALESCE(SUM(attempts < ?), 0),
+        COALESCE(SUM(attempts < ? AND leased_until > ?), 0),
+        COALESCE(SUM(attempts >= ?), 0),
+        MIN(enqueued_at)
+      FROM entries
+      ''',
+      (MAX_ATTEMPTS, MAX_ATTEMPTS, now, MAX_ATTEMPTS)
+    ).fetchone()
+    return {
+      'pending': pending,
+      'leased': leased,
+      'parked': parked,
+      'oldest_age': now - oldest if oldest is not None else 0.0
+    }
+
+
+def build_instance(entry: SpoolEntry):
+  model = apps.get_model(entry.model)
+  fields = {name: model._meta.get_field(name).to_python(value) for name, value in entry.payload.items()}
+  return model(receipt=entry.receipt, **fields)
+
+
+def deliver(spool: Spool, entries: list[SpoolEntry]) -> FlushResult:
+  """Insert ``entries`` and acknowledge the ones that were written.
+
+  Each model's rows go in as one ``bulk_create``; conflicts on ``receipt``
+  are ignored so a redelivered entry is a no-op. When a batch fails its rows
+  are retried one by one so a single bad payload cannot hold up the rest.
+  """
+  result = FlushResult()
+  for _, group in groupby(sorted(entries, key=lambda entry: entry.model), key=lambda entry: entry.model):
+    group = list(group)
+    try:
+      with transaction.atomic():
+        instances = [build_instance(entry) for entry in group]
+        type(instances[0])._default_manager.bulk_create(instances, ignore_conflicts=True)
+    except Exception:
+      for entry in group:
+        try:
+          with transaction.atomic():
+            instance = build_instance(entry)
+            type(instance)._default_manager.bulk_create([instance], ignore_conflicts=True)
+        except Exception as exc:
+          logger.warning('Spooled %s %s was not delivered: %r', entry.model, entry.receipt, exc)
+          spool.fail(entry, repr(exc))
+          result.failed += 1
+        else:
+          spool.ack([entry])
+          result.delivered += 1
+    else:
+      spool.ack(group)
+      result.delivered += len(group)
+  return result
+
+
+def flush(spool: Spool, batch_size: int | None = None, until_empty: bool = True) -> FlushResult:
+  batch_size = batch_size or getattr(settings, 'CONTACT_SPOOL_BATCH_SIZE', 500)
+  total = FlushResult()
+  while entries := spool.lease(batch_size):
+    result = deliver(spool, entries)
+    total.delivered += result.delivered
+    total.failed += result.failed
+    if not until_empty or len(entries) < batch_size:
+      break
+  return total
+
+
+class SpoolWorker(threading.Thread):
+  """Flushes the spool every ``interval`` seconds, or sooner once a batch is waiting."""
+
+  def __init__(self, spool: Spool, interval: float, batch_size: int):
+    super().__init__(name='contact-spool', daemon=True)
+    self.spool = spool
+    self.interval = interval
+    self.batch_size = batch_size
+    self._wake = threading.Event()
+    self._stopping = threading.Event()
+    self._appended = 0
+
+  def notify(self) -> None:
+    self._appended += 1
+    if self._appended >= self.batch_size:
+      self._wake.set()
+
+  def run(self) -> None:
+    while not self._stopping.is_set():
+      self._wake.wait(self.interval)
+      self._wake.clear()
+      self._appended = 0
+      self.flush()
+
+  def flush(self) -> None:
+    try:
+      flush(self.spool, self.batch_size)
+    except Exception:
+      logger.exception('Flushing the contact spool failed; entries stay queued')
+    finally:
+      close_old_connections()
+
+  def stop(self) -> None:
+    # Whatever is still queued stays in the spool for the next process.
+    self._stopping.set()
+    self._wake.set()
+    self.join(timeout=self.interval + LEASE_SECONDS)
+
+
+_spool: Spool | None = None
+_worker: SpoolWorker | None = None
+_lock = threading.Lock()
+
+
+def spool_enabled() -> bool:
+  return getattr(settings, 'CONTACT_INGEST_MODE', 'direct') == 'spool'
+
+
+def get_spool() -> Spool:
+  global _spool
+  path = Path(settings.CONTACT_SPOOL_PATH)
+  if _spool is None or _spool.path != path:
+    _spool = Spool(path)
+  return _spool
+
+
+def _ensure_worker() -> SpoolWorker:
+  global _worker
+  with _lock:
+    if _worker is None:
+      _worker = SpoolWorker(
+        get_spool(),
+        getattr(settings, 'CONTACT_SPOOL_FLUSH_INTERVAL', 1.0),
+        getattr(settings, 'CONTACT_SPOOL_BATCH_SIZE', 500)
+      )
+      _worker.start()
+      atexit.register(_worker.stop)
+  return _worker
+
+
+def enqueue(model, data: dict) -> uuid.UUID:
+  receipt = get_spool().append(model, data)
+  if getattr(settings, 'CONTACT_SPOOL_WORKER', True):
+    _ensure_worker().notify()
+  return receipt
+
+
+def receipt_payload(receipt: uuid.UUID) -> dict:
+  return {'receipt': str(receipt), 'status': 'queued'}
+
+
+def _reset_after_fork() -> None:
+  # SQLite handles, the flush thread and its lock do not survive a fork.
+  global _spool, _worker, _lock
+  _spool = None
+  _worker = None
+  _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,8 +1,30 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from datetime import date, time
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
+
+from backend_project.instrumentation import missing_budgets
 
+from . import async_urls as contact_async_urls
+from . import urls as contact_urls
+from .imports import MAX_REPORTED_ERRORS, import_subscriptions
 from .models import ContactSubmission, Lead, Subscription, WorkshopRequest
+from .spool import MAX_ATTEMPTS, deliver, flush, get_spool
 
 
 class ContactSubmissionTests(APITestCase):
@@ -45,6 +67,55 @@ class SubscriptionTests(APITestCase):
     self.assertEqual(Subscription.objects.count(), 1)
     self.assertEqual(Subscription.objects.first().name, 'Updated Name')
 
+  def test_repeat_sign_ups_merge(self):
+    url = reverse('contact:subscriptions')
+    first = self.client.post(url, {'email': 'merge@example.com', 'name': 'First', 'source': 'footer', 'consent': True}, format='json')
+    Subscription.objects.update(consent=False)
+    repeat = self.client.post(url, {'email': 'MERGE@example.com', 'name': '', 'consent': True}, format='json')
+
+    self.assertEqual(repeat.status_code, status.HTTP_200_OK)
+    subscription = Subscription.objects.get()
+    self.assertEqual((subscription.name, subscription.source, subscription.consent), ('First', 'footer', True))
+    self.assertEqual(repeat.json(), {**first.json(), 'consent': True})
+
+    self.client.post(url, {'email': 'merge@example.com', 'source': 'popup', 'consent': True}, format='json')
+    self.assertEqual(Subscription.objects.values_list('name', 'source').get(), ('First', 'popup'))
+
+
+class SubscriptionConcurrencyTests(TransactionTestCase):
+  def test_concurrent_sign_ups_for_one_address(self):
+    url = reverse('contact:subscriptions')
+    workers = 8
+    barrier = threading.Barrier(workers)
+    statuses, errors = [], []
+
+    def sign_up(index):
+      try:
+        barrier.wait()
+        for attempt in range(5):
+          response = APIClient().post(
+            url, {'email': 'race@example.com', 'name': f'Racer {index}.{attempt}', 'consent': True}, format='json'
+          )
+          statuses.append(response.status_code)
+      except Exception as exc:
+        errors.append(exc)
+      finally:
+        connection.close()
+
+    threads = [threading.Thread(target=sign_up, args=(index,)) for index in range(workers)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual(errors, [])
+    self.assertEqual(sorted(set(statuses)), [status.HTTP_200_OK, status.HTTP_201_CREATED])
+    self.assertEqual(statuses.count(status.HTTP_201_CREATED), 1)
+    self.assertEqual(len(statuses), workers * 5)
+    subscription = Subscription.objects.get()
+    self.assertTrue(subscription.consent)
+    self.assertRegex(subscription.name, r'^Racer \d\.\d$')
+
 
 class WorkshopRequestTests(APITestCase):
   def test_create_workshop_request(self):
@@ -83,3 +154,290 @@ class LeadTests(APITestCase):
     self.assertEqual(Lead.objects.count(), 1)
     lead = Lead.objects.first()
     self.assertEqual(lead.plan, 'Growth')
+
+
+class QueryBudgetTests(APITestCase):
+  def test_every_route_declares_a_budget(self):
+    self.assertEqual(missing_budgets(contact_urls.urlpatterns), [])
+
+  def test_subscription_upsert_query_counts(self):
+    url = reverse('contact:subscriptions')
+    payload = {'email': 'budget@example.com', 'name': 'Budget', 'consent': True}
+    created = self.client.post(url, payload, format='json')
+    updated = self.client.post(url, {**payload, 'name': 'Renamed'}, format='json')
+
+    self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+    self.assertEqual(updated.status_code, status.HTTP_200_OK)
+    self.assertEqual(created.wsgi_request.query_stats.count, 1)
+    self.assertEqual(updated.wsgi_request.query_stats.count, 1)
+
+
+@override_settings(ROOT_URLCONF='backend_project.async_urls')
+class AsyncCreateTests(APITestCase):
+  lead = {'name': 'Sam Essex', 'email': 'sam@example.com', 'plan': 'Growth', 'consent_privacy': True}
+
+  async def test_creates_match_the_drf_views(self):
+    cases = [
+      ('contact:leads', self.lead, Lead),
+      (
+        'contact:contact-submissions',
+        {'name': 'Jane', 'email': 'jane@example.com', 'message': 'Hello', 'consent_privacy': True},
+        ContactSubmission
+      ),
+      (
+        'contact:workshop-requests',
+        {
+          'preferred_date': '2025-12-05',
+          'preferred_time': '10:30:00',
+          'location': 'London HQ',
+          'email': 'ops@example.com',
+          'phone': '+44 20 7946 0018',
+          'description': 'Strategy alignment workshop.'
+        },
+        WorkshopRequest
+      ),
+    ]
+    for name, payload, model in cases:
+      with self.subTest(name=name):
+        response = await self.async_client.post(reverse(name), payload, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        created = await model.objects.aget()
+        self.assertEqual(response.json()['id'], created.pk)
+        self.assertEqual(response.json()['email'], payload['email'])
+
+  async def test_errors_match_the_drf_views(self):
+    url = reverse('contact:leads')
+    invalid = {**self.lead, 'consent_privacy': False}
+    with override_settings(ROOT_URLCONF='backend_project.urls'):
+      expected = await sync_to_async(self.client.post)(url, invalid, format='json')
+      expected_get = await sync_to_async(self.client.get)(url)
+    response = await self.async_client.post(url, invalid, content_type='application/json')
+    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    self.assertEqual(response.content, expected.content)
+
+    malformed = await self.async_client.post(url, '{', content_type='application/json')
+    self.assertEqual(malformed.status_code, status.HTTP_400_BAD_REQUEST)
+    self.assertIn('detail', malformed.json())
+
+    response = await self.async_client.get(url)
+    self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+    self.assertEqual(response.content, expected_get.content)
+    self.assertFalse(await Lead.objects.aexists())
+
+  async def test_subscription_upsert(self):
+    url = reverse('contact:subscriptions')
+    payload = {'email': 'Subscriber@Example.com', 'name': 'Subscriber', 'consent': True}
+    created = await self.async_client.post(url, payload, content_type='application/json')
+    updated = await self.async_client.post(url, {**payload, 'name': 'Renamed'}, content_type='application/json')
+
+    self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+    self.assertEqual(updated.status_code, status.HTTP_200_OK)
+    self.assertEqual(updated.json()['id'], created.json()['id'])
+    subscription = await Subscription.objects.aget()
+    self.assertEqual((subscription.email, subscription.name), ('subscriber@example.com', 'Renamed'))
+
+  def test_every_async_route_declares_a_budget(self):
+    self.assertEqual(missing_budgets(contact_async_urls.urlpatterns), [])
+
+
+class SpoolTestCase(APITestCase):
+  def setUp(self):
+    directory = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, directory)
+    settings_override = override_settings(
+      CONTACT_INGEST_MODE='spool',
+      CONTACT_SPOOL_PATH=os.path.join(directory, 'spool.sqlite3'),
+      CONTACT_SPOOL_WORKER=False,
+      CONTACT_SPOOL_BATCH_SIZE=2
+    )
+    settings_override.enable()
+    self.addCleanup(settings_override.disable)
+    self.spool = get_spool()
+    self.addCleanup(self.spool.close)
+
+
+class SpoolIngestionTests(SpoolTestCase):
+  lead = {'name': 'Sam Essex', 'email': 'sam@example.com', 'plan': 'Growth', 'consent_privacy': True}
+  workshop = {
+    'preferred_date': '2025-12-05',
+    'preferred_time': '10:30:00',
+    'location': 'London HQ',
+    'email': 'ops@example.com',
+    'phone': '+44 20 7946 0018',
+    'description': 'Strategy alignment workshop.'
+  }
+
+  def test_submissions_are_accepted_then_flushed_in_batches(self):
+    receipts = []
+    for index in range(3):
+      response = self.client.post(reverse('contact:leads'), {**self.lead, 'name': f'Lead {index}'}, format='json')
+      self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+      self.assertEqual(response.json()['status'], 'queued')
+      receipts.append(uuid.UUID(response.json()['receipt']))
+    self.client.post(reverse('contact:workshop-requests'), self.workshop, format='json')
+    self.assertFalse(Lead.objects.exists())
+    self.assertEqual(self.spool.stats()['pending'], 4)
+
+    with CaptureQueriesContext(connection) as queries:
+      result = flush(self.spool)
+    self.assertEqual((result.delivered, result.failed), (4, 0))
+    inserts = [query for query in queries.captured_queries if query['sql'].startswith('INSERT')]
+    self.assertEqual(len(inserts), 3)
+    self.assertEqual(sorted(Lead.objects.values_list('receipt', flat=True)), sorted(receipts))
+    workshop = WorkshopRequest.objects.get()
+    self.assertEqual((workshop.preferred_date, workshop.preferred_time), (date(2025, 12, 5), time(10, 30)))
+    self.assertEqual(self.spool.stats()['pending'], 0)
+
+  def test_invalid_submissions_are_rejected_before_spooling(self):
+    response = self.client.post(reverse('contact:leads'), {**self.lead, 'consent_privacy': False}, format='json')
+    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    self.assertEqual(self.spool.stats()['pending'], 0)
+
+  def test_redelivery_is_idempotent(self):
+    self.client.post(reverse('contact:leads'), self.lead, format='json')
+    # A worker that inserted the batch but died before acknowledging it.
+    entries = self.spool.lease(10, seconds=0)
+    with mock.patch.object(self.spool, 'ack'):
+      deliver(self.spool, entries)
+    self.assertEqual(flush(self.spool).delivered, 1)
+    self.assertEqual(Lead.objects.count(), 1)
+    self.assertEqual(self.spool.stats()['pending'], 0)
+
+  def test_leased_entries_are_not_delivered_twice(self):
+    self.client.post(reverse('contact:leads'), self.lead, format='json')
+    self.assertEqual(len(self.spool.lease(10)), 1)
+    self.assertEqual(self.spool.lease(10), [])
+    self.assertEqual(self.spool.stats()['leased'], 1)
+
+  @mock.patch('contact.spool.RETRY_DELAY', 0)
+  def test_bad_entries_do_not_block_the_batch(self):
+    self.spool.append(WorkshopRequest, {**self.workshop, 'preferred_date': 'someday'})
+    self.client.post(reverse('contact:workshop-requests'), self.workshop, format='json')
+
+    with self.assertLogs('contact.spool', 'WARNING'):
+      result = flush(self.spool, batch_size=10)
+    self.assertEqual((result.delivered, result.failed), (1, 1))
+    self.assertEqual(WorkshopRequest.objects.count(), 1)
+    failed, = self.spool.entries(10)
+    self.assertEqual(failed.attempts, 1)
+    self.assertIn('someday', failed.last_error)
+
+    with self.assertLogs('contact.spool', 'WARNING'):
+      for _ in range(MAX_ATTEMPTS):
+        flush(self.spool, batch_size=10)
+    self.assertEqual(self.spool.entries(10)[0].attempts, MAX_ATTEMPTS)
+    self.assertEqual(self.spool.stats()['parked'], 1)
+    self.assertEqual(self.spool.requeue(), 1)
+    self.assertEqual(self.spool.stats()['pending'], 1)
+
+  def test_management_command(self):
+    self.client.post(reverse('contact:leads'), self.lead, format='json')
+    out = StringIO()
+    call_command('contact_spool', stdout=out)
+    self.assertIn('1 pending', out.getvalue())
+    self.assertIn('contact.lead', out.getvalue())
+
+    out = StringIO()
+    call_command('contact_spool', 'drain', stdout=out)
+    self.assertIn('Delivered 1 entries', out.getvalue())
+    self.assertTrue(Lead.objects.exists())
+
+  @override_settings(ROOT_URLCONF='backend_project.async_urls')
+  async def test_async_views_spool_too(self):
+    response = await self.async_client.post(reverse('contact:leads'), self.lead, content_type='application/json')
+    self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+    self.assertFalse(await Lead.objects.aexists())
+    # The async view appended from a pool thread; read the spool from this one.
+    self.assertEqual(self.spool.stats()['pending'], 1)
+
+
+class SubscriptionImportTests(APITestCase):
+  csv_body = (
+    'Email,Name,Source,Consent\n'
+    'ADA@example.com,Ada,,yes\n'
+    'bob@example.com,Bob,webinar,1\n'
+    'not-an-email,Nope,,yes\n'
+    'carol@example.com,Carol,,no\n'
+    'ada@example.com,,,true\n'
+  )
+
+  def setUp(self):
+    Subscription.objects.create(email='bob@example.com', name='Robert', source='footer', consent=True)
+    self.admin = User.objects.create_user('admin', is_staff=True)
+
+  def test_csv_rows_are_upserted_in_batches(self):
+    report = import_subscriptions(StringIO(self.csv_body), 'csv', batch_size=2, source='legacy')
+
+    self.assertEqual((report.rows, report.created, report.updated, report.failed), (5, 1, 2, 2))
+    self.assertEqual(report.errors, [(4, 'Enter a valid email address.'), (5, 'Consent is required.')])
+    self.assertEqual(
+      dict(Subscription.objects.values_list('email', 'source')),
+      {'ada@example.com': 'legacy', 'bob@example.com': 'webinar'}
+    )
+    self.assertEqual(Subscription.objects.get(email='ada@example.com').name, 'Ada')
+    self.assertGreater(report.rows_per_second, 0)
+
+  def test_one_statement_per_batch(self):
+    body = ''.join(json.dumps({'email': f'user{index}@example.com', 'consent': True}) + '\n' for index in range(25))
+    with CaptureQueriesContext(connection) as queries:
+      report = import_subscriptions(StringIO(body), 'jsonl', batch_size=10)
+    self.assertEqual(report.created, 25)
+    self.assertEqual(sum(query['sql'].lstrip().startswith('INSERT') for query in queries.captured_queries), 3)
+
+  def test_duplicates_within_a_batch_merge_like_repeat_sign_ups(self):
+    body = '\n'.join([
+      '{"email": "dup@example.com", "name": "First", "consent": true}',
+      '{"email": "DUP@example.com", "source": "import", "consent": true}',
+      '["not", "an", "object"]',
+      '{"email": "dup@example.com", "name": "Last", "consent": true}',
+      '{broken',
+    ])
+    report = import_subscriptions(StringIO(body), 'jsonl')
+    self.assertEqual((report.rows, report.created, report.updated, report.merged, report.failed), (5, 1, 0, 2, 2))
+    self.assertEqual([line for line, _ in report.errors], [3, 5])
+    self.assertEqual(Subscription.objects.values_list('name', 'source').get(email='dup@example.com'), ('Last', 'import'))
+
+  def test_reported_errors_are_capped(self):
+    body = 'email\n' + 'bad\n' * (MAX_REPORTED_ERRORS + 10)
+    report = import_subscriptions(StringIO(body), 'csv')
+    self.assertEqual(report.failed, MAX_REPORTED_ERRORS + 10)
+    self.assertEqual(len(report.errors), MAX_REPORTED_ERRORS)
+
+  def test_management_command(self):
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as upload:
+      upload.write(self.csv_body)
+    self.addCleanup(os.remove, upload.name)
+    out, err = StringIO(), StringIO()
+    call_command('import_subscriptions', upload.name, '--batch-size', '2', stdout=out, stderr=err)
+    self.assertIn('5 rows', out.getvalue())
+    self.assertIn('rows/sec', out.getvalue())
+    self.assertIn('1 created, 2 updated, 0 merged, 2 failed', out.getvalue())
+    self.assertIn('line 4: Enter a valid email address.', err.getvalue())
+
+  def test_endpoint_is_admin_only(self):
+    url = reverse('contact:subscriptions-import')
+    self.assertEqual(self.client.post(url, self.csv_body, content_type='text/csv').status_code, status.HTTP_403_FORBIDDEN)
+    self.client.force_authenticate(User.objects.create_user('member'))
+    self.assertEqual(self.client.post(url, self.csv_body, content_type='text/csv').status_code, status.HTTP_403_FORBIDDEN)
+    self.assertEqual(Subscription.objects.count(), 1)
+
+  def test_endpoint_streams_the_body(self):
+    url = reverse('contact:subscriptions-import')
+    self.client.force_authenticate(self.admin)
+    response = self.client.post(f'{url}?source=api&batch_size=2', self.csv_body, content_type='text/csv; charset=utf-8')
+
+    self.assertEqual(response.status_code, status.HTTP_200_OK)
+    body = response.json()
+    self.assertEqual((body['rows'], body['created'], body['updated'], body['merged'], body['failed']), (5, 1, 2, 0, 2))
+    self.assertEqual(body['errors'][0], {'line': 4, 'message': 'Enter a valid email address.'})
+    self.assertEqual(Subscription.objects.get(email='ada@example.com').source, 'api')
+
+    jsonl = self.client.post(url, '{"email": "eve@example.com"}\n', content_type='application/x-ndjson')
+    self.assertEqual(jsonl.json()['errors'], [{'line': 1, 'message': 'Consent is required.'}])
+    jsonl = self.client.post(f'{url}?consent=true', '{"email": "eve@example.com"}\n', content_type='application/x-ndjson')
+    self.assertEqual(jsonl.json()['created'], 1)
+
+    unsupported = self.client.post(url, {'email': 'x@example.com'}, format='json')
+    self.assertEqual(unsupported.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+    invalid = self.client.post(url, b'email\n\xff\n', content_type='text/csv')
+    self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
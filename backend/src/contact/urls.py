@@ -1,12 +1,13 @@
 from django.urls import path
 
-from .views import ContactSubmissionView, LeadView, SubscriptionView, WorkshopRequestView
+from .views import ContactSubmissionView, LeadView, SubscriptionImportView, SubscriptionView, WorkshopRequestView
 
 app_name = 'contact'
 
 urlpatterns = [
   path('contact-submissions/', ContactSubmissionView.as_view(), name='contact-submissions'),
   path('subscriptions/', SubscriptionView.as_view(), name='subscriptions'),
+  path('subscriptions/import/', SubscriptionImportView.as_view(), name='subscriptions-import'),
   path('workshop-requests/', WorkshopRequestView.as_view(), name='workshop-requests'),
   path('leads/', LeadView.as_view(), name='leads')
 ]
@@ -1,58 +1,114 @@
+import codecs
+import math
+
 from rest_framework import status
+from rest_framework.exceptions import ParseError, UnsupportedMediaType
 from rest_framework.generics import CreateAPIView
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from .imports import DEFAULT_BATCH_SIZE, import_subscriptions
 from .models import ContactSubmission, Lead, Subscription, WorkshopRequest
 from .serializers import ContactSubmissionSerializer, LeadSerializer, SubscriptionSerializer, WorkshopRequestSerializer
+from .spool import enqueue, receipt_payload, spool_enabled
+
+
+def subscription_defaults(data) -> dict:
+  return {
+    'name': data.get('name', ''),
+    'source': data.get('source', ''),
+    'consent': data.get('consent', False)
+  }
+
+
+class SpooledCreateMixin:
+  """In ``spool`` ingestion mode, queue the validated payload and answer ``202`` with its receipt."""
+
+  def create(self, request, *args, **kwargs):
+    if not spool_enabled():
+      return super().create(request, *args, **kwargs)
+    serializer = self.get_serializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    receipt = enqueue(self.queryset.model, serializer.validated_data)
+    return Response(receipt_payload(receipt), status=status.HTTP_202_ACCEPTED)
 
 
-class ContactSubmissionView(CreateAPIView):
+class ContactSubmissionView(SpooledCreateMixin, CreateAPIView):
   queryset = ContactSubmission.objects.all()
   serializer_class = ContactSubmissionSerializer
+  query_budget = 1
 
 
 class SubscriptionView(CreateAPIView):
   queryset = Subscription.objects.all()
   serializer_class = SubscriptionSerializer
+  # A single upsert statement.
+  query_budget = 1
 
   def create(self, request, *args, **kwargs):
     # Allow graceful handling if the email already exists
     serializer = self.get_serializer(data=request.data)
     serializer.is_valid(raise_exception=True)
 
-    subscription, created = Subscription.objects.get_or_create(
-      email=serializer.validated_data['email'],
-      defaults={
-        'name': serializer.validated_data.get('name', ''),
-        'source': serializer.validated_data.get('source', ''),
-        'consent': serializer.validated_data.get('consent', False)
-      }
+    subscription, created = Subscription.objects.upsert(
+      serializer.validated_data['email'],
+      **subscription_defaults(serializer.validated_data)
     )
-
-    if not created:
-      # Update optional fields if provided
-      update_fields = []
-      for field in ['name', 'source']:
-        new_value = serializer.validated_data.get(field)
-        if new_value:
-          setattr(subscription, field, new_value)
-          update_fields.append(field)
-      if serializer.validated_data.get('consent') is True and not subscription.consent:
-        subscription.consent = True
-        update_fields.append('consent')
-      if update_fields:
-        subscription.save(update_fields=update_fields)
-
     response_serializer = self.get_serializer(subscription)
     status_code = status.HTTP_201_CREATED if created else status.HTTP_200_OK
     return Response(response_serializer.data, status=status_code)
 
 
-class WorkshopRequestView(CreateAPIView):
+class SubscriptionImportView(APIView):
+  """Bulk import from a ``text/csv`` or ``application/x-ndjson`` request body (see ``contact/imports.py``).
+
+  The body is decoded and imported as it is read rather than parsed up
+  front. ``source``, ``consent`` and ``batch_size`` query parameters match
+  the ``import_subscriptions`` command options.
+  """
+
+  permission_classes = [IsAdminUser]
+  parser_classes = []
+  # Authentication plus one upsert per batch: grows with the upload by design.
+  query_budget = math.inf
+  media_types = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+    'application/json-lines': 'jsonl'
+  }
+
+  def post(self, request, *args, **kwargs):
+    media_type = request.content_type.split(';')[0].strip().lower()
+    import_format = self.media_types.get(media_type)
+    if import_format is None:
+      raise UnsupportedMediaType(media_type)
+    try:
+      batch_size = int(request.query_params.get('batch_size', DEFAULT_BATCH_SIZE))
+    except ValueError:
+      raise ParseError('batch_size must be an integer.')
+
+    try:
+      report = import_subscriptions(
+        codecs.iterdecode(request._request, 'utf-8-sig'),
+        import_format,
+        batch_size=batch_size,
+        source=request.query_params.get('source', ''),
+        consent=request.query_params.get('consent', '').lower() in ('1', 'true', 'yes')
+      )
+    except UnicodeDecodeError as exc:
+      raise ParseError(f'The body is not UTF-8: {exc}')
+    return Response(report.as_dict())
+
+
+class WorkshopRequestView(SpooledCreateMixin, CreateAPIView):
   queryset = WorkshopRequest.objects.all()
   serializer_class = WorkshopRequestSerializer
+  query_budget = 1
 
 
-class LeadView(CreateAPIView):
+class LeadView(SpooledCreateMixin, CreateAPIView):
   queryset = Lead.objects.all()
   serializer_class = LeadSerializer
+  query_budget = 1
@@ -0,0 +1,23 @@
+# Picks the worker model from DJANGO_SERVER_MODE; see "Running under ASGI" in the README.
+import os
+import time
+
+server_mode = os.getenv('DJANGO_SERVER_MODE', 'wsgi').lower()
+
+if server_mode == 'asgi':
+    wsgi_app = 'backend_project.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'backend_project.wsgi:application'
+    worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+    threads = int(os.getenv('GUNICORN_THREADS', '1'))
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', str(min(2 * (os.cpu_count() or 1) + 1, 8))))
+
+
+def when_ready(server):
+    # STARTUP_STARTED is exported by entrypoint.sh; backend_project.startup reports the phases before this.
+    started = os.getenv('STARTUP_STARTED')
+    if started:
+        server.log.info('Listening %.3fs after container start', time.time() - float(started))